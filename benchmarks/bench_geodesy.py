@@ -0,0 +1,101 @@
+"""距離・標高プロファイル計算のベンチマーク
+
+列単位の一括計算（src.services.geodesy）と、ポイントごとの素朴な
+Pythonループ（従来ブラウザで行っていた処理と同等）のスループットを比較する。
+
+使い方:
+    uv run python -m benchmarks.bench_geodesy --points 100000 --repeat 5
+"""
+
+import argparse
+import math
+import random
+import time
+from array import array
+from collections.abc import Callable
+
+from src.models.gpx import EARTH_RADIUS_M, GpxData, Track, TrackSegmentBuilder
+from src.services.geodesy import compute_profile
+
+
+def build_track(point_count: int, seed: int = 0) -> GpxData:
+    """ランダムウォークの合成トラックを作成"""
+    rng = random.Random(seed)
+    builder = TrackSegmentBuilder()
+    lat, lon, ele = 35.6586, 139.7454, 20.0
+    epoch_ms = 1_760_041_340_000
+    for _ in range(point_count):
+        lat += rng.uniform(-1e-4, 1e-4)
+        lon += rng.uniform(-1e-4, 1e-4)
+        ele += rng.uniform(-1.0, 1.0)
+        epoch_ms += 1000
+        builder.append(lat, lon, ele, epoch_ms)
+    return GpxData(tracks=(Track(segments=(builder.build(),)),))
+
+
+def naive_profile(gpx_data: GpxData) -> tuple[list[float], float, float]:
+    """ポイントごとのループで累積距離・累積上昇/下降を計算（比較用）"""
+
+    def haversine(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+        d_lat = math.radians(lat2 - lat1)
+        d_lng = math.radians(lng2 - lng1)
+        a = (
+            math.sin(d_lat / 2) ** 2
+            + math.cos(math.radians(lat1))
+            * math.cos(math.radians(lat2))
+            * math.sin(d_lng / 2) ** 2
+        )
+        return EARTH_RADIUS_M * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+    points = gpx_data.get_all_points()
+    distances = [0.0]
+    total = 0.0
+    ascent = 0.0
+    descent = 0.0
+    for prev, curr in zip(points, points[1:]):
+        total += haversine(prev.latitude, prev.longitude, curr.latitude, curr.longitude)
+        distances.append(total)
+        if prev.elevation is not None and curr.elevation is not None:
+            diff = curr.elevation - prev.elevation
+            if diff > 0:
+                ascent += diff
+            else:
+                descent -= diff
+    return distances, ascent, descent
+
+
+def measure(func: Callable[[], object], repeat: int) -> float:
+    """最良実行時間（秒）を計測"""
+    best = math.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    """ベンチマークを実行して結果を表示"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--points", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    gpx_data = build_track(args.points)
+
+    batched = measure(lambda: compute_profile(gpx_data), args.repeat)
+    naive = measure(lambda: naive_profile(gpx_data), args.repeat)
+
+    # 結果の整合性を確認
+    profile = compute_profile(gpx_data, smoothing_window=1)
+    reference, _, _ = naive_profile(gpx_data)
+    drift = max(abs(a - b) for a, b in zip(profile.distances, array("d", reference)))
+
+    print(f"points: {args.points:,}")
+    print(f"batched (geodesy.compute_profile): {args.points / batched:>12,.0f} points/s")
+    print(f"naive per-point loop:              {args.points / naive:>12,.0f} points/s")
+    print(f"speedup: {naive / batched:.2f}x  (max distance drift: {drift:.3e} m)")
+
+
+if __name__ == "__main__":
+    main()
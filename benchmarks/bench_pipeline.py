@@ -0,0 +1,303 @@
+"""GPX処理パイプラインのベンチマーク
+
+合成GPX（benchmarks.synthetic_gpx）を使い、パース・集計・地図ページの
+描画の各段階について、スループット・レイテンシのパーセンタイル・
+ピークRSSを計測する。段階ごとに新しいプロセスで計測するため、
+ピークRSSは他の段階の影響を受けない。
+
+結果をJSONに保存し、別のコミットで保存した結果と比較できる。
+p50またはピークRSSがしきい値を超えて悪化した項目があれば終了コード1で終わる。
+
+使い方:
+    uv run python -m benchmarks.bench_pipeline --points 1000 100000 --save base.json
+    uv run python -m benchmarks.bench_pipeline --points 1000 100000 --compare base.json
+    uv run python -m benchmarks.bench_pipeline --points 5000000 --layouts 4x8 \\
+        --payloads full ext --stages parse_stream get_bounds --repeat 3
+"""
+
+import argparse
+import json
+import math
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Any, Final
+
+from benchmarks.synthetic_gpx import GpxLayout, write_gpx
+
+
+DEFAULT_POINTS: Final[tuple[int, ...]] = (1_000, 10_000, 100_000, 1_000_000)
+DEFAULT_THRESHOLD: Final[float] = 0.10
+# ペイロードの種類 → (ele, time, extensions)
+PAYLOADS: Final[dict[str, tuple[bool, bool, bool]]] = {
+    "full": (True, True, False),
+    "bare": (False, False, False),
+    "ext": (True, True, True),
+}
+STAGES: Final[tuple[str, ...]] = (
+    "parse",
+    "parse_stream",
+    "get_bounds",
+    "get_time_range",
+    "metadata",
+    "render_map",
+)
+# ru_maxrssの単位（LinuxはKiB、macOSはバイト）
+_MAXRSS_UNIT: Final[int] = 1 if sys.platform == "darwin" else 1024
+
+
+def _peak_rss_bytes() -> int:
+    """このプロセスのピークRSS（バイト）"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * _MAXRSS_UNIT
+
+
+def percentile(samples: list[float], q: float) -> float:
+    """パーセンタイル（線形補間、qは0〜100）"""
+    ordered = sorted(samples)
+    position = (len(ordered) - 1) * q / 100
+    low = math.floor(position)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+
+
+def _prepare_stage(stage: str, path: Path) -> Callable[[], object]:
+    """段階の前処理を済ませ、計測対象の処理を返す（子プロセスで実行）"""
+    # 計測対象のモジュールは子プロセスで読み込む（親のメモリを持ち込まない）
+    from src.dependencies import render_template
+    from src.models.gpx import GpxData
+    from src.services.gpx_parser import GpxParser
+    from src.services.track_store import StoredTrack, get_time_range
+
+    if stage == "parse":
+        content = path.read_bytes()
+        return lambda: GpxParser().parse(content)
+
+    if stage == "parse_stream":
+
+        def parse_stream() -> GpxData:
+            with path.open("rb") as f:
+                return GpxParser().parse_stream(f)
+
+        return parse_stream
+
+    with path.open("rb") as f:
+        gpx_data = GpxParser().parse_stream(f)
+
+    # 集計値はインスタンスごとにキャッシュされるため、毎回作り直して計測する
+    def fresh() -> GpxData:
+        return GpxData(creator=gpx_data.creator, tracks=gpx_data.tracks)
+
+    def stored() -> StoredTrack:
+        return StoredTrack(track_id="0" * 64, filename=path.name, gpx_data=fresh())
+
+    if stage == "get_bounds":
+        return lambda: fresh().get_bounds()
+    if stage == "get_time_range":
+        return lambda: get_time_range(fresh().stats)
+    if stage == "metadata":
+        return lambda: stored().metadata()
+    if stage == "render_map":
+        metadata = stored().metadata()
+
+        def render() -> str:
+            return render_template(
+                "map.html", title=path.name, gpx_data=metadata, error=None
+            )
+
+        # テンプレートのコンパイル（初回のみ）は計測に含めない
+        render()
+        return render
+    raise ValueError(f"unknown stage: {stage}")
+
+
+def run_stage(stage: str, path: str, points: int, repeat: int) -> dict[str, Any]:
+    """1つの段階を計測（子プロセスで実行）"""
+    func = _prepare_stage(stage, Path(path))
+    baseline_rss = _peak_rss_bytes()
+
+    samples: list[float] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+
+    peak_rss = _peak_rss_bytes()
+    p50 = percentile(samples, 50)
+    return {
+        "min_s": min(samples),
+        "p50_s": p50,
+        "p90_s": percentile(samples, 90),
+        "p99_s": percentile(samples, 99),
+        "points_per_s": points / p50 if p50 > 0 else math.inf,
+        "peak_rss_mb": peak_rss / 2**20,
+        "stage_rss_mb": (peak_rss - baseline_rss) / 2**20,
+    }
+
+
+def _git_commit() -> str | None:
+    """現在のコミット（取得できなければNone）"""
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            check=True,
+            text=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout.strip()
+
+
+def run_suite(
+    layouts: list[GpxLayout], stages: list[str], repeat: int
+) -> list[dict[str, Any]]:
+    """全構成・全段階を計測"""
+    results: list[dict[str, Any]] = []
+    context = get_context("spawn")
+    with tempfile.TemporaryDirectory(prefix="gpx-bench-") as tmp:
+        for layout in layouts:
+            path = Path(tmp) / f"{layout.label}.gpx"
+            size = write_gpx(layout, path)
+            for stage in stages:
+                # 段階ごとに新しいプロセスで計測（ピークRSSを独立させる）
+                with ProcessPoolExecutor(1, mp_context=context) as executor:
+                    measured = executor.submit(
+                        run_stage, stage, str(path), layout.points, repeat
+                    ).result()
+                result = {
+                    "case": layout.label,
+                    "stage": stage,
+                    "points": layout.points,
+                    "bytes": size,
+                    "repeat": repeat,
+                    **measured,
+                }
+                results.append(result)
+                _print_result(result)
+            path.unlink()
+    return results
+
+
+def _print_result(result: dict[str, Any]) -> None:
+    """計測結果を1行で表示"""
+    print(
+        f"{result['case']:<24} {result['stage']:<15}"
+        f" {result['points_per_s']:>14,.0f} pts/s"
+        f"  p50 {result['p50_s'] * 1000:>10.3f} ms"
+        f"  p90 {result['p90_s'] * 1000:>10.3f} ms"
+        f"  p99 {result['p99_s'] * 1000:>10.3f} ms"
+        f"  peak {result['peak_rss_mb']:>8.1f} MiB"
+        f" (+{result['stage_rss_mb']:.1f})",
+        flush=True,
+    )
+
+
+def compare_results(
+    baseline: dict[str, Any], current: dict[str, Any], threshold: float
+) -> list[str]:
+    """
+    保存済みの結果と比較して表示し、悪化した項目を返す
+
+    p50の実行時間とピークRSSが (1 + threshold) 倍を超えたものを悪化とみなす。
+    """
+    previous = {(r["case"], r["stage"]): r for r in baseline["results"]}
+    regressions: list[str] = []
+    print(f"\ncompare: {baseline.get('commit')} -> {current.get('commit')}")
+    for result in current["results"]:
+        key = (result["case"], result["stage"])
+        before = previous.get(key)
+        if before is None:
+            continue
+        time_ratio = result["p50_s"] / before["p50_s"] if before["p50_s"] else 1.0
+        rss_ratio = (
+            result["peak_rss_mb"] / before["peak_rss_mb"]
+            if before["peak_rss_mb"]
+            else 1.0
+        )
+        regressed = time_ratio > 1 + threshold or rss_ratio > 1 + threshold
+        if regressed:
+            regressions.append(f"{key[0]} {key[1]}")
+        print(
+            f"{key[0]:<24} {key[1]:<15}"
+            f" p50 {time_ratio:>6.2f}x  peak RSS {rss_ratio:>6.2f}x"
+            f"{'  REGRESSION' if regressed else ''}"
+        )
+    return regressions
+
+
+def build_layouts(
+    points: list[int], layouts: list[str], payloads: list[str], seed: int
+) -> list[GpxLayout]:
+    """コマンドライン引数から構成の一覧を作る"""
+    result: list[GpxLayout] = []
+    for layout in layouts:
+        tracks, segments = (int(n) for n in layout.split("x"))
+        for payload in payloads:
+            elevation, has_time, extensions = PAYLOADS[payload]
+            for count in points:
+                result.append(
+                    GpxLayout(
+                        points=count,
+                        tracks=tracks,
+                        segments=segments,
+                        elevation=elevation,
+                        time=has_time,
+                        extensions=extensions,
+                        seed=seed,
+                    )
+                )
+    return result
+
+
+def main() -> None:
+    """ベンチマークを実行して結果を表示・保存・比較"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--points", type=int, nargs="+", default=list(DEFAULT_POINTS))
+    parser.add_argument(
+        "--layouts", nargs="+", default=["1x1"], help="トラック数xセグメント数"
+    )
+    parser.add_argument(
+        "--payloads", nargs="+", default=["full"], choices=sorted(PAYLOADS)
+    )
+    parser.add_argument("--stages", nargs="+", default=list(STAGES), choices=STAGES)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save", type=Path, help="結果を保存するJSONファイル")
+    parser.add_argument("--compare", type=Path, help="比較対象の結果のJSONファイル")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help="悪化とみなす比率（0.10なら10%%）",
+    )
+    args = parser.parse_args()
+
+    layouts = build_layouts(args.points, args.layouts, args.payloads, args.seed)
+    current = {
+        "commit": _git_commit(),
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": run_suite(layouts, args.stages, args.repeat),
+    }
+
+    if args.save is not None:
+        args.save.write_text(json.dumps(current, indent=2), encoding="utf-8")
+    if args.compare is not None:
+        baseline = json.loads(args.compare.read_text(encoding="utf-8"))
+        regressions = compare_results(baseline, current, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s): {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
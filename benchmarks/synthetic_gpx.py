@@ -0,0 +1,167 @@
+"""合成GPXジェネレーター
+
+ベンチマーク用に、シードから常に同じ内容になるGPXを生成する。
+500万点規模でもメモリに全体を持たないよう、チャンク単位で書き出す。
+
+使い方:
+    uv run python -m benchmarks.synthetic_gpx --points 1000000 -o /tmp/1m.gpx
+"""
+
+import argparse
+import random
+from collections.abc import Iterator
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Final
+
+from pydantic import BaseModel, ConfigDict, Field
+
+
+# 書き出し時にまとめるトラックポイント数
+_POINTS_PER_CHUNK: Final[int] = 4096
+# 開始地点（東京タワー）と開始時刻
+_START_LAT: Final[float] = 35.6586
+_START_LON: Final[float] = 139.7454
+_START_EPOCH: Final[int] = 1_760_041_340
+
+_HEADER: Final[str] = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<gpx version="1.1" creator="gpx-map-viewer benchmarks"'
+    ' xmlns="http://www.topografix.com/GPX/1/1"'
+    ' xmlns:gpxtpx="http://www.garmin.com/xmlschemas/TrackPointExtension/v1">\n'
+)
+
+
+class GpxLayout(BaseModel):
+    """合成GPXの構成"""
+
+    model_config = ConfigDict(frozen=True)
+
+    points: int = Field(ge=0, description="全トラックポイント数")
+    tracks: int = Field(default=1, ge=1, description="トラック数")
+    segments: int = Field(default=1, ge=1, description="トラックあたりのセグメント数")
+    elevation: bool = Field(default=True, description="eleを含める")
+    time: bool = Field(default=True, description="timeを含める")
+    extensions: bool = Field(
+        default=False, description="心拍・ケイデンスの拡張を含める"
+    )
+    seed: int = Field(default=0, description="乱数シード")
+
+    @property
+    def label(self) -> str:
+        """結果の比較に使う構成名（例: 100k-2x3-ele-time）"""
+        if self.points >= 1_000_000 and self.points % 1_000_000 == 0:
+            size = f"{self.points // 1_000_000}m"
+        elif self.points >= 1000 and self.points % 1000 == 0:
+            size = f"{self.points // 1000}k"
+        else:
+            size = str(self.points)
+        flags = [
+            name
+            for name, enabled in (
+                ("ele", self.elevation),
+                ("time", self.time),
+                ("ext", self.extensions),
+            )
+            if enabled
+        ]
+        return "-".join([size, f"{self.tracks}x{self.segments}", *flags])
+
+    def segment_sizes(self) -> list[int]:
+        """セグメントごとのポイント数（端数は先頭のセグメントから配る）"""
+        count = self.tracks * self.segments
+        base, remainder = divmod(self.points, count)
+        return [base + (1 if i < remainder else 0) for i in range(count)]
+
+
+def iter_gpx_chunks(layout: GpxLayout) -> Iterator[bytes]:
+    """
+    GPXをチャンク単位で生成
+
+    ランダムウォーク（約10m間隔・1秒間隔）のトラックを出力する。
+    セグメントの間は少し移動し、時刻も空ける。
+    """
+    rng = random.Random(layout.seed)
+    lat, lon, ele = _START_LAT, _START_LON, 20.0
+    epoch = _START_EPOCH
+    sizes = iter(layout.segment_sizes())
+
+    yield _HEADER.encode("utf-8")
+    for track_index in range(layout.tracks):
+        yield f"<trk>\n<name>track {track_index + 1}</name>\n".encode("utf-8")
+        for _ in range(layout.segments):
+            lines = ["<trkseg>\n"]
+            for i in range(1, next(sizes) + 1):
+                lat += rng.uniform(-1e-4, 1e-4)
+                lon += rng.uniform(-1e-4, 1e-4)
+                ele += rng.uniform(-1.0, 1.0)
+                epoch += 1
+                lines.append(f'<trkpt lat="{lat:.7f}" lon="{lon:.7f}">')
+                if layout.elevation:
+                    lines.append(f"<ele>{ele:.1f}</ele>")
+                if layout.time:
+                    stamp = datetime.fromtimestamp(epoch, tz=timezone.utc)
+                    lines.append(f"<time>{stamp:%Y-%m-%dT%H:%M:%SZ}</time>")
+                if layout.extensions:
+                    lines.append(
+                        "<extensions><gpxtpx:TrackPointExtension>"
+                        f"<gpxtpx:hr>{rng.randint(90, 180)}</gpxtpx:hr>"
+                        f"<gpxtpx:cad>{rng.randint(60, 100)}</gpxtpx:cad>"
+                        "</gpxtpx:TrackPointExtension></extensions>"
+                    )
+                lines.append("</trkpt>\n")
+                if i % _POINTS_PER_CHUNK == 0:
+                    yield "".join(lines).encode("utf-8")
+                    lines.clear()
+            lines.append("</trkseg>\n")
+            yield "".join(lines).encode("utf-8")
+            # セグメントの切れ目（GPSの途切れ）
+            lat += 1e-3
+            epoch += 600
+        yield b"</trk>\n"
+    yield b"</gpx>\n"
+
+
+def generate_gpx(layout: GpxLayout) -> bytes:
+    """GPXをまとめて生成"""
+    return b"".join(iter_gpx_chunks(layout))
+
+
+def write_gpx(layout: GpxLayout, path: Path) -> int:
+    """GPXをファイルに書き出し、書き出したバイト数を返す"""
+    size = 0
+    with path.open("wb") as f:
+        for chunk in iter_gpx_chunks(layout):
+            f.write(chunk)
+            size += len(chunk)
+    return size
+
+
+def main() -> None:
+    """合成GPXをファイルに書き出す"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--points", type=int, default=100_000)
+    parser.add_argument("--tracks", type=int, default=1)
+    parser.add_argument("--segments", type=int, default=1)
+    parser.add_argument("--no-ele", action="store_true", help="eleを含めない")
+    parser.add_argument("--no-time", action="store_true", help="timeを含めない")
+    parser.add_argument("--extensions", action="store_true", help="拡張を含める")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output", type=Path, required=True)
+    args = parser.parse_args()
+
+    layout = GpxLayout(
+        points=args.points,
+        tracks=args.tracks,
+        segments=args.segments,
+        elevation=not args.no_ele,
+        time=not args.no_time,
+        extensions=args.extensions,
+        seed=args.seed,
+    )
+    size = write_gpx(layout, args.output)
+    print(f"{layout.label}: {size:,} bytes -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 """アプリケーション設定"""
 
+import tempfile
 from pathlib import Path
 
 from pydantic_settings import BaseSettings
@@ -17,7 +18,51 @@ class Settings(BaseSettings):
     static_dir: Path = base_dir / "static"
 
     # ファイルアップロード設定
-    max_upload_size: int = 50 * 1024 * 1024  # 50MB
+    max_upload_size: int = 50 * 1024 * 1024  # 50MB（リクエストボディ全体）
+    # アップロードを書き出す一時ディレクトリ（トラックストアと同じファイルシステム推奨）
+    upload_spool_dir: Path = Path(tempfile.gettempdir()) / "gpx-map-viewer" / "uploads"
+    max_batch_files: int = 50  # 一度にアップロードできるファイル数
+    # 圧縮ファイル・gzipのボディの展開後の上限（zip bomb対策）
+    max_decompressed_size: int = 500 * 1024 * 1024  # 500MB
+    max_decompression_ratio: float = 100.0  # 展開後 / 圧縮後のバイト数
+
+    # トラックストア設定（ワーカー間で共有するため元のGPXをディスクに保存）
+    track_store_dir: Path = Path(tempfile.gettempdir()) / "gpx-map-viewer" / "tracks"
+    track_cache_max_bytes: int = 256 * 1024 * 1024  # メモリキャッシュの上限（バイト）
+    track_store_ttl: int = 24 * 60 * 60  # ディスク上の保持期間（秒）
+
+    # 逆ジオコーディングのキャッシュ設定
+    geocoding_cache_max_entries: int = 50_000  # ワーカーごとの最大件数
+    geocoding_cache_ttl: int = 7 * 24 * 60 * 60  # 有効期間（秒）
+    # Nominatimへの最小リクエスト間隔（秒、同じデータベースを使う全プロセス共通）
+    nominatim_min_interval: float = 1.0
+    # ワーカー間・再起動後も共有する永続キャッシュ・レート制限（SQLite）
+    geocoding_cache_path: Path = (
+        Path(tempfile.gettempdir()) / "gpx-map-viewer" / "geocoding.sqlite3"
+    )
+    # オフライン逆ジオコーディング用の境界ポリゴン・道路（GeoJSON、未指定なら使わない）
+    geocoding_boundaries_path: Path | None = None
+    geocoding_roads_path: Path | None = None
+    geocoding_road_max_distance_m: float = 50.0  # 道路名を採用する最大距離（m）
+    # ローカルで見つからない点をNominatimに問い合わせるか
+    geocoding_remote_fallback: bool = True
+    # 問い合わせキューの深さの上限（超えると429、ワーカーごと）
+    geocoding_queue_max_depth: int = 200  # 全体
+    geocoding_client_queue_max_depth: int = 20  # クライアント（X-Real-IP）ごと
+    # クライアントごとの公平キューの重み（未指定は1.0、例: {"10.0.0.5": 2.0}）
+    geocoding_client_weights: dict[str, float] = {}
+
+    # GPXパースのプロセスプール（イベントループを止めないよう別プロセスで実行）
+    parse_workers: int = 2  # プロセス数（0ならスレッドプールで実行）
+    parse_max_concurrency: int = 2  # 同時に実行するパースの数（ワーカーごと）
+    parse_max_pending: int = 16  # 空きを待つアップロードの上限（超えると503）
+
+    # リクエストプロファイラー（遅いリクエストの呼び出しツリーを書き出す）
+    profiler_sample_rate: float = 0.0  # プロファイルするリクエストの割合（0で無効）
+    profiler_token: str | None = None  # X-Profileヘッダーで個別に有効にするトークン
+    profiler_dir: Path = Path(tempfile.gettempdir()) / "gpx-map-viewer" / "profiles"
+    profiler_slow_ms: float = 500.0  # 書き出す最小の処理時間（ミリ秒）
+    profiler_interval_ms: float = 5.0  # スタックの採取間隔（ミリ秒）
 
 
 settings = Settings()
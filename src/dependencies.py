@@ -1,13 +1,19 @@
 """依存性注入・共通ユーティリティ"""
 
-from typing import Any
+import asyncio
+from collections.abc import Awaitable, Callable
+from email.utils import parsedate_to_datetime
+from typing import Any, TypeVar
 
-from fastapi import Request
+from fastapi import Request, Response
+from fastapi.responses import JSONResponse
 from fastapi.templating import Jinja2Templates
 
 from src.config import settings
 
 
+T = TypeVar("T")
+
 # Jinja2テンプレート設定
 templates = Jinja2Templates(directory=settings.templates_dir)
 
@@ -34,3 +40,87 @@ class TemplateResponse:
             name=template_name,
             context=self.context,
         )
+
+
+def render_template(template_name: str, **context: Any) -> str:
+    """リクエストに依存せずテンプレートを文字列にレンダリング（事前生成用）"""
+    template = templates.get_template(template_name)
+    return template.render({"app_name": settings.app_name, **context})
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """If-None-Matchヘッダーが指定のETagに一致するか"""
+    header = request.headers.get("if-none-match")
+    if header is None:
+        return False
+    candidates = [tag.strip() for tag in header.split(",")]
+    # If-None-Matchは弱い比較（W/プレフィックスを無視）
+    return "*" in candidates or etag in (tag.removeprefix("W/") for tag in candidates)
+
+
+def not_modified_since(request: Request, last_modified: float) -> bool:
+    """If-Modified-Sinceヘッダー以降に更新されていないか（秒精度で比較）"""
+    header = request.headers.get("if-modified-since")
+    if header is None:
+        return False
+    try:
+        since = parsedate_to_datetime(header)
+    except (TypeError, ValueError):
+        return False
+    return int(last_modified) <= since.timestamp()
+
+
+def conditional_response(
+    request: Request,
+    etag: str,
+    build_body: Callable[[], bytes],
+    media_type: str,
+    cache_control: str = "public, max-age=86400",
+    vary: str | None = None,
+) -> Response:
+    """ETag付きレスポンス（一致すれば本文を作らずに304を返す）"""
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if vary is not None:
+        headers["Vary"] = vary
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(build_body(), media_type=media_type, headers=headers)
+
+
+def conditional_json_response(
+    request: Request,
+    etag: str,
+    build_content: Callable[[], Any],
+    cache_control: str = "public, max-age=86400",
+    vary: str | None = None,
+) -> Response:
+    """ETag付きJSONレスポンス（一致すれば本文を作らずに304を返す）"""
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if vary is not None:
+        headers["Vary"] = vary
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(build_content(), headers=headers)
+
+
+async def wait_for_disconnect(request: Request) -> None:
+    """クライアントが切断するまで待つ（本文を読まないGETリクエスト用）"""
+    while True:
+        message = await request.receive()
+        if message["type"] == "http.disconnect":
+            return
+
+
+async def cancel_on_disconnect(request: Request, awaitable: Awaitable[T]) -> T | None:
+    """awaitableの結果を返す（先にクライアントが切断したら取り消してNone）"""
+    task = asyncio.ensure_future(awaitable)
+    disconnected = asyncio.ensure_future(wait_for_disconnect(request))
+    try:
+        await asyncio.wait({task, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        disconnected.cancel()
+        if not task.done():
+            task.cancel()
+    if task.cancelled():
+        return None
+    return task.result()
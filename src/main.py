@@ -1,27 +1,49 @@
 """FastAPIアプリケーション"""
 
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
 
 from src.config import settings
-from src.routers import home, api
+from src.middleware import ServerTimingMiddleware
+from src.routers import home, api, metrics
+from src.services.geocoding import get_geocoding_service
+from src.services.parse_pool import shutdown_parse_pool
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """起動・終了処理"""
+    # デモページを事前にパース・レンダリング
+    home.prepare_demo_page()
+    # オフライン逆ジオコーディングの境界インデックスを事前に構築
+    get_geocoding_service()
+    yield
+    shutdown_parse_pool()
 
 
 def create_app() -> FastAPI:
     """アプリケーションファクトリ"""
     app = FastAPI(
         title=settings.app_name,
+        lifespan=lifespan,
         docs_url=None,
         redoc_url=None,
         openapi_url=None,
     )
 
+    # 段階ごとの処理時間（Server-Timing）とリクエストプロファイラー
+    app.add_middleware(ServerTimingMiddleware)
+
     # 静的ファイル
     app.mount("/static", StaticFiles(directory=settings.static_dir), name="static")
 
     # ルーター
     app.include_router(home.router)
     app.include_router(api.router)
+    app.include_router(metrics.router)
 
     return app
 
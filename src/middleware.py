@@ -0,0 +1,103 @@
+"""ミドルウェア"""
+
+import asyncio
+import random
+import threading
+from pathlib import Path
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.config import settings
+from src.services.profiler import RequestProfiler
+from src.services.timing import RequestTimings, request_timings
+
+
+# プロファイルを要求するヘッダー（値がprofiler_tokenと一致する場合のみ有効）
+PROFILE_HEADER = b"x-profile"
+
+
+class ServerTimingMiddleware:
+    """
+    全リクエストにServer-Timingヘッダーを付けるミドルウェア
+
+    - stage()で記録した段階ごとの処理時間と、レスポンス開始までの合計を出力
+    - profiler_sample_rateの割合のリクエスト、またはX-Profileヘッダーに
+      profiler_tokenを指定したリクエストをプロファイルし、profiler_slow_ms
+      以上かかったものの呼び出しツリーをprofiler_dirに書き出す
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        profiler_sample_rate: float | None = None,
+        profiler_token: str | None = None,
+        profiler_dir: Path | None = None,
+        profiler_slow_ms: float | None = None,
+        profiler_interval_ms: float | None = None,
+    ) -> None:
+        self.app = app
+        self.profiler_sample_rate = (
+            settings.profiler_sample_rate
+            if profiler_sample_rate is None
+            else profiler_sample_rate
+        )
+        self.profiler_token = profiler_token or settings.profiler_token
+        self.profiler_dir = profiler_dir or settings.profiler_dir
+        self.profiler_slow_ms = (
+            settings.profiler_slow_ms if profiler_slow_ms is None else profiler_slow_ms
+        )
+        self.profiler_interval_ms = (
+            profiler_interval_ms or settings.profiler_interval_ms
+        )
+
+    def _should_profile(self, scope: Scope) -> bool:
+        """このリクエストをプロファイルするか"""
+        if self.profiler_token:
+            token = self.profiler_token.encode("utf-8")
+            for name, value in scope.get("headers", ()):
+                if name == PROFILE_HEADER and value == token:
+                    return True
+        return (
+            self.profiler_sample_rate > 0
+            and random.random() < self.profiler_sample_rate
+        )
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        profiler: RequestProfiler | None = None
+        if self._should_profile(scope):
+            profiler = RequestProfiler(
+                interval=self.profiler_interval_ms / 1000,
+                thread_ids=[threading.get_ident()],
+            )
+            profiler.start()
+
+        timings = RequestTimings(observer=profiler)
+        status = 500
+
+        async def send_with_timing(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", timings.server_timing())
+            await send(message)
+
+        try:
+            with request_timings(timings):
+                await self.app(scope, receive, send_with_timing)
+        finally:
+            if profiler is not None:
+                profiler.stop()
+                if timings.elapsed() * 1000 >= self.profiler_slow_ms:
+                    await asyncio.to_thread(
+                        profiler.write,
+                        self.profiler_dir,
+                        scope["method"],
+                        scope["path"],
+                        status,
+                    )
@@ -0,0 +1,11 @@
+"""逆ジオコーディング関連のモデル定義"""
+
+from pydantic import BaseModel
+
+
+class AddressResult(BaseModel):
+    """住所結果"""
+
+    prefecture: str = ""
+    city: str = ""
+    road: str = ""
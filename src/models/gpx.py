@@ -1,6 +1,60 @@
 """GPX関連のモデル定義"""
 
-from pydantic import BaseModel, Field, ConfigDict
+import math
+from array import array
+from collections.abc import Iterable, Iterator, Sequence
+from datetime import datetime, timedelta, timezone
+from functools import cached_property
+from typing import TYPE_CHECKING, Any, Final, overload
+
+from pydantic import BaseModel, Field, ConfigDict, model_validator
+
+if TYPE_CHECKING:
+    FloatColumn = array[float]
+    IntColumn = array[int]
+else:
+    FloatColumn = array
+    IntColumn = array
+
+
+# 時刻列の欠損値（int64の最小値）
+MISSING_TIME: Final[int] = -(2**63)
+
+_EPOCH: Final[datetime] = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_NAIVE_EPOCH: Final[datetime] = datetime(1970, 1, 1)
+_MILLISECOND: Final[timedelta] = timedelta(milliseconds=1)
+
+# 地球の半径（メートル）
+EARTH_RADIUS_M: Final[float] = 6371000.0
+
+
+def parse_time_to_epoch_ms(time_str: str) -> int | None:
+    """
+    ISO8601形式の時刻文字列をUNIXエポックミリ秒に変換
+
+    GPXで一般的な YYYY-MM-DDTHH:MM:SS(.fff)Z 形式は、末尾のZを除いて
+    naiveな日時としてC実装のfromisoformatで変換し、タイムゾーン処理を省略する。
+    """
+    try:
+        if time_str[-1:] == "Z":
+            naive = datetime.fromisoformat(time_str[:-1])
+            return (naive - _NAIVE_EPOCH) // _MILLISECOND
+        dt = datetime.fromisoformat(time_str)
+    except (ValueError, TypeError):
+        return None
+    if dt.tzinfo is None:
+        # GPXの時刻はUTC
+        dt = dt.replace(tzinfo=timezone.utc)
+    return (dt - _EPOCH) // _MILLISECOND
+
+
+def format_epoch_ms(epoch_ms: int) -> str:
+    """UNIXエポックミリ秒をISO8601(UTC)形式の文字列に変換"""
+    dt = datetime.fromtimestamp(epoch_ms // 1000, tz=timezone.utc)
+    millis = epoch_ms % 1000
+    if millis:
+        return f"{dt:%Y-%m-%dT%H:%M:%S}.{millis:03d}Z"
+    return f"{dt:%Y-%m-%dT%H:%M:%S}Z"
 
 
 class TrackPoint(BaseModel):
@@ -14,12 +68,294 @@ class TrackPoint(BaseModel):
     time: str | None = Field(default=None, description="時刻(ISO8601)")
 
 
-class TrackSegment(BaseModel):
-    """トラックセグメント"""
+class TrackPointsView(Sequence[TrackPoint]):
+    """
+    TrackSegmentの列データに対する遅延TrackPointビュー
+
+    要素にアクセスした時点でTrackPointを生成し、列データ自体は複製しない。
+    """
+
+    __slots__ = ("_segment",)
+
+    def __init__(self, segment: "TrackSegment") -> None:
+        self._segment = segment
+
+    def __len__(self) -> int:
+        return len(self._segment.latitudes)
+
+    @overload
+    def __getitem__(self, index: int) -> TrackPoint: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> tuple[TrackPoint, ...]: ...
+
+    def __getitem__(
+        self, index: int | slice
+    ) -> TrackPoint | tuple[TrackPoint, ...]:
+        if isinstance(index, slice):
+            return tuple(self[i] for i in range(*index.indices(len(self))))
+
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("TrackPointsView index out of range")
+        return self._segment.point_at(index)
+
+    def __iter__(self) -> Iterator[TrackPoint]:
+        for i in range(len(self)):
+            yield self._segment.point_at(i)
+
+
+class SegmentStats(BaseModel):
+    """セグメント単位の集計値"""
 
     model_config = ConfigDict(frozen=True)
 
-    points: tuple[TrackPoint, ...] = Field(default=(), description="トラックポイントリスト")
+    point_count: int = Field(default=0, description="ポイント数")
+    bounds: tuple[float, float, float, float] | None = Field(
+        default=None, description="境界ボックス (min_lat, min_lon, max_lat, max_lon)"
+    )
+    start_time_ms: int | None = Field(default=None, description="開始時刻(エポックms)")
+    end_time_ms: int | None = Field(default=None, description="終了時刻(エポックms)")
+    distance_m: float = Field(default=0.0, description="総距離(m)")
+    elevation_min: float | None = Field(default=None, description="最低高度(m)")
+    elevation_max: float | None = Field(default=None, description="最高高度(m)")
+    elevation_gain: float = Field(default=0.0, description="累積上昇(m)")
+    elevation_loss: float = Field(default=0.0, description="累積下降(m)")
+
+    @classmethod
+    def from_columns(
+        cls,
+        latitudes: FloatColumn,
+        longitudes: FloatColumn,
+        elevations: FloatColumn,
+        times: IntColumn,
+    ) -> "SegmentStats":
+        """列データを走査して集計値を計算"""
+        count = len(latitudes)
+        if count == 0:
+            return cls()
+
+        # 距離（隣接点間のハーバーサイン距離の総和）
+        radians, sin, cos = math.radians, math.sin, math.cos
+        distance = 0.0
+        prev_phi = radians(latitudes[0])
+        prev_lambda = radians(longitudes[0])
+        prev_cos = cos(prev_phi)
+        for i in range(1, count):
+            phi = radians(latitudes[i])
+            lam = radians(longitudes[i])
+            cos_phi = cos(phi)
+            a = (
+                sin((phi - prev_phi) / 2) ** 2
+                + prev_cos * cos_phi * sin((lam - prev_lambda) / 2) ** 2
+            )
+            distance += math.asin(math.sqrt(min(1.0, a)))
+            prev_phi, prev_lambda, prev_cos = phi, lam, cos_phi
+
+        # 高度（欠損値を除いた連続値の差分で上昇・下降を集計）
+        valid_elevations = [e for e in elevations if not math.isnan(e)]
+        gain = 0.0
+        loss = 0.0
+        for prev, curr in zip(valid_elevations, valid_elevations[1:]):
+            diff = curr - prev
+            if diff > 0:
+                gain += diff
+            else:
+                loss -= diff
+
+        # 時刻
+        valid_times: Iterable[int] = times
+        if MISSING_TIME in times:
+            valid_times = [t for t in times if t != MISSING_TIME]
+
+        return cls(
+            point_count=count,
+            bounds=(min(latitudes), min(longitudes), max(latitudes), max(longitudes)),
+            start_time_ms=min(valid_times, default=None),
+            end_time_ms=max(valid_times, default=None),
+            distance_m=2 * EARTH_RADIUS_M * distance,
+            elevation_min=min(valid_elevations, default=None),
+            elevation_max=max(valid_elevations, default=None),
+            elevation_gain=gain,
+            elevation_loss=loss,
+        )
+
+
+class TrackStats(SegmentStats):
+    """GPXデータ全体の集計値（セグメント別の内訳付き）"""
+
+    segments: tuple[SegmentStats, ...] = Field(
+        default=(), description="セグメント別の集計値"
+    )
+
+    @classmethod
+    def aggregate(cls, segments: Iterable[SegmentStats]) -> "TrackStats":
+        """セグメント別の集計値を合算"""
+        parts = tuple(segments)
+        boxes = [s.bounds for s in parts if s.bounds is not None]
+        bounds: tuple[float, float, float, float] | None = None
+        if boxes:
+            bounds = (
+                min(b[0] for b in boxes),
+                min(b[1] for b in boxes),
+                max(b[2] for b in boxes),
+                max(b[3] for b in boxes),
+            )
+
+        return cls(
+            point_count=sum(s.point_count for s in parts),
+            bounds=bounds,
+            start_time_ms=min(
+                (s.start_time_ms for s in parts if s.start_time_ms is not None),
+                default=None,
+            ),
+            end_time_ms=max(
+                (s.end_time_ms for s in parts if s.end_time_ms is not None),
+                default=None,
+            ),
+            distance_m=sum(s.distance_m for s in parts),
+            elevation_min=min(
+                (s.elevation_min for s in parts if s.elevation_min is not None),
+                default=None,
+            ),
+            elevation_max=max(
+                (s.elevation_max for s in parts if s.elevation_max is not None),
+                default=None,
+            ),
+            elevation_gain=sum(s.elevation_gain for s in parts),
+            elevation_loss=sum(s.elevation_loss for s in parts),
+            segments=parts,
+        )
+
+    @property
+    def center(self) -> tuple[float, float] | None:
+        """中心座標 (lat, lon)"""
+        if self.bounds is None:
+            return None
+
+        min_lat, min_lon, max_lat, max_lon = self.bounds
+        return ((min_lat + max_lat) / 2, (min_lon + max_lon) / 2)
+
+
+class TrackSegment(BaseModel):
+    """
+    トラックセグメント
+
+    ポイントは緯度・経度・高度・時刻の列（packed array）として保持する。
+    高度の欠損はNaN、時刻の欠損はMISSING_TIMEで表す。
+    """
+
+    model_config = ConfigDict(frozen=True, arbitrary_types_allowed=True)
+
+    latitudes: FloatColumn = Field(
+        default_factory=lambda: array("d"), description="緯度列"
+    )
+    longitudes: FloatColumn = Field(
+        default_factory=lambda: array("d"), description="経度列"
+    )
+    elevations: FloatColumn = Field(
+        default_factory=lambda: array("d"), description="高度列(m, 欠損はNaN)"
+    )
+    times: IntColumn = Field(
+        default_factory=lambda: array("q"),
+        description="時刻列(UNIXエポックミリ秒, 欠損はMISSING_TIME)",
+    )
+    stats: SegmentStats = Field(
+        default_factory=SegmentStats, description="セグメントの集計値"
+    )
+
+    def __init__(
+        self, points: Iterable[TrackPoint] | None = None, **data: Any
+    ) -> None:
+        """points=(TrackPoint, ...) が渡された場合は列データに変換して初期化"""
+        if points is not None:
+            builder = TrackSegmentBuilder()
+            builder.extend(points)
+            data.update(builder.columns())
+        if "stats" not in data:
+            data["stats"] = SegmentStats.from_columns(
+                data.get("latitudes", array("d")),
+                data.get("longitudes", array("d")),
+                data.get("elevations", array("d")),
+                data.get("times", array("q")),
+            )
+        super().__init__(**data)
+
+    @model_validator(mode="after")
+    def _check_column_lengths(self) -> "TrackSegment":
+        """列の長さが揃っていることを確認"""
+        size = len(self.latitudes)
+        lengths = (len(self.longitudes), len(self.elevations), len(self.times))
+        if any(length != size for length in lengths):
+            raise ValueError("列データの長さが一致しません")
+        return self
+
+    @property
+    def points(self) -> TrackPointsView:
+        """トラックポイントの遅延ビュー"""
+        return TrackPointsView(self)
+
+    def point_at(self, index: int) -> TrackPoint:
+        """指定インデックスのTrackPointを生成"""
+        elevation = self.elevations[index]
+        epoch_ms = self.times[index]
+        return TrackPoint.model_construct(
+            latitude=self.latitudes[index],
+            longitude=self.longitudes[index],
+            elevation=None if math.isnan(elevation) else elevation,
+            time=None if epoch_ms == MISSING_TIME else format_epoch_ms(epoch_ms),
+        )
+
+
+class TrackSegmentBuilder:
+    """TrackSegmentを列単位で組み立てるビルダー"""
+
+    __slots__ = ("_latitudes", "_longitudes", "_elevations", "_times")
+
+    def __init__(self) -> None:
+        self._latitudes: FloatColumn = array("d")
+        self._longitudes: FloatColumn = array("d")
+        self._elevations: FloatColumn = array("d")
+        self._times: IntColumn = array("q")
+
+    def __len__(self) -> int:
+        return len(self._latitudes)
+
+    def append(
+        self,
+        latitude: float,
+        longitude: float,
+        elevation: float | None = None,
+        epoch_ms: int | None = None,
+    ) -> None:
+        """ポイントを1点追加"""
+        self._latitudes.append(latitude)
+        self._longitudes.append(longitude)
+        self._elevations.append(math.nan if elevation is None else elevation)
+        self._times.append(MISSING_TIME if epoch_ms is None else epoch_ms)
+
+    def extend(self, points: Iterable[TrackPoint]) -> None:
+        """TrackPointをまとめて追加"""
+        for p in points:
+            epoch_ms = None if p.time is None else parse_time_to_epoch_ms(p.time)
+            self.append(p.latitude, p.longitude, p.elevation, epoch_ms)
+
+    def columns(self) -> dict[str, Any]:
+        """列データを辞書で取得"""
+        return {
+            "latitudes": self._latitudes,
+            "longitudes": self._longitudes,
+            "elevations": self._elevations,
+            "times": self._times,
+        }
+
+    def build(self) -> TrackSegment:
+        """TrackSegmentを生成（列は検証済みのため再検証しない）"""
+        stats = SegmentStats.from_columns(
+            self._latitudes, self._longitudes, self._elevations, self._times
+        )
+        return TrackSegment.model_construct(stats=stats, **self.columns())
 
 
 class Track(BaseModel):
@@ -41,35 +377,34 @@ class GpxData(BaseModel):
     creator: str | None = Field(default=None, description="作成者")
     tracks: tuple[Track, ...] = Field(default=(), description="トラックリスト")
 
+    def iter_segments(self) -> Iterator[TrackSegment]:
+        """全セグメントを順に取得"""
+        for track in self.tracks:
+            yield from track.segments
+
+    def iter_points(self) -> Iterator[TrackPoint]:
+        """全トラックポイントを順に取得（遅延生成）"""
+        for segment in self.iter_segments():
+            yield from segment.points
+
+    @cached_property
+    def stats(self) -> TrackStats:
+        """集計値（パース時に計算済みのセグメント集計を合算してキャッシュ）"""
+        return TrackStats.aggregate(s.stats for s in self.iter_segments())
+
+    @property
+    def point_count(self) -> int:
+        """トラックポイント数"""
+        return self.stats.point_count
+
     def get_all_points(self) -> list[TrackPoint]:
         """全トラックポイントをフラットなリストで取得"""
-        points: list[TrackPoint] = []
-        for track in self.tracks:
-            for segment in track.segments:
-                points.extend(segment.points)
-        return points
+        return list(self.iter_points())
 
     def get_bounds(self) -> tuple[float, float, float, float] | None:
         """境界ボックスを取得 (min_lat, min_lon, max_lat, max_lon)"""
-        points = self.get_all_points()
-        if not points:
-            return None
-
-        min_lat = min(p.latitude for p in points)
-        max_lat = max(p.latitude for p in points)
-        min_lon = min(p.longitude for p in points)
-        max_lon = max(p.longitude for p in points)
-
-        return (min_lat, min_lon, max_lat, max_lon)
+        return self.stats.bounds
 
     def get_center(self) -> tuple[float, float] | None:
         """中心座標を取得"""
-        bounds = self.get_bounds()
-        if bounds is None:
-            return None
-
-        min_lat, min_lon, max_lat, max_lon = bounds
-        center_lat = (min_lat + max_lat) / 2
-        center_lon = (min_lon + max_lon) / 2
-
-        return (center_lat, center_lon)
+        return self.stats.center
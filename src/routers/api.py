@@ -1,26 +1,85 @@
 """APIルーター"""
 
-from fastapi import APIRouter, Query
+import asyncio
+from typing import Any
 
-from src.services.geocoding import get_geocoding_service, AddressResult
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+
+from src.dependencies import (
+    cancel_on_disconnect,
+    conditional_json_response,
+    conditional_response,
+)
+from src.models.geocoding import AddressResult
+from src.services.address_timeline import (
+    DEFAULT_SAMPLE_INTERVAL_M,
+    stream_address_timeline,
+)
+from src.services.geocoding import (
+    ANONYMOUS_CLIENT,
+    GeocodingPriority,
+    GeocodingQueueFull,
+    get_geocoding_service,
+)
+from src.services.parse_pool import ParsePoolBusy
+from src.services.point_encoding import BINARY_MEDIA_TYPE, prefers_binary
+from src.services.track_store import StoredTrack, get_track_store
 
 
 router = APIRouter(prefix="/api", tags=["api"])
 
 
+def _client_key(request: Request) -> str:
+    """公平キューの単位となるクライアント（nginxが付けるX-Real-IP、なければ接続元）"""
+    real_ip = request.headers.get("x-real-ip")
+    if real_ip:
+        return real_ip
+    if request.client is not None:
+        return request.client.host
+    return ANONYMOUS_CLIENT
+
+
 @router.get("/reverse-geocode")
 async def reverse_geocode(
+    request: Request,
     lat: float = Query(..., description="緯度"),
     lng: float = Query(..., description="経度"),
+    session: str | None = Query(
+        default=None,
+        max_length=64,
+        description="セッション（最新のリクエストのみ処理）",
+    ),
 ) -> dict[str, str | None]:
     """
     逆ジオコーディング（緯度経度から住所を取得）
 
     サーバー側でリクエストをキューイングし、1秒に1回以上の
     Nominatim APIへのリクエストを行わないようにしています。
+    住所タイムラインの一括取得より優先して処理し、クライアントが切断した
+    リクエストや、同じsessionの新しいリクエストで置き換えられたリクエストは
+    Nominatimに問い合わせずに破棄します。
+    クライアントごとに公平に順番を回し、キューが上限に達している場合は
+    429（Retry-After付き）を返します。
     """
     service = get_geocoding_service()
-    result: AddressResult | None = await service.get_address(lat, lng)
+    try:
+        result: AddressResult | None = await cancel_on_disconnect(
+            request,
+            service.get_address(
+                lat,
+                lng,
+                priority=GeocodingPriority.INTERACTIVE,
+                session=session,
+                client=_client_key(request),
+            ),
+        )
+    except GeocodingQueueFull as e:
+        raise HTTPException(
+            status_code=429,
+            detail="住所の取得が混み合っています",
+            headers={"Retry-After": str(e.retry_after)},
+        ) from e
 
     if result is None:
         return {
@@ -34,3 +93,153 @@ async def reverse_geocode(
         "city": result.city or None,
         "road": result.road or None,
     }
+
+
+@router.get("/cache-stats")
+def get_cache_stats() -> dict[str, dict[str, Any]]:
+    """キャッシュの統計情報（エントリ数・メモリ使用量の概算・ヒット率など）"""
+    geocoding = get_geocoding_service()
+    caches = {
+        "tracks": get_track_store().cache_stats(),
+        "geocoding": geocoding.cache_stats(),
+    }
+    result = {
+        name: {**stats.model_dump(), "hit_ratio": stats.hit_ratio}
+        for name, stats in caches.items()
+    }
+    result["geocoding"]["coalesced_requests"] = geocoding.coalesced_requests
+    result["geocoding"]["skipped_requests"] = geocoding.skipped_requests
+    result["geocoding"]["queue_depth"] = geocoding.queue_depth
+    result["geocoding"]["client_queue_depths"] = geocoding.client_queue_depths()
+    return result
+
+
+async def _get_stored_track(track_id: str) -> StoredTrack:
+    """
+    保存済みトラックを取得（なければ404）
+
+    メモリになければディスクから復元する（パースはプロセスプールで行い、
+    混み合っている場合は503）。
+    """
+    try:
+        stored = await get_track_store().get(track_id)
+    except ParsePoolBusy as e:
+        raise HTTPException(
+            status_code=503,
+            detail="トラックの読み込みが混み合っています",
+            headers={"Retry-After": str(e.retry_after)},
+        ) from e
+    if stored is None:
+        raise HTTPException(status_code=404, detail="トラックが見つかりません")
+    return stored
+
+
+@router.get("/tracks/{track_id}")
+async def get_track(request: Request, track_id: str) -> Response:
+    """トラックのメタデータ（境界・時間範囲・集計値・簡略化レベル）"""
+    stored = await _get_stored_track(track_id)
+    # レスポンスの生成はイベントループを止めないよう別スレッドで行う
+    return await asyncio.to_thread(
+        conditional_json_response, request, stored.etag("meta"), stored.metadata
+    )
+
+
+@router.get("/tracks/{track_id}/points")
+async def get_track_points(
+    request: Request,
+    track_id: str,
+    zoom: int | None = Query(default=None, ge=0, le=22, description="ズーム"),
+) -> Response:
+    """
+    トラックのポイント列
+
+    zoomを指定すると、そのズーム帯の簡略化レベルのポイントのみを返します。
+    Acceptでバイナリ形式（application/vnd.gpx-viewer.points）を指定すると
+    int32差分列のコンパクトな形式で返し、それ以外はJSONで返します
+    （バイナリ形式で表せない値を含むトラックは常にJSONで返します）。
+    """
+    stored = await _get_stored_track(track_id)
+    return await asyncio.to_thread(_points_response, request, stored, zoom)
+
+
+def _points_response(
+    request: Request, stored: StoredTrack, zoom: int | None
+) -> Response:
+    """ポイント列のレスポンス（Acceptに応じてバイナリ形式かJSON）"""
+    variant = "points" if zoom is None else f"points-z{zoom}"
+
+    if prefers_binary(request.headers.get("accept")):
+        try:
+            return conditional_response(
+                request,
+                stored.etag(f"{variant}-bin"),
+                lambda: stored.points_binary(zoom),
+                media_type=BINARY_MEDIA_TYPE,
+                vary="Accept",
+            )
+        except (ValueError, OverflowError):
+            # 差分がint32に収まらない値（時刻の間隔・高度など）を含む場合はJSONで返す
+            pass
+    return conditional_json_response(
+        request,
+        stored.etag(variant),
+        lambda: stored.points_payload(zoom),
+        vary="Accept",
+    )
+
+
+@router.get("/tracks/{track_id}/levels")
+async def get_track_levels(request: Request, track_id: str) -> Response:
+    """
+    簡略化レベルとポイントの対応
+
+    point_levelsはポイントごとに含まれる最も粗いレベルの番号で、レベルkの
+    ポリラインは値がk以下のポイントを順に結んだものです（座標は/pointsで
+    取得したものを使い、ズーム帯ごとに取得し直す必要はありません）。
+    """
+    stored = await _get_stored_track(track_id)
+    return await asyncio.to_thread(
+        conditional_json_response,
+        request,
+        stored.etag("levels"),
+        stored.levels_payload,
+    )
+
+
+@router.get("/tracks/{track_id}/profile")
+async def get_track_profile(request: Request, track_id: str) -> Response:
+    """標高グラフ・区間速度の系列"""
+    stored = await _get_stored_track(track_id)
+    return await asyncio.to_thread(
+        conditional_json_response,
+        request,
+        stored.etag("profile"),
+        stored.profile_payload,
+    )
+
+
+@router.get("/tracks/{track_id}/addresses")
+async def get_track_addresses(
+    request: Request,
+    track_id: str,
+    interval: float = Query(
+        default=DEFAULT_SAMPLE_INTERVAL_M,
+        ge=50,
+        le=50_000,
+        description="代表点の間隔(m)",
+    ),
+) -> StreamingResponse:
+    """
+    住所タイムライン（NDJSON）
+
+    トラックに沿った代表点の住所を1行1件のJSONで返します。
+    キャッシュ済みの住所は即座に、それ以外は取得でき次第返します。
+    """
+    stored = await _get_stored_track(track_id)
+    return StreamingResponse(
+        stream_address_timeline(
+            stored, get_geocoding_service(), interval, client=_client_key(request)
+        ),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-store", "X-Accel-Buffering": "no"},
+    )
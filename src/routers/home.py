@@ -1,14 +1,45 @@
 """ホームページルーター"""
 
-from datetime import datetime, timezone, timedelta
+import asyncio
+import hashlib
+from contextlib import AsyncExitStack, nullcontext
+from email.utils import formatdate
 from pathlib import Path
-
-from fastapi import APIRouter, Request, UploadFile, File
-from fastapi.responses import HTMLResponse
 from typing import Any
 
-from src.dependencies import TemplateResponse
+from fastapi import APIRouter, Request
+from fastapi.responses import HTMLResponse, RedirectResponse, Response
+from pydantic import BaseModel, ConfigDict, Field
+from starlette.requests import ClientDisconnect
+
+from src.config import settings
+from src.dependencies import (
+    TemplateResponse,
+    etag_matches,
+    not_modified_since,
+    render_template,
+)
+from src.services.compression import (
+    DecompressionLimitExceeded,
+    get_decompression_limits,
+    is_supported_filename,
+)
 from src.services.gpx_parser import GpxParser, GpxParseError
+from src.services.metrics import UPLOAD_BYTES, UPLOAD_POINTS
+from src.services.parse_pool import ParsePoolBusy, get_parse_pool
+from src.services.timing import stage
+from src.services.track_store import (
+    FailedFile,
+    StoredTrack,
+    failed_members,
+    get_track_store,
+)
+from src.services.upload import (
+    SpooledFile,
+    UploadError,
+    UploadTooLarge,
+    spool_multipart,
+)
 
 # サンプルGPXファイルのパス
 SAMPLE_GPX_PATH = Path(__file__).parent.parent / "static" / "samples" / "sample.gpx"
@@ -16,52 +47,83 @@ SAMPLE_GPX_PATH = Path(__file__).parent.parent / "static" / "samples" / "sample.
 
 router = APIRouter()
 
-# 日本時間
-JST = timezone(timedelta(hours=9))
+# デモページのタイトル・ファイル名
+DEMO_TITLE = "デモ - 東京タワー周辺散策"
+DEMO_FILENAME = "サンプル.gpx"
+
+# アップロードのエラーメッセージ
+SELECT_GPX = "GPXファイル（.gpx / .gpx.gz / .gpx.bz2 / .zip）を選択してください"
+DECOMPRESSED_TOO_LARGE = "圧縮ファイルの展開後のサイズが大きすぎます"
+PARSE_FAILED = "GPXファイルの解析に失敗しました"
+TRACK_LOAD_BUSY = (
+    "トラックの読み込みが混み合っています。しばらくしてから再度お試しください"
+)
+
+
+class DemoPage(BaseModel):
+    """事前にレンダリングしたデモページ"""
+
+    model_config = ConfigDict(frozen=True)
+
+    body: bytes = Field(description="レンダリング済みHTML")
+    etag: str = Field(description="ETag")
+    last_modified: float = Field(description="サンプルファイルの更新時刻（UNIX時刻）")
+
+    def headers(self) -> dict[str, str]:
+        """キャッシュ関連のレスポンスヘッダー"""
+        return {
+            "ETag": self.etag,
+            "Last-Modified": formatdate(self.last_modified, usegmt=True),
+            "Cache-Control": "public, max-age=300",
+        }
+
+
+_demo_page: DemoPage | None = None
 
 
-def parse_iso_time(time_str: str) -> datetime | None:
-    """ISO8601形式の時刻文字列をdatetimeに変換"""
+def build_demo_page() -> DemoPage:
+    """サンプルGPXをパースしてデモページをレンダリング"""
+    content = SAMPLE_GPX_PATH.read_bytes()
+    gpx_data = GpxParser().parse(content)
+    stored = get_track_store().put(content, gpx_data, DEMO_FILENAME, pinned=True)
+
+    html = render_template(
+        "map.html", title=DEMO_TITLE, gpx_data=stored.metadata(), error=None
+    )
+    body = html.encode("utf-8")
+    return DemoPage(
+        body=body,
+        etag=f'"{hashlib.sha256(body).hexdigest()[:32]}"',
+        last_modified=SAMPLE_GPX_PATH.stat().st_mtime,
+    )
+
+
+def get_demo_page() -> DemoPage:
+    """デモページを取得（未生成なら生成してキャッシュ）"""
+    global _demo_page
+    if _demo_page is None:
+        _demo_page = build_demo_page()
+    return _demo_page
+
+
+def prepare_demo_page() -> None:
+    """起動時にデモページを生成（失敗時はリクエスト時に再試行してエラー表示）"""
     try:
-        # Zで終わる場合はUTC
-        if time_str.endswith("Z"):
-            dt = datetime.fromisoformat(time_str.replace("Z", "+00:00"))
-        else:
-            dt = datetime.fromisoformat(time_str)
-        return dt
-    except (ValueError, TypeError):
-        return None
-
-
-def get_time_range(
-    points: list[Any],
-) -> dict[str, str] | None:
-    """ポイントリストから時間範囲を取得"""
-    times: list[datetime] = []
-    for p in points:
-        if p.time:
-            dt = parse_iso_time(p.time)
-            if dt:
-                times.append(dt)
-
-    if not times:
-        return None
-
-    min_time = min(times)
-    max_time = max(times)
-
-    # 日本時間に変換
-    min_time_jst = min_time.astimezone(JST)
-    max_time_jst = max_time.astimezone(JST)
-
-    return {
-        "start": min_time.isoformat(),
-        "end": max_time.isoformat(),
-        "start_local": min_time_jst.strftime("%Y年%m月%d日 %H:%M:%S"),
-        "end_local": max_time_jst.strftime("%Y年%m月%d日 %H:%M:%S"),
-        "start_date": min_time_jst.strftime("%Y-%m-%d"),
-        "start_time": min_time_jst.strftime("%H:%M:%S"),
-    }
+        get_demo_page()
+    except (OSError, GpxParseError):
+        pass
+
+
+def render_track_page(request: Request, stored: StoredTrack, title: str) -> Any:
+    """地図ページ（HTMLシェル）を表示。ポイント列はAPIから取得する"""
+    with stage("metadata"):
+        metadata = stored.metadata()
+    with stage("render"):
+        return (
+            TemplateResponse(request)
+            .add_context(title=title, gpx_data=metadata, error=None)
+            .render("map.html")
+        )
 
 
 @router.get("/", response_class=HTMLResponse)
@@ -76,11 +138,10 @@ def index(request: Request) -> Any:
 
 @router.get("/demo", response_class=HTMLResponse)
 def demo(request: Request) -> Any:
-    """サンプルGPXファイルでデモ表示"""
-    # サンプルGPXファイルを読み込み
+    """サンプルGPXファイルでデモ表示（起動時にレンダリング済みの内容を返す）"""
     try:
-        content = SAMPLE_GPX_PATH.read_bytes()
-    except Exception:
+        page = get_demo_page()
+    except OSError:
         return (
             TemplateResponse(request)
             .add_context(
@@ -90,11 +151,6 @@ def demo(request: Request) -> Any:
             )
             .render("index.html")
         )
-
-    # GPXパース
-    parser = GpxParser()
-    try:
-        gpx_data = parser.parse(content)
     except GpxParseError as e:
         return (
             TemplateResponse(request)
@@ -106,143 +162,226 @@ def demo(request: Request) -> Any:
             .render("index.html")
         )
 
-    # ポイント取得
-    points = gpx_data.get_all_points()
-
-    # 地図表示用データ作成
-    center = gpx_data.get_center()
-    bounds = gpx_data.get_bounds()
-    time_range = get_time_range(points)
-
-    # JavaScript用にポイントデータを変換
-    points_for_js = [
-        {
-            "lat": p.latitude,
-            "lng": p.longitude,
-            "ele": p.elevation,
-            "time": p.time,
-        }
-        for p in points
-    ]
-
-    return (
+    headers = page.headers()
+    if etag_matches(request, page.etag):
+        return Response(status_code=304, headers=headers)
+    if "if-none-match" not in request.headers and not_modified_since(
+        request, page.last_modified
+    ):
+        return Response(status_code=304, headers=headers)
+    return HTMLResponse(page.body, headers=headers)
+
+
+def upload_error(
+    request: Request,
+    message: str,
+    status_code: int = 200,
+    headers: dict[str, str] | None = None,
+) -> Any:
+    """アップロードフォームにエラーを表示"""
+    response = (
         TemplateResponse(request)
-        .add_context(
-            title="デモ - 東京タワー周辺散策",
-            gpx_data={
-                "filename": "サンプル.gpx",
-                "point_count": len(points),
-                "center": {"lat": center[0], "lng": center[1]} if center else None,
-                "bounds": {
-                    "min_lat": bounds[0],
-                    "min_lng": bounds[1],
-                    "max_lat": bounds[2],
-                    "max_lng": bounds[3],
-                }
-                if bounds
-                else None,
-                "points": points_for_js,
-                "time_range": time_range,
-            },
-            error=None,
-        )
-        .render("map.html")
+        .add_context(title="エラー", gpx_data=None, error=message)
+        .render("index.html")
     )
+    response.status_code = status_code
+    response.headers.update(headers or {})
+    return response
 
 
 @router.post("/upload", response_class=HTMLResponse)
-async def upload_gpx(request: Request, file: UploadFile = File(...)) -> Any:
-    """GPXファイルアップロード処理"""
-    # ファイル名チェック
-    if file.filename is None or not file.filename.lower().endswith(".gpx"):
-        return (
-            TemplateResponse(request)
-            .add_context(
-                title="エラー",
-                gpx_data=None,
-                error="GPXファイル（.gpx）を選択してください",
+async def upload_gpx(request: Request) -> Any:
+    """
+    GPXファイルアップロード処理
+
+    リクエストボディはチャンク単位で一時ファイルに書き出し（全体をメモリに
+    読み込まない）、max_upload_sizeを超えた時点で413を返す。
+    パースは一時ファイルから直接読み込んで別プロセスで行う。
+    複数のファイルを選択した場合は並列にパースし、1つの地図にまとめて表示する。
+    """
+    async with AsyncExitStack() as stack:
+        try:
+            with stage("read"):
+                spooled = await stack.enter_async_context(
+                    spool_multipart(
+                        request.headers,
+                        request.stream(),
+                        settings.upload_spool_dir,
+                        settings.max_upload_size,
+                        get_decompression_limits(),
+                    )
+                )
+        except UploadTooLarge as e:
+            return upload_error(
+                request,
+                f"ファイルが大きすぎます（上限 {e.max_size // (1024 * 1024)}MB）",
+                status_code=413,
             )
-            .render("index.html")
-        )
-
-    # ファイル読み込み
-    try:
-        content = await file.read()
-    except Exception:
-        return (
-            TemplateResponse(request)
-            .add_context(
-                title="エラー",
-                gpx_data=None,
-                error="ファイルの読み込みに失敗しました",
+        except DecompressionLimitExceeded:
+            return upload_error(request, DECOMPRESSED_TOO_LARGE, status_code=413)
+        except (UploadError, OSError, ClientDisconnect):
+            return upload_error(request, "ファイルの読み込みに失敗しました")
+
+        # 一時ファイルはwithブロックを抜けると削除される（保存時に移動したものを除く）
+        files = [f for f in spooled if f.field_name == "file" and f.filename]
+        if not files:
+            return upload_error(request, SELECT_GPX)
+        if len(files) > settings.max_batch_files:
+            return upload_error(
+                request,
+                f"一度にアップロードできるのは{settings.max_batch_files}ファイルまでです",
             )
-            .render("index.html")
-        )
+        if len(files) > 1:
+            return await _store_batch(request, files)
+
+        try:
+            stored = await ingest_file(files[0])
+        except UploadRejected as e:
+            return upload_error(request, e.message, e.status_code, e.headers)
+        # トラックページへリダイレクト（リロードしても再アップロード不要）
+        return RedirectResponse(f"/tracks/{stored.track_id}", status_code=303)
+
+
+class UploadRejected(Exception):
+    """アップロードしたファイルを取り込めない"""
+
+    def __init__(
+        self,
+        message: str,
+        status_code: int = 200,
+        headers: dict[str, str] | None = None,
+    ) -> None:
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+        self.headers = headers
+
+
+async def ingest_file(
+    file: SpooledFile, slots: asyncio.Semaphore | None = None
+) -> StoredTrack:
+    """
+    一時ファイルに書き出したGPXをパースしてトラックストアに保存
+
+    slotsを指定した場合は、その範囲でパースを同時に実行する。
+
+    Raises:
+        UploadRejected: 取り込めない場合（エラーページのステータス等を含む）
+    """
+    # ファイル名チェック
+    if not is_supported_filename(file.filename):
+        raise UploadRejected(SELECT_GPX)
+
+    # 同じ内容を再アップロードした場合はパースを省略
+    store = get_track_store()
+    cached = store.lookup(file.path, track_id=file.sha256)
+    if cached is not None:
+        return cached
+    UPLOAD_BYTES.observe(file.size)
 
-    # GPXパース
-    parser = GpxParser()
+    # GPXパース・派生データの計算（イベントループを止めないよう別プロセスで実行）
     try:
-        gpx_data = parser.parse(content)
+        async with slots or nullcontext():
+            with stage("parse"):
+                parsed = await get_parse_pool().parse_track(file.path)
+    except ParsePoolBusy as e:
+        raise UploadRejected(
+            "アップロードが混み合っています。しばらくしてから再度お試しください",
+            status_code=503,
+            headers={"Retry-After": str(e.retry_after)},
+        ) from e
+    except DecompressionLimitExceeded as e:
+        raise UploadRejected(DECOMPRESSED_TOO_LARGE, status_code=413) from e
     except GpxParseError as e:
-        return (
-            TemplateResponse(request)
-            .add_context(
-                title="エラー",
-                gpx_data=None,
-                error=f"GPXファイルの解析に失敗しました: {e}",
-            )
-            .render("index.html")
-        )
+        raise UploadRejected(f"{PARSE_FAILED}: {e}") from e
+
+    # 集計（パース時に計算済みのセグメント集計の合算）
+    gpx_data = parsed.gpx_data
+    with stage("stats"):
+        point_count = gpx_data.point_count
+    UPLOAD_POINTS.observe(point_count)
 
     # ポイント数チェック
-    points = gpx_data.get_all_points()
-    if not points:
+    if point_count == 0:
+        raise UploadRejected("GPXファイルに位置情報が含まれていません")
+
+    with stage("store"):
+        return store.put_file(
+            file.path,
+            file.sha256,
+            gpx_data,
+            file.filename,
+            profile=parsed.profile,
+            pyramid=parsed.pyramid,
+            failed=failed_members(file.filename, parsed.failed),
+        )
+
+
+async def _store_batch(request: Request, files: list[SpooledFile]) -> Any:
+    """
+    複数のファイルを並列にパースし、1つにまとめたトラックとして保存
+
+    取り込めなかったファイルはまとめたトラックのページにエラーとして表示する
+    （すべて失敗した場合のみアップロードフォームにエラーを表示）。
+    想定外の例外も、そのファイルだけの失敗として扱う。
+    """
+    # 同じ内容のファイルは1つだけ取り込む
+    unique: dict[str, SpooledFile] = {}
+    for file in files:
+        unique.setdefault(file.sha256, file)
+    # 1リクエストでパースのプロセスプールを占有しないよう同時実行数を制限
+    slots = asyncio.Semaphore(max(1, settings.parse_max_concurrency))
+
+    async def ingest(file: SpooledFile) -> StoredTrack | FailedFile:
+        try:
+            return await ingest_file(file, slots)
+        except UploadRejected as e:
+            return FailedFile(filename=file.filename, message=e.message)
+        except Exception:
+            # 1ファイルの想定外のエラーでまとめてのアップロード全体を失敗させない
+            return FailedFile(filename=file.filename, message=PARSE_FAILED)
+
+    results = await asyncio.gather(*(ingest(file) for file in unique.values()))
+    members = [result for result in results if isinstance(result, StoredTrack)]
+    failed = [result for result in results if isinstance(result, FailedFile)]
+    if not members:
+        return upload_error(
+            request,
+            "取り込めるファイルがありませんでした: "
+            + "、".join(f"{item.filename}（{item.message}）" for item in failed),
+        )
+
+    with stage("store"):
+        stored = get_track_store().put_batch(members, failed)
+    # まとめたトラックの派生データはイベントループを止めないよう別スレッドで計算
+    with stage("derive"):
+        await asyncio.to_thread(stored.compute_derived)
+    return RedirectResponse(f"/tracks/{stored.track_id}", status_code=303)
+
+
+@router.get("/tracks/{track_id}", response_class=HTMLResponse)
+async def track_page(request: Request, track_id: str) -> Any:
+    """
+    保存済みトラックの地図表示
+
+    メモリになければディスクから復元する（パースはプロセスプールで行う）。
+    """
+    try:
+        stored = await get_track_store().get(track_id)
+    except ParsePoolBusy as e:
+        return upload_error(
+            request, TRACK_LOAD_BUSY, 503, {"Retry-After": str(e.retry_after)}
+        )
+    if stored is None:
         return (
             TemplateResponse(request)
             .add_context(
                 title="エラー",
                 gpx_data=None,
-                error="GPXファイルに位置情報が含まれていません",
+                error="トラックが見つかりません。もう一度アップロードしてください",
             )
             .render("index.html")
         )
 
-    # 地図表示用データ作成
-    center = gpx_data.get_center()
-    bounds = gpx_data.get_bounds()
-    time_range = get_time_range(points)
-
-    # JavaScript用にポイントデータを変換
-    points_for_js = [
-        {
-            "lat": p.latitude,
-            "lng": p.longitude,
-            "ele": p.elevation,
-            "time": p.time,
-        }
-        for p in points
-    ]
-
-    return (
-        TemplateResponse(request)
-        .add_context(
-            title="地図表示",
-            gpx_data={
-                "filename": file.filename,
-                "point_count": len(points),
-                "center": {"lat": center[0], "lng": center[1]} if center else None,
-                "bounds": {
-                    "min_lat": bounds[0],
-                    "min_lng": bounds[1],
-                    "max_lat": bounds[2],
-                    "max_lng": bounds[3],
-                }
-                if bounds
-                else None,
-                "points": points_for_js,
-                "time_range": time_range,
-            },
-            error=None,
-        )
-        .render("map.html")
-    )
+    # テンプレートのレンダリングはイベントループを止めないよう別スレッドで行う
+    return await asyncio.to_thread(render_track_page, request, stored, "地図表示")
@@ -0,0 +1,14 @@
+"""メトリクスルーター"""
+
+from fastapi import APIRouter, Response
+
+from src.services.metrics import CONTENT_TYPE, REGISTRY
+
+
+router = APIRouter(tags=["metrics"])
+
+
+@router.get("/metrics")
+def get_metrics() -> Response:
+    """Prometheusテキスト形式のメトリクス（このワーカープロセスの値）"""
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
@@ -0,0 +1,219 @@
+"""住所タイムラインサービス
+
+トラックに沿って代表点（一定距離ごと・進行方向が変わった点・セグメントの
+始点と終点）を選び、各点の住所をまとめて取得する。キャッシュ済みの住所は
+すぐに返し、残りはレート制限されたワーカーが解決した順にNDJSONで流す。
+"""
+
+import asyncio
+import json
+import math
+from collections.abc import AsyncIterator
+from enum import IntEnum
+from typing import Any, Final
+
+from src.models.gpx import MISSING_TIME
+from src.models.geocoding import AddressResult
+from src.services.geocoding import (
+    ANONYMOUS_CLIENT,
+    GeocodingPriority,
+    GeocodingService,
+)
+from src.services.track_store import StoredTrack
+
+
+# 代表点の既定の間隔（m）
+DEFAULT_SAMPLE_INTERVAL_M: Final[float] = 500.0
+# 進行方向の変化とみなす角度（度）
+HEADING_CHANGE_DEG: Final[float] = 45.0
+# 1トラックあたりの代表点の上限（超える場合は間隔を広げ、優先度の低い点から間引く）
+MAX_SAMPLES: Final[int] = 1000
+# 1トラックあたり同時にキューに入れる問い合わせの数（クライアントごとの上限より小さく）
+MAX_PENDING_LOOKUPS: Final[int] = 8
+
+
+class _SampleKind(IntEnum):
+    """代表点の種類（値が小さいほど上限を超えたときに優先して残す）"""
+
+    # セグメントの始点と終点
+    ENDPOINT = 0
+    # 進行方向が変わった点
+    TURN = 1
+    # 一定距離ごとの点
+    INTERVAL = 2
+
+
+def _bearing(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """2点間の方位角（度、北=0で時計回り）"""
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    d_lambda = math.radians(lon2 - lon1)
+    y = math.sin(d_lambda) * math.cos(phi2)
+    x = math.cos(phi1) * math.sin(phi2) - (
+        math.sin(phi1) * math.cos(phi2) * math.cos(d_lambda)
+    )
+    return math.degrees(math.atan2(y, x)) % 360
+
+
+def _angle_difference(a: float, b: float) -> float:
+    """2つの方位角の差（0〜180度）"""
+    diff = abs(a - b) % 360
+    return 360 - diff if diff > 180 else diff
+
+
+def _cap_samples(samples: list[tuple[int, _SampleKind]], max_samples: int) -> list[int]:
+    """
+    代表点をmax_samples件以下に間引く
+
+    種類の優先度の高い順に残し、収まりきらない種類はその中から等間隔に選ぶ。
+    """
+    if max_samples <= 0 or len(samples) <= max_samples:
+        return [index for index, _ in samples]
+
+    kept: list[int] = []
+    for kind in _SampleKind:
+        group = [index for index, k in samples if k == kind]
+        room = max_samples - len(kept)
+        if len(group) > room:
+            group = [group[i * len(group) // room] for i in range(room)]
+        kept.extend(group)
+    return sorted(kept)
+
+
+def sample_address_points(
+    stored: StoredTrack,
+    interval_m: float = DEFAULT_SAMPLE_INTERVAL_M,
+    heading_change_deg: float = HEADING_CHANGE_DEG,
+    max_samples: int = MAX_SAMPLES,
+) -> list[int]:
+    """
+    住所を取得する代表点のインデックスを選ぶ
+
+    - 各セグメントの始点と終点
+    - 直前の代表点からinterval_m以上進んだ点
+    - 直前の代表点からinterval_mの1/4以上進み、進行方向が代表点での
+      進行方向からheading_change_deg以上変わった点
+
+    max_samplesを超える場合は間隔を広げ、それでも超える分は一定距離ごとの点、
+    進行方向が変わった点、始点と終点の順に間引く。
+    """
+    distances = stored.profile.distances
+    total_distance = stored.profile.total_distance_m
+    if max_samples > 0 and total_distance / interval_m > max_samples:
+        interval_m = total_distance / max_samples
+    min_leg = interval_m / 4
+
+    latitudes = stored.columns.latitudes
+    longitudes = stored.columns.longitudes
+    samples: list[tuple[int, _SampleKind]] = []
+    offset = 0
+    for segment in stored.gpx_data.iter_segments():
+        count = len(segment.latitudes)
+        if count == 0:
+            continue
+        start, end = offset, offset + count - 1
+        offset += count
+
+        samples.append((start, _SampleKind.ENDPOINT))
+        anchor = start
+        reference: float | None = None
+        tail = start
+        for i in range(start + 1, end):
+            # 進行方向はmin_leg以上手前の点からの方位角で求める（GPSの揺れを除く）
+            while distances[i] - distances[tail + 1] >= min_leg:
+                tail += 1
+            heading: float | None = None
+            if distances[i] - distances[tail] >= min_leg:
+                heading = _bearing(
+                    latitudes[tail], longitudes[tail], latitudes[i], longitudes[i]
+                )
+                if reference is None:
+                    reference = heading
+
+            travelled = distances[i] - distances[anchor]
+            turned = (
+                heading is not None
+                and reference is not None
+                and travelled >= min_leg
+                and _angle_difference(heading, reference) >= heading_change_deg
+            )
+            if travelled >= interval_m or turned:
+                kind = _SampleKind.TURN if turned else _SampleKind.INTERVAL
+                samples.append((i, kind))
+                anchor = i
+                reference = heading
+        if end != start:
+            samples.append((end, _SampleKind.ENDPOINT))
+
+    return _cap_samples(samples, max_samples)
+
+
+def _timeline_entry(
+    stored: StoredTrack, index: int, address: AddressResult | None
+) -> dict[str, Any]:
+    """タイムラインの1件分のデータ"""
+    columns = stored.columns
+    epoch_ms = columns.times[index]
+    return {
+        "index": index,
+        "lat": columns.latitudes[index],
+        "lng": columns.longitudes[index],
+        "distance_m": round(stored.profile.distances[index], 1),
+        "time": None if epoch_ms == MISSING_TIME else epoch_ms,
+        "address": address.model_dump() if address is not None else None,
+    }
+
+
+def _ndjson_line(entry: dict[str, Any]) -> bytes:
+    """NDJSONの1行"""
+    return json.dumps(entry, ensure_ascii=False).encode("utf-8") + b"\n"
+
+
+async def stream_address_timeline(
+    stored: StoredTrack,
+    service: GeocodingService,
+    interval_m: float = DEFAULT_SAMPLE_INTERVAL_M,
+    client: str = ANONYMOUS_CLIENT,
+) -> AsyncIterator[bytes]:
+    """
+    代表点の住所をNDJSONで順次返す
+
+    キャッシュ済みの点を先にまとめて返し、残りは画面操作の問い合わせより
+    低い優先度で取得し、解決した順に返す。
+    同時にキューに入れるのはMAX_PENDING_LOOKUPS件までとし、1つのトラックで
+    キューを占有しないようにする。
+    呼び出し元が切断した場合は未完了の取得を取り消す。
+    代表点の選択（初回は距離プロファイルの計算を含む）は長いトラックでは数秒
+    かかるため、イベントループを止めないよう別スレッドで行う。
+    """
+    indices = await asyncio.to_thread(sample_address_points, stored, interval_m)
+    columns = stored.columns
+    slots = asyncio.Semaphore(MAX_PENDING_LOOKUPS)
+
+    async def resolve(index: int) -> tuple[int, AddressResult | None]:
+        lat, lng = columns.latitudes[index], columns.longitudes[index]
+        try:
+            async with slots:
+                address = await service.get_address(
+                    lat, lng, priority=GeocodingPriority.BACKGROUND, client=client
+                )
+            return index, address
+        except Exception:
+            return index, None
+
+    pending: list[asyncio.Task[tuple[int, AddressResult | None]]] = []
+    try:
+        for index in indices:
+            lat, lng = columns.latitudes[index], columns.longitudes[index]
+            cached = await service.get_cached(lat, lng)
+            if cached is not None:
+                yield _ndjson_line(_timeline_entry(stored, index, cached))
+            else:
+                pending.append(asyncio.ensure_future(resolve(index)))
+
+        for next_done in asyncio.as_completed(pending):
+            index, address = await next_done
+            yield _ndjson_line(_timeline_entry(stored, index, address))
+    finally:
+        for task in pending:
+            task.cancel()
@@ -0,0 +1,133 @@
+"""プロセス内キャッシュ（LRU + バイト数/エントリ数上限 + TTL）"""
+
+import math
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from typing import Generic, TypeVar
+
+from pydantic import BaseModel, ConfigDict, Field
+
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class CacheStats(BaseModel):
+    """キャッシュの統計情報"""
+
+    model_config = ConfigDict(frozen=True)
+
+    entries: int = Field(description="エントリ数")
+    size_bytes: int = Field(description="使用中のバイト数（概算）")
+    max_bytes: int | None = Field(default=None, description="バイト数の上限")
+    max_entries: int | None = Field(default=None, description="エントリ数の上限")
+    hits: int = Field(description="ヒット数")
+    misses: int = Field(description="ミス数")
+    evictions: int = Field(description="上限超過による追い出し数")
+    expirations: int = Field(default=0, description="TTL切れによる破棄数")
+
+    @property
+    def hit_ratio(self) -> float:
+        """ヒット率（参照がなければ0）"""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class LRUCache(Generic[K, V]):
+    """
+    上限付きのLRUキャッシュ（スレッドセーフ）
+
+    - 値のサイズはsizeofで見積もり、合計がmax_bytesを超えたら古いものから破棄
+    - エントリ数がmax_entriesを超えた場合も古いものから破棄
+    - ttl（秒）を指定すると、保存から一定時間経過したエントリは取得時に破棄
+    - 上限より大きい値は保持しない
+    """
+
+    def __init__(
+        self,
+        max_bytes: int | None = None,
+        sizeof: Callable[[V], int] | None = None,
+        max_entries: int | None = None,
+        ttl: float | None = None,
+    ) -> None:
+        self._max_bytes = max_bytes
+        self._max_entries = max_entries
+        self._sizeof = sizeof
+        self._ttl = ttl
+        # 値・サイズ・有効期限（monotonic時刻）
+        self._entries: OrderedDict[K, tuple[V, int, float]] = OrderedDict()
+        self._size_bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: K) -> bool:
+        return key in self._entries
+
+    def get(self, key: K) -> V | None:
+        """値を取得（ヒット時は最近使用したものとして扱う）"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[2] <= time.monotonic():
+                # TTL切れ
+                del self._entries[key]
+                self._size_bytes -= entry[1]
+                self._expirations += 1
+                entry = None
+            if entry is None:
+                self._misses += 1
+                return None
+            self._hits += 1
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key: K, value: V) -> None:
+        """値を保存（上限を超えたら古いものから破棄）"""
+        size = self._sizeof(value) if self._sizeof is not None else 0
+        expires = time.monotonic() + self._ttl if self._ttl is not None else math.inf
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size_bytes -= previous[1]
+            if self._max_bytes is not None and size > self._max_bytes:
+                return
+
+            self._entries[key] = (value, size, expires)
+            self._size_bytes += size
+            while self._over_limit():
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self._size_bytes -= evicted_size
+                self._evictions += 1
+
+    def _over_limit(self) -> bool:
+        """上限を超えているか"""
+        if self._max_bytes is not None and self._size_bytes > self._max_bytes:
+            return True
+        return self._max_entries is not None and len(self._entries) > self._max_entries
+
+    def clear(self) -> None:
+        """全エントリを破棄（統計はそのまま）"""
+        with self._lock:
+            self._entries.clear()
+            self._size_bytes = 0
+
+    def stats(self) -> CacheStats:
+        """統計情報を取得"""
+        with self._lock:
+            return CacheStats(
+                entries=len(self._entries),
+                size_bytes=self._size_bytes,
+                max_bytes=self._max_bytes,
+                max_entries=self._max_entries,
+                hits=self._hits,
+                misses=self._misses,
+                evictions=self._evictions,
+                expirations=self._expirations,
+            )
@@ -0,0 +1,291 @@
+"""圧縮されたGPXの展開
+
+.gpx.gz・.gpx.bz2・.zip（複数のGPXを含んでもよい）のアップロードと、
+Content-Encoding: gzipのリクエストボディを少しずつ展開してパーサーに渡す。
+形式はファイル名ではなく先頭のマジックバイトで判定する（トラックストアには
+元のファイルのまま保存し、復元時も同じ方法で展開する）。
+
+展開後のサイズは、上限（max_size）と圧縮後のサイズ×max_ratioの小さい方までに
+制限する（zip bomb対策）。小さなファイルは圧縮率が高くなりやすいため、
+RATIO_FLOOR_BYTESまでは圧縮率を問わない。
+
+zip内の一部の.gpxが壊れている・暗号化されている等で読めない場合は残りを取り込み、
+読めなかったものを名前付きで返す。
+"""
+
+import bz2
+import gzip
+import lzma
+import zipfile
+import zlib
+from collections.abc import AsyncIterable, AsyncIterator, Callable, Iterator
+from contextlib import contextmanager
+from functools import partial
+from pathlib import Path
+from typing import IO, Final, cast
+
+from pydantic import BaseModel, ConfigDict, Field
+
+from src.config import settings
+from src.models.gpx import GpxData
+from src.services.gpx_parser import STREAM_CHUNK_SIZE, GpxParseError, GpxParser
+
+
+# 受け付けるファイル名の拡張子
+SUPPORTED_SUFFIXES: Final[tuple[str, ...]] = (".gpx", ".gpx.gz", ".gpx.bz2", ".zip")
+# 圧縮率を問わない展開後のサイズ
+RATIO_FLOOR_BYTES: Final[int] = 1024 * 1024
+
+_GZIP_MAGIC: Final[bytes] = b"\x1f\x8b"
+_BZIP2_MAGIC: Final[bytes] = b"BZh"
+_ZIP_MAGIC: Final[bytes] = b"PK\x03\x04"
+
+# 展開中に発生する例外（暗号化されたzipのメンバーはRuntimeError、
+# deflate64等の未対応の圧縮方式はNotImplementedError）
+_DECOMPRESSION_ERRORS: Final[tuple[type[Exception], ...]] = (
+    OSError,
+    EOFError,
+    zlib.error,
+    lzma.LZMAError,
+    zipfile.BadZipFile,
+    RuntimeError,
+    NotImplementedError,
+)
+
+# GPXを読み込むストリームを開く関数
+StreamOpener = Callable[[], IO[bytes]]
+
+
+class DecompressionLimitExceeded(GpxParseError):
+    """展開後のサイズが上限を超えた"""
+
+    pass
+
+
+class FailedMember(BaseModel):
+    """zip内の.gpxのうち、取り込めなかったもの"""
+
+    model_config = ConfigDict(frozen=True)
+
+    name: str = Field(description="zip内のファイル名")
+    message: str = Field(description="エラーメッセージ")
+
+
+class DecompressionLimits(BaseModel):
+    """展開後のサイズの上限"""
+
+    model_config = ConfigDict(frozen=True)
+
+    max_size: int = Field(description="展開後のバイト数の上限")
+    max_ratio: float = Field(description="展開後のバイト数 / 圧縮後のバイト数の上限")
+
+    def budget(self, compressed_size: int) -> int:
+        """圧縮後のサイズに対する展開後のバイト数の上限"""
+        by_ratio = max(int(compressed_size * self.max_ratio), RATIO_FLOOR_BYTES)
+        return min(self.max_size, by_ratio)
+
+
+def get_decompression_limits() -> DecompressionLimits:
+    """設定の展開後のサイズの上限"""
+    return DecompressionLimits(
+        max_size=settings.max_decompressed_size,
+        max_ratio=settings.max_decompression_ratio,
+    )
+
+
+def is_supported_filename(filename: str) -> bool:
+    """受け付けるファイル名か（大文字・小文字は区別しない）"""
+    return filename.lower().endswith(SUPPORTED_SUFFIXES)
+
+
+def _limited_chunks(source: IO[bytes], budget: list[int]) -> Iterator[bytes]:
+    """
+    ストリームをチャンク単位で読み込む
+
+    budgetは複数のストリームで共有する残りバイト数（[残り]）で、
+    読み込んだ分を差し引き、足りなくなったらDecompressionLimitExceededを送出する。
+    """
+    while chunk := source.read(STREAM_CHUNK_SIZE):
+        budget[0] -= len(chunk)
+        if budget[0] < 0:
+            raise DecompressionLimitExceeded("展開後のサイズが上限を超えています")
+        yield chunk
+
+
+def _read_magic(path: Path) -> bytes:
+    """形式の判定に使う先頭のバイト列"""
+    with path.open("rb") as f:
+        return f.read(len(_ZIP_MAGIC))
+
+
+def _open_single(path: Path, magic: bytes) -> IO[bytes]:
+    """zip以外のファイルを開く（gzip・bzip2は読み込むたびに展開する）"""
+    if magic.startswith(_GZIP_MAGIC):
+        # GzipFileはIO[bytes]として型付けされていない（read等は同じ）
+        return cast(IO[bytes], gzip.open(path, "rb"))
+    if magic.startswith(_BZIP2_MAGIC):
+        return bz2.open(path, "rb")
+    return path.open("rb")
+
+
+@contextmanager
+def open_gpx_streams(
+    path: Path, limits: DecompressionLimits
+) -> Iterator[list[tuple[str, StreamOpener]]]:
+    """
+    ファイル内のGPXを読み込むストリームを開く関数を返す
+
+    zipの場合は含まれる.gpxごとの(zip内の名前, 開く関数)、それ以外は
+    (ファイル名, 開く関数)を1つ返す。zipのメンバーは開くときに暗号化や
+    圧縮方式を確認するため、開けないメンバーがあってもほかのメンバーは読める。
+
+    Raises:
+        DecompressionLimitExceeded: zipの展開後のサイズの申告値が上限を超えている場合
+        GpxParseError: 圧縮ファイルとして開けない場合
+    """
+    magic = _read_magic(path)
+    if not magic.startswith(_ZIP_MAGIC):
+        yield [(path.name, partial(_open_single, path, magic))]
+        return
+
+    try:
+        archive = zipfile.ZipFile(path)
+    except (OSError, zipfile.BadZipFile) as e:
+        raise GpxParseError(f"圧縮ファイルを開けません: {e}") from e
+
+    with archive:
+        members = [
+            info
+            for info in archive.infolist()
+            if not info.is_dir()
+            and info.filename.lower().endswith(".gpx")
+            and not info.filename.startswith("__MACOSX/")
+        ]
+        if not members:
+            raise GpxParseError("zipにGPXファイルが含まれていません")
+        # 申告値で先に判定する（実際に展開したバイト数でも制限する）
+        budget = limits.budget(path.stat().st_size)
+        if sum(info.file_size for info in members) > budget:
+            raise DecompressionLimitExceeded("展開後のサイズが上限を超えています")
+        yield [(info.filename, partial(archive.open, info)) for info in members]
+
+
+def merge_gpx(parts: list[GpxData]) -> GpxData:
+    """複数のGPXのトラックを1つのGpxDataにまとめる（作成者は最初のもの）"""
+    if len(parts) == 1:
+        return parts[0]
+    return GpxData(
+        creator=next((p.creator for p in parts if p.creator), None),
+        tracks=tuple(track for part in parts for track in part.tracks),
+    )
+
+
+def _parse_stream(open_stream: StreamOpener, budget: list[int]) -> GpxData:
+    """
+    ストリームを開き、チャンク単位で展開しながらパース
+
+    Raises:
+        DecompressionLimitExceeded: 展開後のサイズが上限を超えた場合
+        GpxParseError: パース・展開に失敗した場合（暗号化・未対応の圧縮方式を含む）
+    """
+    try:
+        with open_stream() as stream:
+            return GpxParser().parse_chunks(_limited_chunks(stream, budget))
+    except _DECOMPRESSION_ERRORS as e:
+        raise GpxParseError(f"圧縮ファイルの展開に失敗しました: {e}") from e
+
+
+def parse_gpx_members(
+    path: Path, limits: DecompressionLimits
+) -> tuple[GpxData, list[FailedMember]]:
+    """
+    ファイル（圧縮されていてもよい）をチャンク単位で展開しながらパース
+
+    zipの場合は含まれる.gpxごとにパースし、パースできたものをまとめた結果と、
+    取り込めなかった.gpxの一覧を返す。
+
+    Raises:
+        DecompressionLimitExceeded: 展開後のサイズが上限を超えた場合
+        GpxParseError: パース・展開に失敗した場合（zipはすべての.gpxが失敗した場合）
+    """
+    budget = [limits.budget(path.stat().st_size)]
+    parts: list[GpxData] = []
+    failed: list[FailedMember] = []
+    with open_gpx_streams(path, limits) as streams:
+        if not _read_magic(path).startswith(_ZIP_MAGIC):
+            return _parse_stream(streams[0][1], budget), []
+        for name, open_stream in streams:
+            try:
+                parts.append(_parse_stream(open_stream, budget))
+            except DecompressionLimitExceeded:
+                raise
+            except GpxParseError as e:
+                failed.append(FailedMember(name=name, message=str(e)))
+
+    if not parts:
+        raise GpxParseError(
+            "zip内のGPXファイルを読み込めませんでした: "
+            + "、".join(f"{item.name}（{item.message}）" for item in failed)
+        )
+    return merge_gpx(parts), failed
+
+
+def parse_gpx_file(path: Path, limits: DecompressionLimits) -> GpxData:
+    """
+    ファイル（圧縮されていてもよい）をチャンク単位で展開しながらパース
+
+    zip内の取り込めなかった.gpxは除く（一覧が必要な場合はparse_gpx_members）。
+
+    Raises:
+        DecompressionLimitExceeded: 展開後のサイズが上限を超えた場合
+        GpxParseError: パース・展開に失敗した場合（zipはすべての.gpxが失敗した場合）
+    """
+    gpx_data, _ = parse_gpx_members(path, limits)
+    return gpx_data
+
+
+async def gunzip_body(
+    body: AsyncIterable[bytes], limits: DecompressionLimits
+) -> AsyncIterator[bytes]:
+    """
+    Content-Encoding: gzipのリクエストボディを展開しながら返す
+
+    1回の展開で出力するバイト数を制限するため、小さなチャンクから巨大な出力が
+    得られる場合も上限を超えた時点で止まる。
+    複数のgzipメンバーを連結したボディはすべてのメンバーを順に展開する。
+
+    Raises:
+        DecompressionLimitExceeded: 展開後のサイズが上限を超えた場合
+        GpxParseError: gzipとして展開できない場合
+    """
+    decompressor = zlib.decompressobj(wbits=zlib.MAX_WBITS | 16)
+    received = 0
+    produced = 0
+    try:
+        async for chunk in body:
+            received += len(chunk)
+            data = chunk
+            while data:
+                if decompressor.eof:
+                    # 連結された次のメンバー
+                    decompressor = zlib.decompressobj(wbits=zlib.MAX_WBITS | 16)
+                output = decompressor.decompress(data, STREAM_CHUNK_SIZE)
+                produced += len(output)
+                if produced > limits.budget(received):
+                    raise DecompressionLimitExceeded(
+                        "展開後のサイズが上限を超えています"
+                    )
+                if output:
+                    yield output
+                # メンバーの終端以降はunused_dataに残る
+                data = decompressor.unconsumed_tail or decompressor.unused_data
+        output = decompressor.flush()
+    except zlib.error as e:
+        raise GpxParseError(f"gzipの展開に失敗しました: {e}") from e
+    if not decompressor.eof:
+        raise GpxParseError("gzipのデータが途中で終わっています")
+    if output:
+        produced += len(output)
+        if produced > limits.budget(received):
+            raise DecompressionLimitExceeded("展開後のサイズが上限を超えています")
+        yield output
@@ -1,149 +1,529 @@
-"""逆ジオコーディングサービス（Nominatim API）"""
+"""逆ジオコーディングサービス（ローカル境界インデックス + Nominatim API）"""
 
 import asyncio
+import heapq
+import itertools
+import math
+import sys
 import time
-from typing import Any
+from collections.abc import Mapping, Sequence
+from dataclasses import dataclass, field
+from enum import IntEnum
+from functools import partial
+from typing import Any, Final
 
-import httpx
-from pydantic import BaseModel
+from src.config import settings
+from src.models.geocoding import AddressResult
+from src.services.cache import CacheStats, LRUCache
+from src.services.geocoding_backends import (
+    GeocodingBackend,
+    LocalGeocodingBackend,
+    NominatimBackend,
+)
+from src.services.geocoding_store import GeocodingDiskCache
+from src.services.local_geocoder import LocalGeocoder
+from src.services.metrics import (
+    GEOCODING_CACHE_HIT_RATIO,
+    GEOCODING_QUEUE_DEPTH,
+    GEOCODING_UPSTREAM_SECONDS,
+    GEOCODING_WAIT_SECONDS,
+    GEOCODING_WORKER_RESTARTS,
+)
+from src.services.rate_limiter import RateLimiter, SharedRateLimiter
 
 
-class AddressResult(BaseModel):
-    """住所結果"""
+# キャッシュキーの量子化単位（1e-5度 ≒ 1.1m、小数点5桁に相当）
+COORDINATE_QUANTUM: Final[float] = 1e-5
+# 量子化した経度の取り得る値の数（キーを1つの整数にまとめるため）
+_LNG_CELLS: Final[int] = round(360 / COORDINATE_QUANTUM) + 1
+# 1エントリあたりの固定的なオーバーヘッド（キー・OrderedDictのノード・タプル）の概算
+_ENTRY_OVERHEAD_BYTES: Final[int] = 200
+# クライアントを特定できない場合のキー
+ANONYMOUS_CLIENT: Final[str] = "-"
+# リクエストがないままこの秒数が経つとワーカーを終了する
+WORKER_IDLE_TIMEOUT: Final[float] = 60.0
 
-    prefecture: str = ""
-    city: str = ""
-    road: str = ""
+
+def quantize_coordinate(lat: float, lng: float) -> int:
+    """緯度経度を量子化した整数キーに変換（同じセルの座標は同じキー）"""
+    lat_cell = round((lat + 90) / COORDINATE_QUANTUM)
+    lng_cell = round((lng + 180) / COORDINATE_QUANTUM)
+    return lat_cell * _LNG_CELLS + lng_cell
+
+
+def estimate_address_size(result: AddressResult) -> int:
+    """キャッシュ上の住所結果の占有バイト数の概算"""
+    return (
+        sys.getsizeof(result)
+        + sys.getsizeof(result.prefecture)
+        + sys.getsizeof(result.city)
+        + sys.getsizeof(result.road)
+        + _ENTRY_OVERHEAD_BYTES
+    )
+
+
+class GeocodingQueueFull(Exception):
+    """キューが上限に達したためリクエストを受け付けられない"""
+
+    def __init__(self, retry_after: int) -> None:
+        super().__init__(f"geocoding queue is full (retry after {retry_after}s)")
+        self.retry_after = retry_after
+
+
+class GeocodingPriority(IntEnum):
+    """問い合わせの優先度（値が小さいほど先に処理する）"""
+
+    # 画面操作に応じた単発の問い合わせ（/api/reverse-geocode）
+    INTERACTIVE = 0
+    # 住所タイムラインなどの一括の問い合わせ
+    BACKGROUND = 1
+
+
+@dataclass(order=True)
+class _QueuedRequest:
+    """キュー上のリクエスト（優先度・クライアント間の公平な順番・到着順で並ぶ）"""
+
+    priority: GeocodingPriority
+    # クライアントごとの仮想開始時刻（start-time fair queuing）
+    tag: float
+    sequence: int
+    lat: float = field(compare=False)
+    lng: float = field(compare=False)
+    future: "asyncio.Future[AddressResult | None]" = field(compare=False)
+    enqueued_at: float = field(compare=False, default_factory=time.monotonic)
+
+    @property
+    def stale(self) -> bool:
+        """待っている呼び出し元がいなくなった（取り消された）か"""
+        return self.future.done()
+
+
+class _RequestQueue(asyncio.PriorityQueue[_QueuedRequest]):
+    """キュー上のエントリの優先度を変更できる優先度付きキュー"""
+
+    # PriorityQueueがエントリを保持するヒープ（_init・_put・_getで操作される）
+    _queue: list[_QueuedRequest]
+
+    def raise_priority(
+        self, request: _QueuedRequest, priority: GeocodingPriority
+    ) -> None:
+        """requestの優先度を引き上げる（取り出し済みならrequestのみ更新）"""
+        request.priority = priority
+        heapq.heapify(self._queue)
+
+
+@dataclass
+class _InFlight:
+    """取得中のキー（キュー上のリクエストと、待っている呼び出し元の数）"""
+
+    request: _QueuedRequest
+    # キューの深さを数えるクライアント（最初に問い合わせた呼び出し元）
+    client: str
+    waiters: int = 0
+
+    @property
+    def future(self) -> "asyncio.Future[AddressResult | None]":
+        """結果を待つFuture"""
+        return self.request.future
 
 
 class GeocodingService:
     """
     逆ジオコーディングサービス
 
-    - APIリクエストをキューイングして直列実行
-    - 1秒に1回以上のリクエストを行わない
+    - ローカルのバックエンドで見つかった住所はキューを経由せずすぐに返す
+    - 見つからなかった点のみリモートのバックエンド（既定はNominatim）に問い合わせる
+    - APIリクエストを優先度付きのキューに入れて直列実行（画面操作を一括処理より優先）
+    - 同じ優先度の中ではクライアントごとに重み付きで公平に順番を回す
+    - キューの深さ（全体・クライアントごと）が上限に達したら受け付けない
+    - 1秒に1回以上のリクエストを行わない（rate_limiterが全プロセス共通なら全体で）
+    - 同じキーの同時リクエストは進行中の1件にまとめる
+    - 待っている呼び出し元がいなくなったリクエストは問い合わせずに捨てる
+      （切断・キャンセル、同じセッションの新しいリクエストによる置き換え）
+    - 結果は件数上限・TTL付きのLRUキャッシュに保持
+    - disk_cacheを指定すると、ワーカー間・再起動後も共有される永続キャッシュも参照
+      （SQLiteのロック待ちでイベントループを止めないよう別スレッドで読み書き）
     """
 
-    def __init__(self) -> None:
-        self._queue: asyncio.Queue[
-            tuple[float, float, asyncio.Future[AddressResult | None]]
-        ] = asyncio.Queue()
-        self._last_request_time: float = 0.0
-        self._min_interval: float = 1.0  # 最小リクエスト間隔（秒）
+    def __init__(
+        self,
+        cache_max_entries: int,
+        cache_ttl: float,
+        disk_cache: GeocodingDiskCache | None = None,
+        rate_limiter: RateLimiter | None = None,
+        backends: Sequence[GeocodingBackend] | None = None,
+        max_queue_depth: int | None = None,
+        max_client_queue_depth: int | None = None,
+        client_weights: Mapping[str, float] | None = None,
+    ) -> None:
+        if backends is None:
+            backends = [NominatimBackend()]
+        self._backends = list(backends)
+        self._local_backends = [
+            b for b in self._backends if isinstance(b, LocalGeocodingBackend)
+        ]
+        self._remote_backends = [
+            b for b in self._backends if not isinstance(b, LocalGeocodingBackend)
+        ]
+        self._queue = _RequestQueue()
+        self._sequence = itertools.count()
+        self._max_queue_depth = max_queue_depth
+        self._max_client_queue_depth = max_client_queue_depth
+        self._client_weights = dict(client_weights or {})
+        # 公平キューの仮想時刻（最後に取り出したリクエストの開始時刻）
+        self._virtual_time = 0.0
+        # クライアント → 次のリクエストの仮想開始時刻
+        self._client_finish: dict[str, float] = {}
+        # クライアント → 取得待ちのキーの数
+        self._client_depths: dict[str, int] = {}
+        # 最小リクエスト間隔（既定はプロセス内で1秒）
+        self._rate_limiter = rate_limiter or RateLimiter(interval=1.0)
         self._worker_task: asyncio.Task[None] | None = None
-        self._client: httpx.AsyncClient | None = None
-        self._cache: dict[str, AddressResult] = {}
+        self._cache: LRUCache[int, AddressResult] = LRUCache(
+            sizeof=estimate_address_size, max_entries=cache_max_entries, ttl=cache_ttl
+        )
+        self._disk_cache = disk_cache
+        # 実行中の永続キャッシュへの書き込み（完了するまで参照を保持）
+        self._disk_writes: set[asyncio.Task[None]] = set()
+        # 取得中のキー → 結果を待つFuture
+        self._in_flight: dict[int, _InFlight] = {}
+        # セッション → 最新の呼び出しが置き換えられたことを通知するFuture
+        self._sessions: dict[str, asyncio.Future[None]] = {}
+        self._coalesced_requests = 0
+        self._skipped_requests = 0
 
     async def _ensure_worker_started(self) -> None:
         """ワーカータスクが起動していることを確認"""
-        if self._worker_task is None or self._worker_task.done():
+        previous = self._worker_task
+        if previous is None or previous.done():
+            # アイドルで終了した場合は数えず、例外で終了した場合のみ数える
+            if (
+                previous is not None
+                and not previous.cancelled()
+                and previous.exception() is not None
+            ):
+                GEOCODING_WORKER_RESTARTS.inc()
             self._worker_task = asyncio.create_task(self._worker())
 
     async def _worker(self) -> None:
         """キューからリクエストを取り出して処理するワーカー"""
         while True:
             try:
-                lat, lng, future = await asyncio.wait_for(
-                    self._queue.get(), timeout=60.0
+                request = await asyncio.wait_for(
+                    self._next_request(), timeout=WORKER_IDLE_TIMEOUT
                 )
             except asyncio.TimeoutError:
-                # 60秒間リクエストがなければワーカー終了
+                # しばらくリクエストがなければワーカー終了
                 break
 
+            # 取り消されたリクエストのために共有のスロットを消費しない
+            best = self._take_best(request)
+            if best is None:
+                continue
+
+            # レート制限: 予約したスロットの時刻まで待つ
+            await self._rate_limiter.acquire()
+
+            # 待っている間に届いた優先度の高いリクエストや、取り消しを反映する
+            best = self._take_best(best)
+            if best is None:
+                continue
+            self._virtual_time = max(self._virtual_time, best.tag)
+            GEOCODING_WAIT_SECONDS.observe(
+                time.monotonic() - best.enqueued_at, priority=best.priority.name.lower()
+            )
+
             try:
-                # レート制限: 前回のリクエストから最低1秒待つ
-                elapsed = time.time() - self._last_request_time
-                if elapsed < self._min_interval:
-                    await asyncio.sleep(self._min_interval - elapsed)
-
-                result = await self._fetch_address(lat, lng)
-                self._last_request_time = time.time()
-                future.set_result(result)
+                with GEOCODING_UPSTREAM_SECONDS.time():
+                    result = await self._fetch_address(best.lat, best.lng)
+                if not best.future.done():
+                    best.future.set_result(result)
             except Exception as e:
-                future.set_exception(e)
-            finally:
-                self._queue.task_done()
+                if not best.future.done():
+                    best.future.set_exception(e)
 
-    async def _fetch_address(self, lat: float, lng: float) -> AddressResult | None:
-        """Nominatim APIから住所を取得"""
-        if self._client is None:
-            self._client = httpx.AsyncClient(timeout=10.0)
+    async def _next_request(self) -> _QueuedRequest:
+        """取り消されていない次のリクエストを取り出す"""
+        while True:
+            request = await self._queue.get()
+            if not request.stale:
+                return request
+            self._skipped_requests += 1
 
-        try:
-            response = await self._client.get(
-                "https://nominatim.openstreetmap.org/reverse",
-                params={
-                    "format": "json",
-                    "lat": lat,
-                    "lon": lng,
-                    "zoom": 18,
-                    "addressdetails": 1,
-                    "accept-language": "ja",
-                },
-                headers={"User-Agent": "GPXMapViewer/1.0"},
-            )
-            response.raise_for_status()
-            data: dict[str, Any] = response.json()
-            address = data.get("address", {})
-
-            return AddressResult(
-                prefecture=address.get("province", "")
-                or address.get("state", "")
-                or "",
-                city=address.get("city", "")
-                or address.get("town", "")
-                or address.get("village", "")
-                or address.get("county", "")
-                or "",
-                road=address.get("road", "")
-                or address.get("pedestrian", "")
-                or address.get("footway", "")
-                or address.get("path", "")
-                or "",
-            )
-        except Exception:
-            return None
+    def _take_best(self, request: _QueuedRequest) -> _QueuedRequest | None:
+        """requestとキューの先頭のうち、取り消されておらず優先度の高い方を取り出す"""
+        best: _QueuedRequest | None = request
+        if request.stale:
+            self._skipped_requests += 1
+            best = None
+        while not self._queue.empty():
+            head = self._queue.get_nowait()
+            if head.stale:
+                self._skipped_requests += 1
+                continue
+            if best is None or head < best:
+                best, head = head, best
+            if head is not None:
+                self._queue.put_nowait(head)
+            break
+        return best
 
-    async def get_address(self, lat: float, lng: float) -> AddressResult | None:
+    async def _fetch_address(self, lat: float, lng: float) -> AddressResult | None:
+        """リモートのバックエンドに順に問い合わせ、最初に見つかった住所を返す"""
+        for backend in self._remote_backends:
+            result = await backend.reverse(lat, lng)
+            if result is not None:
+                return result
+        return None
+
+    async def get_address(
+        self,
+        lat: float,
+        lng: float,
+        priority: GeocodingPriority = GeocodingPriority.INTERACTIVE,
+        session: str | None = None,
+        client: str = ANONYMOUS_CLIENT,
+    ) -> AddressResult | None:
         """
         住所を取得（キューイングされる）
 
         Args:
             lat: 緯度
             lng: 経度
+            priority: キュー上の優先度
+            session: 呼び出し元のセッション（同じセッションの新しい呼び出しで置き換える）
+            client: 呼び出し元のクライアント（公平キューとキューの深さの単位）
 
         Returns:
-            住所結果、またはNone（エラー時）
+            住所結果、またはNone（エラー時・新しい呼び出しで置き換えられた時）
+
+        Raises:
+            GeocodingQueueFull: キューの深さが上限に達している
         """
-        # キャッシュキー（小数点5桁で丸める）
-        cache_key = f"{lat:.5f},{lng:.5f}"
+        if session is not None:
+            self._supersede(session)
+
+        # ローカルのバックエンド（オフライン、レート制限なし）
+        local = self._lookup_local(lat, lng)
+        if local is not None:
+            return local
+
+        # キャッシュキー（約1.1m単位で量子化）
+        cache_key = quantize_coordinate(lat, lng)
 
         # サーバーサイドキャッシュチェック
-        if cache_key in self._cache:
-            return self._cache[cache_key]
+        cached = await self._get_cached(cache_key)
+        if cached is not None:
+            return cached
+
+        # 同じキーの取得が進行中ならその結果を共有（上流への問い合わせを1回にまとめる）
+        in_flight = self._in_flight.get(cache_key)
+        if in_flight is not None and not in_flight.future.done():
+            self._coalesced_requests += 1
+            if priority < in_flight.request.priority:
+                # キュー上の同じエントリの優先度を引き上げる（公平キューの順番は消費しない）
+                self._queue.raise_priority(in_flight.request, priority)
+        else:
+            if not self._remote_backends:
+                return None
+            self._admit(client)
+
+            loop = asyncio.get_running_loop()
+            future: asyncio.Future[AddressResult | None] = loop.create_future()
+            # 完了時にキャッシュへ保存（待っている呼び出し元が再開する前に実行される）
+            future.add_done_callback(partial(self._on_fetched, cache_key))
+            request = self._new_request(lat, lng, priority, client, future)
+            in_flight = _InFlight(request=request, client=client)
+            self._in_flight[cache_key] = in_flight
+            self._client_depths[client] = self._client_depths.get(client, 0) + 1
+            await self._enqueue(request)
+
+        return await self._wait(in_flight, session)
 
+    def _admit(self, client: str) -> None:
+        """キューの深さの上限を確認（超える場合はGeocodingQueueFull）"""
+        client_depth = self._client_depths.get(client, 0)
+        client_full = (
+            self._max_client_queue_depth is not None
+            and client_depth >= self._max_client_queue_depth
+        )
+        queue_full = (
+            self._max_queue_depth is not None
+            and self.queue_depth >= self._max_queue_depth
+        )
+        if client_full or queue_full:
+            # 公平キューでは、待っているクライアントの数だけスロットを待てば順番が来る
+            waiting_clients = len(self._client_depths) or 1
+            retry_after = math.ceil(self._rate_limiter.interval * waiting_clients)
+            raise GeocodingQueueFull(retry_after=max(retry_after, 1))
+
+    def _new_request(
+        self,
+        lat: float,
+        lng: float,
+        priority: GeocodingPriority,
+        client: str,
+        future: "asyncio.Future[AddressResult | None]",
+    ) -> _QueuedRequest:
+        """クライアントの公平キュー上の順番を割り当てたリクエストを作成"""
+        # 開始時刻: 仮想時刻か、そのクライアントの前のリクエストの終了時刻の遅い方
+        tag = max(self._virtual_time, self._client_finish.get(client, 0.0))
+        weight = self._client_weights.get(client, 1.0)
+        self._client_finish[client] = tag + 1.0 / weight
+        return _QueuedRequest(
+            priority=priority,
+            tag=tag,
+            sequence=next(self._sequence),
+            lat=lat,
+            lng=lng,
+            future=future,
+        )
+
+    async def _enqueue(self, request: _QueuedRequest) -> None:
+        """リクエストをキューに追加"""
         # ワーカーが起動していることを確認
         await self._ensure_worker_started()
+        await self._queue.put(request)
+
+    async def _wait(
+        self, in_flight: _InFlight, session: str | None
+    ) -> AddressResult | None:
+        """
+        取得結果を待つ
+
+        呼び出し元のキャンセルや同じセッションの新しい呼び出しで待つのをやめ、
+        他に待っている呼び出し元がいなければ取得自体を取り消す。
+        置き換えられた呼び出しはNoneを返す。
+        """
+        superseded: asyncio.Future[None] | None = None
+        if session is not None:
+            superseded = asyncio.get_running_loop().create_future()
+            self._sessions[session] = superseded
+
+        in_flight.waiters += 1
+        try:
+            # 共有中のFutureは呼び出し元のキャンセルで取り消さない
+            result = asyncio.shield(in_flight.future)
+            if superseded is None:
+                return await result
+            waiting: set[asyncio.Future[Any]] = {result, superseded}
+            await asyncio.wait(waiting, return_when=asyncio.FIRST_COMPLETED)
+            if not result.done():
+                result.cancel()
+                return None
+            return result.result()
+        finally:
+            in_flight.waiters -= 1
+            if in_flight.waiters == 0 and not in_flight.future.done():
+                # 誰も待っていないリクエストは上流に問い合わせない
+                in_flight.future.cancel()
+            if session is not None and self._sessions.get(session) is superseded:
+                del self._sessions[session]
+
+    def _supersede(self, session: str) -> None:
+        """セッションの待機中の呼び出しに、新しい呼び出しで置き換えられたことを通知"""
+        previous = self._sessions.pop(session, None)
+        if previous is not None and not previous.done():
+            previous.set_result(None)
+
+    async def get_cached(self, lat: float, lng: float) -> AddressResult | None:
+        """ローカルで検索できる・キャッシュ済みの住所のみを取得（キューイングしない）"""
+        local = self._lookup_local(lat, lng)
+        if local is not None:
+            return local
+        return await self._get_cached(quantize_coordinate(lat, lng))
+
+    def _lookup_local(self, lat: float, lng: float) -> AddressResult | None:
+        """ローカルのバックエンドで住所を検索"""
+        for backend in self._local_backends:
+            result = backend.lookup(lat, lng)
+            if result is not None:
+                return result
+        return None
 
-        # Futureを作成してキューに追加
-        loop = asyncio.get_event_loop()
-        future: asyncio.Future[AddressResult | None] = loop.create_future()
-        await self._queue.put((lat, lng, future))
+    async def _get_cached(self, cache_key: int) -> AddressResult | None:
+        """メモリ・永続キャッシュから住所を取得"""
+        cached = self._cache.get(cache_key)
+        if cached is not None:
+            return cached
 
-        # 結果を待つ
-        result = await future
+        # 永続キャッシュ（他のワーカーや再起動前に取得した結果）
+        if self._disk_cache is not None:
+            cached = await asyncio.to_thread(self._disk_cache.get, cache_key)
+            if cached is not None:
+                self._cache.put(cache_key, cached)
+        return cached
 
-        # キャッシュに保存
+    def _on_fetched(
+        self, cache_key: int, future: asyncio.Future[AddressResult | None]
+    ) -> None:
+        """取得完了時の処理（進行中の登録を解除し、結果をキャッシュに保存）"""
+        in_flight = self._in_flight.get(cache_key)
+        if in_flight is not None and in_flight.future is future:
+            del self._in_flight[cache_key]
+            self._release_client(in_flight.client)
+        if future.cancelled() or future.exception() is not None:
+            return
+
+        result = future.result()
         if result is not None:
-            self._cache[cache_key] = result
+            self._cache.put(cache_key, result)
+            if self._disk_cache is not None:
+                # 書き込みを待たずに呼び出し元へ結果を返す
+                task = asyncio.create_task(
+                    asyncio.to_thread(self._disk_cache.put, cache_key, result)
+                )
+                self._disk_writes.add(task)
+                task.add_done_callback(self._disk_writes.discard)
+
+    def _release_client(self, client: str) -> None:
+        """クライアントの取得待ちを1つ減らす（なくなれば公平キューの状態も破棄）"""
+        depth = self._client_depths.get(client, 0) - 1
+        if depth > 0:
+            self._client_depths[client] = depth
+        else:
+            self._client_depths.pop(client, None)
+            self._client_finish.pop(client, None)
+
+    @property
+    def queue_depth(self) -> int:
+        """取得待ちのキーの数"""
+        return sum(self._client_depths.values())
 
-        return result
+    def client_queue_depths(self) -> dict[str, int]:
+        """クライアントごとの取得待ちのキーの数（多い順）"""
+        return dict(
+            sorted(self._client_depths.items(), key=lambda item: item[1], reverse=True)
+        )
+
+    @property
+    def coalesced_requests(self) -> int:
+        """進行中の取得にまとめたことで省略した上流への問い合わせ数"""
+        return self._coalesced_requests
+
+    @property
+    def skipped_requests(self) -> int:
+        """待っている呼び出し元がいなくなったため上流に問い合わせなかったリクエスト数"""
+        return self._skipped_requests
+
+    def cache_stats(self) -> CacheStats:
+        """住所キャッシュの統計情報"""
+        return self._cache.stats()
+
+    async def flush_disk_cache(self) -> None:
+        """実行中の永続キャッシュへの書き込みが完了するまで待つ"""
+        if self._disk_writes:
+            await asyncio.gather(*self._disk_writes, return_exceptions=True)
 
     async def close(self) -> None:
-        """クライアントをクローズ"""
-        if self._client is not None:
-            await self._client.aclose()
-            self._client = None
+        """バックエンド・キャッシュ・レート制限をクローズ"""
+        for backend in self._backends:
+            await backend.close()
+        await self.flush_disk_cache()
+        if self._disk_cache is not None:
+            self._disk_cache.close()
+        if isinstance(self._rate_limiter, SharedRateLimiter):
+            self._rate_limiter.close()
 
 
 # シングルトンインスタンス
@@ -154,5 +534,37 @@ def get_geocoding_service() -> GeocodingService:
     """ジオコーディングサービスのシングルトンを取得"""
     global _geocoding_service
     if _geocoding_service is None:
-        _geocoding_service = GeocodingService()
+        backends: list[GeocodingBackend] = []
+        if settings.geocoding_boundaries_path is not None:
+            backends.append(
+                LocalGeocodingBackend(
+                    LocalGeocoder.from_files(
+                        settings.geocoding_boundaries_path,
+                        settings.geocoding_roads_path,
+                        road_max_distance_m=settings.geocoding_road_max_distance_m,
+                    )
+                )
+            )
+        if settings.geocoding_remote_fallback:
+            backends.append(NominatimBackend())
+
+        _geocoding_service = GeocodingService(
+            cache_max_entries=settings.geocoding_cache_max_entries,
+            cache_ttl=settings.geocoding_cache_ttl,
+            disk_cache=GeocodingDiskCache(
+                settings.geocoding_cache_path, ttl=settings.geocoding_cache_ttl
+            ),
+            rate_limiter=SharedRateLimiter(
+                settings.geocoding_cache_path,
+                name="nominatim",
+                interval=settings.nominatim_min_interval,
+            ),
+            backends=backends,
+            max_queue_depth=settings.geocoding_queue_max_depth,
+            max_client_queue_depth=settings.geocoding_client_queue_max_depth,
+            client_weights=settings.geocoding_client_weights,
+        )
+        service = _geocoding_service
+        GEOCODING_QUEUE_DEPTH.set_function(lambda: service.queue_depth)
+        GEOCODING_CACHE_HIT_RATIO.set_function(lambda: service.cache_stats().hit_ratio)
     return _geocoding_service
@@ -0,0 +1,93 @@
+"""逆ジオコーディングのバックエンド
+
+GeocodingServiceは登録されたバックエンドに順に問い合わせる。
+
+- LocalGeocodingBackend: ローカルの境界インデックス。キュー・レート制限・
+  キャッシュを経由せず、呼び出し元でそのまま検索する
+- NominatimBackend: Nominatim API。ローカルで見つからなかった点のみ、
+  キューとレート制限を経由して問い合わせる
+"""
+
+from abc import ABC, abstractmethod
+from typing import Any
+
+import httpx
+
+from src.models.geocoding import AddressResult
+from src.services.local_geocoder import LocalGeocoder
+
+
+class GeocodingBackend(ABC):
+    """逆ジオコーディングのバックエンド"""
+
+    @abstractmethod
+    async def reverse(self, lat: float, lng: float) -> AddressResult | None:
+        """住所を取得（見つからない・エラー時はNone）"""
+
+    async def close(self) -> None:
+        """リソースを解放"""
+
+
+class LocalGeocodingBackend(GeocodingBackend):
+    """ローカルの境界・道路インデックスによるバックエンド（オフライン）"""
+
+    def __init__(self, geocoder: LocalGeocoder) -> None:
+        self._geocoder = geocoder
+
+    def lookup(self, lat: float, lng: float) -> AddressResult | None:
+        """住所を同期的に検索（境界外はNone）"""
+        return self._geocoder.reverse(lat, lng)
+
+    async def reverse(self, lat: float, lng: float) -> AddressResult | None:
+        return self.lookup(lat, lng)
+
+
+class NominatimBackend(GeocodingBackend):
+    """Nominatim APIによるバックエンド"""
+
+    def __init__(self) -> None:
+        self._client: httpx.AsyncClient | None = None
+
+    async def reverse(self, lat: float, lng: float) -> AddressResult | None:
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=10.0)
+
+        try:
+            response = await self._client.get(
+                "https://nominatim.openstreetmap.org/reverse",
+                params={
+                    "format": "json",
+                    "lat": lat,
+                    "lon": lng,
+                    "zoom": 18,
+                    "addressdetails": 1,
+                    "accept-language": "ja",
+                },
+                headers={"User-Agent": "GPXMapViewer/1.0"},
+            )
+            response.raise_for_status()
+            data: dict[str, Any] = response.json()
+            address = data.get("address", {})
+
+            return AddressResult(
+                prefecture=address.get("province", "")
+                or address.get("state", "")
+                or "",
+                city=address.get("city", "")
+                or address.get("town", "")
+                or address.get("village", "")
+                or address.get("county", "")
+                or "",
+                road=address.get("road", "")
+                or address.get("pedestrian", "")
+                or address.get("footway", "")
+                or address.get("path", "")
+                or "",
+            )
+        except Exception:
+            return None
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
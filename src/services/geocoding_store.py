@@ -0,0 +1,110 @@
+"""逆ジオコーディング結果の永続キャッシュ（SQLite）
+
+uvicornの複数ワーカーや再起動・再デプロイの間で住所の取得結果を共有する。
+WALモードのため読み込みは書き込みと並行して行え、主キーは量子化した
+座標セル（quantize_coordinateの整数キー）とする。
+"""
+
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Final
+
+from src.models.geocoding import AddressResult
+
+
+# ロック待ちの上限（ミリ秒）
+BUSY_TIMEOUT_MS: Final[int] = 5000
+
+_SCHEMA: Final[str] = """
+CREATE TABLE IF NOT EXISTS addresses (
+    cell INTEGER PRIMARY KEY,
+    prefecture TEXT NOT NULL,
+    city TEXT NOT NULL,
+    road TEXT NOT NULL,
+    fetched_at REAL NOT NULL
+)
+"""
+
+
+def connect(path: Path) -> sqlite3.Connection:
+    """ワーカー間で共有するSQLiteデータベースに接続（WALモード）"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(
+        path,
+        timeout=BUSY_TIMEOUT_MS / 1000,
+        isolation_level=None,
+        check_same_thread=False,
+    )
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+    return conn
+
+
+class GeocodingDiskCache:
+    """
+    住所の永続キャッシュ
+
+    - 有効期間（ttl秒）を過ぎた行はヒットとして扱わず、開いた時点で削除
+    - ディスクのエラーはキャッシュミスとして扱い、サービス自体は継続する
+    """
+
+    def __init__(self, path: Path, ttl: float) -> None:
+        self._path = path
+        self._ttl = ttl
+        self._conn: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        """接続を取得（初回のみスキーマ作成と期限切れ行の削除）"""
+        if self._conn is None:
+            conn = connect(self._path)
+            conn.execute(_SCHEMA)
+            conn.execute(
+                "DELETE FROM addresses WHERE fetched_at < ?",
+                (time.time() - self._ttl,),
+            )
+            self._conn = conn
+        return self._conn
+
+    def get(self, cell: int) -> AddressResult | None:
+        """セルの住所を取得（なければ、または期限切れならNone）"""
+        with self._lock:
+            try:
+                row = (
+                    self._connection()
+                    .execute(
+                        "SELECT prefecture, city, road FROM addresses"
+                        " WHERE cell = ? AND fetched_at >= ?",
+                        (cell, time.time() - self._ttl),
+                    )
+                    .fetchone()
+                )
+            except (sqlite3.Error, OSError):
+                return None
+
+        if row is None:
+            return None
+        return AddressResult(prefecture=row[0], city=row[1], road=row[2])
+
+    def put(self, cell: int, result: AddressResult) -> None:
+        """セルの住所を保存"""
+        with self._lock:
+            try:
+                self._connection().execute(
+                    "INSERT OR REPLACE INTO addresses"
+                    " (cell, prefecture, city, road, fetched_at)"
+                    " VALUES (?, ?, ?, ?, ?)",
+                    (cell, result.prefecture, result.city, result.road, time.time()),
+                )
+            except (sqlite3.Error, OSError):
+                pass
+
+    def close(self) -> None:
+        """接続をクローズ"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
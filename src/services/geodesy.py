@@ -0,0 +1,228 @@
+"""距離・速度・標高プロファイル計算サービス
+
+トラックの列データ（array）をまとめて処理し、累積距離・区間速度・
+平滑化した標高と累積上昇/下降を一括で計算する。
+ポイントごとの逐次ループではなく、列単位のmap/accumulate/内包表記で処理する。
+"""
+
+import math
+from array import array
+from itertools import accumulate, islice
+from typing import Any, Final
+
+from pydantic import BaseModel, ConfigDict, Field
+
+from src.models.gpx import (
+    EARTH_RADIUS_M,
+    MISSING_TIME,
+    FloatColumn,
+    GpxData,
+    IntColumn,
+    TrackSegment,
+)
+
+
+# 標高の移動平均ウィンドウ（ポイント数）
+DEFAULT_SMOOTHING_WINDOW: Final[int] = 5
+
+
+class TrackProfile(BaseModel):
+    """トラック全体のプロファイル（全ポイントに対応する系列）"""
+
+    model_config = ConfigDict(frozen=True, arbitrary_types_allowed=True)
+
+    distances: FloatColumn = Field(description="累積距離(m)")
+    speeds: FloatColumn = Field(description="直前の点からの区間速度(m/s, 不明はNaN)")
+    elevations: FloatColumn = Field(description="平滑化した高度(m, 欠損はNaN)")
+    gains: FloatColumn = Field(description="平滑化高度による累積上昇(m)")
+    losses: FloatColumn = Field(description="平滑化高度による累積下降(m)")
+
+    @property
+    def total_distance_m(self) -> float:
+        """総距離(m)"""
+        return self.distances[-1] if self.distances else 0.0
+
+    @property
+    def total_gain_m(self) -> float:
+        """累積上昇(m)"""
+        return self.gains[-1] if self.gains else 0.0
+
+    @property
+    def total_loss_m(self) -> float:
+        """累積下降(m)"""
+        return self.losses[-1] if self.losses else 0.0
+
+    def to_chart_data(self) -> dict[str, Any]:
+        """
+        地図テンプレート用のJSONシリアライズ可能なデータを作成
+
+        - index/distance_km/elevation: 高度を持つポイントのみの標高グラフ系列
+        - speed_kmh: 全ポイントの区間速度（インデックスはポイントと一致）
+        """
+        distances = self.distances
+        elevations = self.elevations
+        indices = [i for i, e in enumerate(elevations) if not math.isnan(e)]
+        valid = [elevations[i] for i in indices]
+
+        return {
+            "index": indices,
+            "distance_km": [round(distances[i] / 1000, 4) for i in indices],
+            "elevation": [round(e, 1) for e in valid],
+            "speed_kmh": [
+                None if math.isnan(v) else round(v * 3.6, 1) for v in self.speeds
+            ],
+            "summary": {
+                "distance_km": self.total_distance_m / 1000,
+                "elevation_avg": sum(valid) / len(valid) if valid else None,
+                "elevation_gain": self.total_gain_m,
+                "elevation_loss": self.total_loss_m,
+            },
+        }
+
+
+def pairwise_distances(latitudes: FloatColumn, longitudes: FloatColumn) -> FloatColumn:
+    """隣接ポイント間のハーバーサイン距離(m)を一括計算（長さはn-1）"""
+    if len(latitudes) < 2:
+        return array("d")
+
+    sin, cos, asin, sqrt = math.sin, math.cos, math.asin, math.sqrt
+    phi = list(map(math.radians, latitudes))
+    lam = list(map(math.radians, longitudes))
+    cos_phi = list(map(cos, phi))
+
+    half_d_phi = [(b - a) * 0.5 for a, b in zip(phi, islice(phi, 1, None))]
+    half_d_lam = [(b - a) * 0.5 for a, b in zip(lam, islice(lam, 1, None))]
+    cos_products = [a * b for a, b in zip(cos_phi, islice(cos_phi, 1, None))]
+
+    hav = [
+        sin(dp) ** 2 + cp * sin(dl) ** 2
+        for dp, dl, cp in zip(half_d_phi, half_d_lam, cos_products)
+    ]
+    diameter = 2 * EARTH_RADIUS_M
+    return array("d", [diameter * asin(sqrt(min(1.0, h))) for h in hav])
+
+
+def segment_speeds(steps: FloatColumn, times: IntColumn) -> FloatColumn:
+    """区間距離と時刻列から、各ポイントに到達する区間の速度(m/s)を計算"""
+    if len(times) == 0:
+        return array("d")
+
+    nan = math.nan
+    speeds = array("d", [nan])
+    speeds.extend(
+        [
+            (
+                step * 1000 / (t2 - t1)
+                if t1 != MISSING_TIME and t2 != MISSING_TIME and t2 > t1
+                else nan
+            )
+            for step, t1, t2 in zip(steps, times, islice(times, 1, None))
+        ]
+    )
+    return speeds
+
+
+def smooth_elevations(elevations: FloatColumn, window: int) -> FloatColumn:
+    """欠損値(NaN)を除外した中心移動平均で高度を平滑化"""
+    count = len(elevations)
+    if count == 0 or window <= 1:
+        return array("d", elevations)
+
+    # 欠損を0として累積和と有効点数の累積を取り、区間平均を差分で求める
+    isnan = math.isnan
+    valid = [0 if isnan(e) else 1 for e in elevations]
+    values = [0.0 if isnan(e) else e for e in elevations]
+    value_sums = list(accumulate(values, initial=0.0))
+    valid_sums = list(accumulate(valid, initial=0))
+
+    half = window // 2
+    his = [min(count, i + half + 1) for i in range(count)]
+    los = [max(0, i - half) for i in range(count)]
+    nan = math.nan
+    return array(
+        "d",
+        [
+            (
+                (value_sums[hi] - value_sums[lo]) / (valid_sums[hi] - valid_sums[lo])
+                if v
+                else nan
+            )
+            for v, lo, hi in zip(valid, los, his)
+        ],
+    )
+
+
+def cumulative_gain_loss(elevations: FloatColumn) -> tuple[FloatColumn, FloatColumn]:
+    """高度列から累積上昇・累積下降の系列を計算（欠損点は直前値を引き継ぐ）"""
+    isnan = math.isnan
+    values = [e for e in elevations if not isnan(e)]
+    diffs = [b - a for a, b in zip(values, islice(values, 1, None))]
+    gain_at = list(accumulate((d if d > 0 else 0.0 for d in diffs), initial=0.0))
+    loss_at = list(accumulate((-d if d < 0 else 0.0 for d in diffs), initial=0.0))
+
+    # 各ポイントまでに現れた有効点の数で、有効点ごとの累積値を引き当てる
+    seen = [max(0, k - 1) for k in accumulate(0 if isnan(e) else 1 for e in elevations)]
+    return (
+        array("d", [gain_at[k] for k in seen]),
+        array("d", [loss_at[k] for k in seen]),
+    )
+
+
+def compute_segment_profile(
+    segment: TrackSegment, smoothing_window: int = DEFAULT_SMOOTHING_WINDOW
+) -> TrackProfile:
+    """セグメント単位のプロファイルを計算"""
+    if len(segment.latitudes) == 0:
+        empty: FloatColumn = array("d")
+        return TrackProfile(
+            distances=empty, speeds=empty, elevations=empty, gains=empty, losses=empty
+        )
+
+    steps = pairwise_distances(segment.latitudes, segment.longitudes)
+    distances = array("d", accumulate(steps, initial=0.0))
+    smoothed = smooth_elevations(segment.elevations, smoothing_window)
+    gains, losses = cumulative_gain_loss(smoothed)
+
+    return TrackProfile(
+        distances=distances,
+        speeds=segment_speeds(steps, segment.times),
+        elevations=smoothed,
+        gains=gains,
+        losses=losses,
+    )
+
+
+def compute_profile(
+    gpx_data: GpxData, smoothing_window: int = DEFAULT_SMOOTHING_WINDOW
+) -> TrackProfile:
+    """
+    トラック全体のプロファイルを計算
+
+    セグメント間の移動は距離に含めず、各系列のインデックスは
+    get_all_points() のインデックスと一致する。
+    """
+    distances = array("d")
+    speeds = array("d")
+    elevations = array("d")
+    gains = array("d")
+    losses = array("d")
+
+    for segment in gpx_data.iter_segments():
+        part = compute_segment_profile(segment, smoothing_window)
+        offset_distance = distances[-1] if distances else 0.0
+        offset_gain = gains[-1] if gains else 0.0
+        offset_loss = losses[-1] if losses else 0.0
+
+        distances.extend([d + offset_distance for d in part.distances])
+        speeds.extend(part.speeds)
+        elevations.extend(part.elevations)
+        gains.extend([g + offset_gain for g in part.gains])
+        losses.extend([v + offset_loss for v in part.losses])
+
+    return TrackProfile(
+        distances=distances,
+        speeds=speeds,
+        elevations=elevations,
+        gains=gains,
+        losses=losses,
+    )
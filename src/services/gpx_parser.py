@@ -1,15 +1,38 @@
 """GPXパーサーサービス"""
 
+import io
+import math
 import xml.etree.ElementTree as ET
-from typing import Final
+from collections.abc import AsyncIterable, Iterable
+from typing import BinaryIO, Final, cast
 
-from src.models.gpx import GpxData, Track, TrackPoint, TrackSegment
+from src.models.gpx import (
+    GpxData,
+    Track,
+    TrackSegment,
+    TrackSegmentBuilder,
+    parse_time_to_epoch_ms,
+)
 
 
 # GPX名前空間
 GPX_NAMESPACE: Final[str] = "http://www.topografix.com/GPX/1/1"
 NAMESPACES: Final[dict[str, str]] = {"gpx": GPX_NAMESPACE}
 
+# ストリーミングパース時の読み込みチャンクサイズ
+STREAM_CHUNK_SIZE: Final[int] = 64 * 1024
+# ルート要素が現れるまでに許容する最大バイト数
+ROOT_DETECTION_LIMIT: Final[int] = 8 * 1024
+
+_TRK: Final[str] = f"{{{GPX_NAMESPACE}}}trk"
+_TRKSEG: Final[str] = f"{{{GPX_NAMESPACE}}}trkseg"
+_TRKPT: Final[str] = f"{{{GPX_NAMESPACE}}}trkpt"
+_NAME: Final[str] = f"{{{GPX_NAMESPACE}}}name"
+_ELE: Final[str] = f"{{{GPX_NAMESPACE}}}ele"
+_TIME: Final[str] = f"{{{GPX_NAMESPACE}}}time"
+
+_ElementEvent = tuple[str, ET.Element]
+
 
 class GpxParseError(Exception):
     """GPXパースエラー"""
@@ -17,83 +40,197 @@ class GpxParseError(Exception):
     pass
 
 
-class GpxParser:
-    """GPXファイルパーサー"""
+def _local_name(tag: str) -> str:
+    """名前空間を除いたタグ名を取得"""
+    return tag.rsplit("}", 1)[-1]
 
-    def parse(self, xml_content: bytes) -> GpxData:
-        """GPX XMLコンテンツをパースしてGpxDataを返す"""
-        try:
-            root = ET.fromstring(xml_content)
-        except ET.ParseError as e:
-            raise GpxParseError(f"XMLパースエラー: {e}") from e
 
-        creator = root.get("creator")
-        tracks = self._parse_tracks(root)
+class GpxStreamParser:
+    """
+    GPXインクリメンタルパーサー
 
-        return GpxData(creator=creator, tracks=tuple(tracks))
+    - feed()で受け取ったチャンクを逐次パースし、完了したtrksegを返す
+    - 処理済みの要素はツリーから切り離し、XMLツリー全体を保持しない
+    - ルート要素がgpxでない場合は先頭数KBの時点でGpxParseErrorを送出
+    """
 
-    def _parse_tracks(self, root: ET.Element) -> list[Track]:
-        """トラック要素をパース"""
-        tracks: list[Track] = []
+    def __init__(self) -> None:
+        self._parser: ET.XMLPullParser[ET.Element] = ET.XMLPullParser(
+            events=("start", "end")
+        )
+        self._bytes_fed: int = 0
+        self._stack: list[ET.Element] = []
+        self._root_seen: bool = False
+        self._creator: str | None = None
+        self._track_names: list[str | None] = []
+        self._track_segments: list[list[TrackSegment]] = []
+        self._builder = TrackSegmentBuilder()
 
-        for trk in root.findall("gpx:trk", NAMESPACES):
-            name_elem = trk.find("gpx:name", NAMESPACES)
-            name = name_elem.text if name_elem is not None else None
+    def feed(self, data: bytes) -> list[TrackSegment]:
+        """チャンクを投入し、このチャンクで完了したセグメントを返す"""
+        self._bytes_fed += len(data)
+        try:
+            self._parser.feed(data)
+            completed = self._process_events()
+        except ET.ParseError as e:
+            raise GpxParseError(f"XMLパースエラー: {e}") from e
 
-            segments = self._parse_segments(trk)
-            tracks.append(Track(name=name, segments=tuple(segments)))
+        if not self._root_seen and self._bytes_fed > ROOT_DETECTION_LIMIT:
+            raise GpxParseError(
+                "GPXファイルではありません（ルート要素が見つかりません）"
+            )
 
-        return tracks
+        return completed
 
-    def _parse_segments(self, trk: ET.Element) -> list[TrackSegment]:
-        """セグメント要素をパース"""
-        segments: list[TrackSegment] = []
+    def close(self) -> GpxData:
+        """入力の終端を通知し、パース結果を返す"""
+        try:
+            self._parser.close()
+            self._process_events()
+        except ET.ParseError as e:
+            raise GpxParseError(f"XMLパースエラー: {e}") from e
 
-        for trkseg in trk.findall("gpx:trkseg", NAMESPACES):
-            points = self._parse_points(trkseg)
-            segments.append(TrackSegment(points=tuple(points)))
+        tracks = tuple(
+            Track(name=name, segments=tuple(segments))
+            for name, segments in zip(self._track_names, self._track_segments)
+        )
+        return GpxData(creator=self._creator, tracks=tracks)
+
+    def _process_events(self) -> list[TrackSegment]:
+        """溜まったパースイベントを処理"""
+        completed: list[TrackSegment] = []
+
+        for item in self._parser.read_events():
+            # start/endイベントのみ購読しているため要素は常にElement
+            event, elem = cast(_ElementEvent, item)
+            if event == "start":
+                self._handle_start(elem)
+            else:
+                segment = self._handle_end(elem)
+                if segment is not None:
+                    completed.append(segment)
+
+        return completed
+
+    def _handle_start(self, elem: ET.Element) -> None:
+        """開始タグを処理"""
+        if not self._root_seen:
+            if _local_name(elem.tag) != "gpx":
+                raise GpxParseError(
+                    f"GPXファイルではありません（ルート要素: {_local_name(elem.tag)}）"
+                )
+            self._root_seen = True
+            self._creator = elem.get("creator")
+
+        self._stack.append(elem)
+        depth = len(self._stack)
+
+        if depth == 2 and elem.tag == _TRK:
+            self._track_names.append(None)
+            self._track_segments.append([])
+        elif depth == 3 and elem.tag == _TRKSEG and self._in_track():
+            self._builder = TrackSegmentBuilder()
+
+    def _handle_end(self, elem: ET.Element) -> TrackSegment | None:
+        """終了タグを処理し、セグメントが完了したら返す"""
+        depth = len(self._stack)
+        self._stack.pop()
+        parent = self._stack[-1] if self._stack else None
+        segment: TrackSegment | None = None
+
+        if parent is not None and parent.tag == _TRKPT:
+            # ele/timeはtrkpt終了時に参照するため残す
+            return None
+
+        if depth == 4 and elem.tag == _TRKPT and self._in_segment():
+            self._append_point(elem)
+        elif depth == 3 and elem.tag == _TRKSEG and self._in_track():
+            segment = self._builder.build()
+            self._builder = TrackSegmentBuilder()
+            self._track_segments[-1].append(segment)
+        elif depth == 3 and elem.tag == _NAME and self._in_track():
+            if self._track_names[-1] is None:
+                self._track_names[-1] = elem.text
+
+        # 処理済みの要素はツリーから切り離してメモリを解放
+        if parent is not None:
+            parent.remove(elem)
+
+        return segment
+
+    def _in_track(self) -> bool:
+        """現在trk要素の直下にいるか"""
+        return len(self._stack) >= 2 and self._stack[1].tag == _TRK
+
+    def _in_segment(self) -> bool:
+        """現在trkseg要素の直下にいるか"""
+        return (
+            self._in_track() and len(self._stack) >= 3 and self._stack[2].tag == _TRKSEG
+        )
+
+    def _append_point(self, trkpt: ET.Element) -> None:
+        """トラックポイント要素をパースして現在のセグメントに追加"""
+        lat_str = trkpt.get("lat")
+        lon_str = trkpt.get("lon")
+
+        if lat_str is None or lon_str is None:
+            return
 
-        return segments
+        try:
+            latitude = float(lat_str)
+            longitude = float(lon_str)
+        except ValueError:
+            return
+
+        if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+            return
+
+        # 高度（inf・nanは<ele>がない場合と同じく欠損として扱う）
+        elevation: float | None = None
+        ele_elem = trkpt.find(_ELE)
+        if ele_elem is not None and ele_elem.text:
+            try:
+                elevation = float(ele_elem.text)
+            except ValueError:
+                pass
+            if elevation is not None and not math.isfinite(elevation):
+                elevation = None
 
-    def _parse_points(self, trkseg: ET.Element) -> list[TrackPoint]:
-        """トラックポイント要素をパース"""
-        points: list[TrackPoint] = []
+        # 時刻
+        epoch_ms: int | None = None
+        time_elem = trkpt.find(_TIME)
+        if time_elem is not None and time_elem.text:
+            epoch_ms = parse_time_to_epoch_ms(time_elem.text)
 
-        for trkpt in trkseg.findall("gpx:trkpt", NAMESPACES):
-            lat_str = trkpt.get("lat")
-            lon_str = trkpt.get("lon")
+        self._builder.append(latitude, longitude, elevation, epoch_ms)
 
-            if lat_str is None or lon_str is None:
-                continue
 
-            try:
-                latitude = float(lat_str)
-                longitude = float(lon_str)
-            except ValueError:
-                continue
-
-            # 高度
-            elevation: float | None = None
-            ele_elem = trkpt.find("gpx:ele", NAMESPACES)
-            if ele_elem is not None and ele_elem.text:
-                try:
-                    elevation = float(ele_elem.text)
-                except ValueError:
-                    pass
-
-            # 時刻
-            time: str | None = None
-            time_elem = trkpt.find("gpx:time", NAMESPACES)
-            if time_elem is not None and time_elem.text:
-                time = time_elem.text
-
-            points.append(
-                TrackPoint(
-                    latitude=latitude,
-                    longitude=longitude,
-                    elevation=elevation,
-                    time=time,
-                )
-            )
+class GpxParser:
+    """GPXファイルパーサー"""
 
-        return points
+    def parse(self, xml_content: bytes) -> GpxData:
+        """GPX XMLコンテンツをパースしてGpxDataを返す"""
+        return self.parse_stream(io.BytesIO(xml_content))
+
+    def parse_stream(
+        self, source: BinaryIO, chunk_size: int = STREAM_CHUNK_SIZE
+    ) -> GpxData:
+        """ファイルライクオブジェクトからチャンク単位で読み込んでパース"""
+        stream_parser = GpxStreamParser()
+        while chunk := source.read(chunk_size):
+            stream_parser.feed(chunk)
+        return stream_parser.close()
+
+    def parse_chunks(self, chunks: Iterable[bytes]) -> GpxData:
+        """バイト列チャンクのイテラブルをパース"""
+        stream_parser = GpxStreamParser()
+        for chunk in chunks:
+            stream_parser.feed(chunk)
+        return stream_parser.close()
+
+    async def parse_async(self, chunks: AsyncIterable[bytes]) -> GpxData:
+        """非同期チャンクイテレータ（リクエストボディ等）をパース"""
+        stream_parser = GpxStreamParser()
+        async for chunk in chunks:
+            stream_parser.feed(chunk)
+        return stream_parser.close()
@@ -0,0 +1,314 @@
+"""ローカルの境界データによるオフライン逆ジオコーディング
+
+都道府県・市区町村の境界ポリゴンと道路の線データをGeoJSONファイルから
+読み込み、一様グリッドの空間インデックスで検索する。ネットワークにも
+レート制限にも依存しないため、1件あたりマイクロ秒〜数十マイクロ秒で答える。
+
+- 境界: Polygon / MultiPolygon。プロパティは prefecture / city、または
+  国土数値情報（行政区域）の N03_001（都道府県）/ N03_003（郡・政令市）/
+  N03_004（市区町村）
+- 道路: LineString / MultiLineString。プロパティは name（OSM）または road
+"""
+
+import json
+import math
+from array import array
+from collections.abc import Iterable, Iterator, Sequence
+from pathlib import Path
+from typing import Any, Final
+
+from src.models.geocoding import AddressResult
+from src.models.gpx import EARTH_RADIUS_M, FloatColumn, IntColumn
+
+
+# 境界ポリゴン用グリッドのセルの大きさ（度、約5km）
+BOUNDARY_CELL_DEG: Final[float] = 0.05
+# 道路用グリッドのセルの大きさ（度、約500m）
+ROAD_CELL_DEG: Final[float] = 0.005
+# 道路名を採用する最大距離（m）
+DEFAULT_ROAD_MAX_DISTANCE_M: Final[float] = 50.0
+# ポリゴンの辺を緯度方向の帯に分ける際の1帯あたりの目安の辺数
+_EDGES_PER_BAND: Final[int] = 8
+# 1ポリゴンあたりの帯の数の上限
+_MAX_BANDS: Final[int] = 4096
+
+Ring = Sequence[Sequence[float]]
+
+
+class _Polygon:
+    """
+    境界ポリゴン（外周と穴をまとめた辺の集合）
+
+    辺を緯度方向の帯ごとに振り分けておき、点の内外判定（偶奇規則の
+    レイキャスティング）では点を含む帯の辺のみを調べる。
+    """
+
+    __slots__ = (
+        "prefecture",
+        "city",
+        "min_x",
+        "min_y",
+        "max_x",
+        "max_y",
+        "area",
+        "_x1",
+        "_y1",
+        "_x2",
+        "_y2",
+        "_bands",
+        "_band_height",
+    )
+
+    def __init__(self, prefecture: str, city: str, rings: Sequence[Ring]) -> None:
+        self.prefecture = prefecture
+        self.city = city
+        x1: FloatColumn = array("d")
+        y1: FloatColumn = array("d")
+        x2: FloatColumn = array("d")
+        y2: FloatColumn = array("d")
+        for ring in rings:
+            for (ax, ay, *_), (bx, by, *_) in zip(ring, [*ring[1:], ring[0]]):
+                # 水平な辺はレイと交差しないため除く
+                if ay != by:
+                    x1.append(ax)
+                    y1.append(ay)
+                    x2.append(bx)
+                    y2.append(by)
+        self._x1, self._y1, self._x2, self._y2 = x1, y1, x2, y2
+
+        xs = [*x1, *x2] or [0.0]
+        ys = [*y1, *y2] or [0.0]
+        self.min_x, self.max_x = min(xs), max(xs)
+        self.min_y, self.max_y = min(ys), max(ys)
+        # 重なる境界（都道府県と市区町村など）では小さい方を優先する
+        self.area = (self.max_x - self.min_x) * (self.max_y - self.min_y)
+
+        band_count = max(1, min(len(x1) // _EDGES_PER_BAND, _MAX_BANDS))
+        self._band_height = (self.max_y - self.min_y) / band_count or 1.0
+        self._bands: list[IntColumn] = [array("i") for _ in range(band_count)]
+        for i in range(len(x1)):
+            low = self._band(min(y1[i], y2[i]))
+            high = self._band(max(y1[i], y2[i]))
+            for band in range(low, high + 1):
+                self._bands[band].append(i)
+
+    def _band(self, y: float) -> int:
+        """緯度yを含む帯の番号"""
+        band = int((y - self.min_y) / self._band_height)
+        return min(max(band, 0), len(self._bands) - 1)
+
+    def contains(self, x: float, y: float) -> bool:
+        """点(x=経度, y=緯度)がポリゴンの内部にあるか"""
+        if not (self.min_x <= x <= self.max_x and self.min_y <= y <= self.max_y):
+            return False
+
+        x1, y1, x2, y2 = self._x1, self._y1, self._x2, self._y2
+        inside = False
+        for i in self._bands[self._band(y)]:
+            ay, by = y1[i], y2[i]
+            if (ay > y) != (by > y):
+                ax = x1[i]
+                if x < ax + (y - ay) * (x2[i] - ax) / (by - ay):
+                    inside = not inside
+        return inside
+
+
+def _cells(
+    min_x: float, min_y: float, max_x: float, max_y: float, cell_deg: float
+) -> Iterator[tuple[int, int]]:
+    """矩形に重なるグリッドのセル"""
+    for cx in range(math.floor(min_x / cell_deg), math.floor(max_x / cell_deg) + 1):
+        for cy in range(math.floor(min_y / cell_deg), math.floor(max_y / cell_deg) + 1):
+            yield cx, cy
+
+
+class BoundaryIndex:
+    """境界ポリゴンの一様グリッドインデックス"""
+
+    def __init__(self, cell_deg: float = BOUNDARY_CELL_DEG) -> None:
+        self._cell_deg = cell_deg
+        self._polygons: list[_Polygon] = []
+        self._grid: dict[tuple[int, int], IntColumn] = {}
+
+    def __len__(self) -> int:
+        return len(self._polygons)
+
+    def add(self, prefecture: str, city: str, rings: Sequence[Ring]) -> None:
+        """境界ポリゴン（外周と穴のリング）を追加"""
+        polygon = _Polygon(prefecture, city, rings)
+        polygon_id = len(self._polygons)
+        self._polygons.append(polygon)
+        for cell in _cells(
+            polygon.min_x, polygon.min_y, polygon.max_x, polygon.max_y, self._cell_deg
+        ):
+            self._grid.setdefault(cell, array("i")).append(polygon_id)
+
+    def lookup(self, lat: float, lng: float) -> tuple[str, str] | None:
+        """点を含む境界の (都道府県, 市区町村)（どこにも含まれなければNone）"""
+        cell = (math.floor(lng / self._cell_deg), math.floor(lat / self._cell_deg))
+        best: _Polygon | None = None
+        for polygon_id in self._grid.get(cell, ()):
+            polygon = self._polygons[polygon_id]
+            if (best is None or polygon.area < best.area) and polygon.contains(
+                lng, lat
+            ):
+                best = polygon
+        if best is None:
+            return None
+        return best.prefecture, best.city
+
+
+class RoadIndex:
+    """道路の線分の一様グリッドインデックス"""
+
+    def __init__(self, cell_deg: float = ROAD_CELL_DEG) -> None:
+        self._cell_deg = cell_deg
+        self._names: list[str] = []
+        # 線分ごとの端点と道路名の番号
+        self._x1: FloatColumn = array("d")
+        self._y1: FloatColumn = array("d")
+        self._x2: FloatColumn = array("d")
+        self._y2: FloatColumn = array("d")
+        self._name_ids: IntColumn = array("i")
+        self._grid: dict[tuple[int, int], IntColumn] = {}
+
+    def __len__(self) -> int:
+        return len(self._name_ids)
+
+    def add(self, name: str, coordinates: Ring) -> None:
+        """道路（経度・緯度の点列）を追加"""
+        name_id = len(self._names)
+        self._names.append(name)
+        for (ax, ay, *_), (bx, by, *_) in zip(coordinates, coordinates[1:]):
+            segment_id = len(self._name_ids)
+            self._x1.append(ax)
+            self._y1.append(ay)
+            self._x2.append(bx)
+            self._y2.append(by)
+            self._name_ids.append(name_id)
+            for cell in _cells(
+                min(ax, bx), min(ay, by), max(ax, bx), max(ay, by), self._cell_deg
+            ):
+                self._grid.setdefault(cell, array("i")).append(segment_id)
+
+    def nearest(self, lat: float, lng: float, max_distance_m: float) -> str | None:
+        """max_distance_m以内で最も近い道路の名前（なければNone）"""
+        # 点の周辺では経度1度あたりの距離を一定とみなす（正距円筒図法）
+        m_per_deg_y = math.radians(1) * EARTH_RADIUS_M
+        m_per_deg_x = m_per_deg_y * math.cos(math.radians(lat))
+        reach_y = max_distance_m / m_per_deg_y
+        reach_x = max_distance_m / max(m_per_deg_x, 1e-9)
+
+        candidates: set[int] = set()
+        for cell in _cells(
+            lng - reach_x, lat - reach_y, lng + reach_x, lat + reach_y, self._cell_deg
+        ):
+            candidates.update(self._grid.get(cell, ()))
+
+        best_id = -1
+        best_distance_sq = max_distance_m * max_distance_m
+        for i in candidates:
+            ax = (self._x1[i] - lng) * m_per_deg_x
+            ay = (self._y1[i] - lat) * m_per_deg_y
+            dx = (self._x2[i] - lng) * m_per_deg_x - ax
+            dy = (self._y2[i] - lat) * m_per_deg_y - ay
+            length_sq = dx * dx + dy * dy
+            # 原点（検索点）から線分への最近点
+            t = (
+                0.0
+                if length_sq == 0
+                else min(max(-(ax * dx + ay * dy) / length_sq, 0.0), 1.0)
+            )
+            px, py = ax + t * dx, ay + t * dy
+            distance_sq = px * px + py * py
+            if distance_sq <= best_distance_sq:
+                best_id, best_distance_sq = i, distance_sq
+        if best_id < 0:
+            return None
+        return self._names[self._name_ids[best_id]]
+
+
+def _boundary_names(properties: dict[str, Any]) -> tuple[str, str]:
+    """境界のプロパティから (都道府県, 市区町村) を取り出す"""
+    if "N03_001" in properties:
+        county = properties.get("N03_003") or ""
+        municipality = properties.get("N03_004") or ""
+        # 政令指定都市は「市名 + 区名」とする（郡名は付けない）
+        city = county + municipality if county.endswith("市") else municipality
+        return properties.get("N03_001") or "", city
+    return properties.get("prefecture") or "", properties.get("city") or ""
+
+
+def _iter_features(path: Path) -> Iterable[dict[str, Any]]:
+    """GeoJSONファイルのFeatureを列挙"""
+    with path.open(encoding="utf-8") as f:
+        data: dict[str, Any] = json.load(f)
+    if data.get("type") == "Feature":
+        return [data]
+    features: list[dict[str, Any]] = data.get("features", [])
+    return features
+
+
+class LocalGeocoder:
+    """境界・道路インデックスによる逆ジオコーダー"""
+
+    def __init__(
+        self,
+        boundaries: BoundaryIndex,
+        roads: RoadIndex | None = None,
+        road_max_distance_m: float = DEFAULT_ROAD_MAX_DISTANCE_M,
+    ) -> None:
+        self._boundaries = boundaries
+        self._roads = roads
+        self._road_max_distance_m = road_max_distance_m
+
+    @classmethod
+    def from_files(
+        cls,
+        boundaries_path: Path,
+        roads_path: Path | None = None,
+        road_max_distance_m: float = DEFAULT_ROAD_MAX_DISTANCE_M,
+    ) -> "LocalGeocoder":
+        """GeoJSONファイルからインデックスを構築"""
+        boundaries = BoundaryIndex()
+        for feature in _iter_features(boundaries_path):
+            geometry = feature.get("geometry") or {}
+            prefecture, city = _boundary_names(feature.get("properties") or {})
+            if geometry.get("type") == "Polygon":
+                boundaries.add(prefecture, city, geometry["coordinates"])
+            elif geometry.get("type") == "MultiPolygon":
+                for rings in geometry["coordinates"]:
+                    boundaries.add(prefecture, city, rings)
+
+        roads: RoadIndex | None = None
+        if roads_path is not None:
+            roads = RoadIndex()
+            for feature in _iter_features(roads_path):
+                geometry = feature.get("geometry") or {}
+                properties = feature.get("properties") or {}
+                name = properties.get("name") or properties.get("road") or ""
+                if not name:
+                    continue
+                if geometry.get("type") == "LineString":
+                    roads.add(name, geometry["coordinates"])
+                elif geometry.get("type") == "MultiLineString":
+                    for line in geometry["coordinates"]:
+                        roads.add(name, line)
+
+        return cls(boundaries, roads, road_max_distance_m)
+
+    def reverse(self, lat: float, lng: float) -> AddressResult | None:
+        """
+        住所を検索
+
+        境界に含まれない点はNone（フォールバック先に問い合わせる）。
+        近くに道路がなければ道路名は空にする。
+        """
+        area = self._boundaries.lookup(lat, lng)
+        if area is None:
+            return None
+
+        road = ""
+        if self._roads is not None:
+            road = self._roads.nearest(lat, lng, self._road_max_distance_m) or ""
+        return AddressResult(prefecture=area[0], city=area[1], road=road)
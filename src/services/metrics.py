@@ -0,0 +1,336 @@
+"""プロセス内メトリクス（Prometheusテキスト形式で出力）
+
+カウンター・ゲージ・ヒストグラムをレジストリに登録し、/metricsで
+Prometheusのテキスト形式（0.0.4）として出力する。値はワーカープロセスごと
+に保持するため、複数ワーカーの場合はPrometheus側で合算する。
+"""
+
+import math
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections.abc import Callable, Iterator, Sequence
+from contextlib import contextmanager
+from typing import Final, TypeVar
+
+
+# レスポンスのContent-Type
+CONTENT_TYPE: Final[str] = "text/plain; version=0.0.4; charset=utf-8"
+
+# 処理時間（秒）の既定のバケット
+DEFAULT_SECONDS_BUCKETS: Final[tuple[float, ...]] = (
+    0.001,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+)
+
+LabelValues = tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    """ラベル値のエスケープ"""
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    """ラベルの文字列（{a="x",b="y"}、ラベルがなければ空）"""
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _format_value(value: float) -> str:
+    """数値の文字列"""
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if math.isnan(value):
+        return "NaN"
+    if value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
+
+
+class _Metric(ABC):
+    """メトリクスの共通部分（名前・説明・ラベル名）"""
+
+    kind: str = "untyped"
+
+    def __init__(
+        self, name: str, description: str, labelnames: Sequence[str] = ()
+    ) -> None:
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict[str, str]) -> LabelValues:
+        """ラベルの値のタプル（ラベル名の過不足はValueError）"""
+        if set(labels) != set(self.labelnames):
+            raise ValueError(
+                f"{self.name}: labels must be {self.labelnames}, got {tuple(labels)}"
+            )
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    @abstractmethod
+    def samples(self) -> Iterator[tuple[str, LabelValues, float]]:
+        """(サフィックス付きの名前, ラベルの値, 値) を列挙"""
+
+    def render(self) -> str:
+        """テキスト形式で出力"""
+        lines = [
+            f"# HELP {self.name} {self.description}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        for name, values, value in self.samples():
+            labelnames = self.labelnames
+            if name.endswith("_bucket"):
+                labelnames = (*labelnames, "le")
+            lines.append(
+                f"{name}{_format_labels(labelnames, values)} {_format_value(value)}"
+            )
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    """単調増加するカウンター"""
+
+    kind = "counter"
+
+    def __init__(
+        self, name: str, description: str, labelnames: Sequence[str] = ()
+    ) -> None:
+        super().__init__(name, description, labelnames)
+        self._values: dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        """加算"""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        """現在の値"""
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> Iterator[tuple[str, LabelValues, float]]:
+        with self._lock:
+            items = sorted(self._values.items())
+        for values, value in items:
+            yield self.name, values, value
+
+
+class Gauge(_Metric):
+    """
+    増減する値
+
+    set_functionで関数を登録すると、出力のたびにその関数の値を使う
+    （キューの深さなど、別のオブジェクトが持っている値を公開する場合）。
+    """
+
+    kind = "gauge"
+
+    def __init__(
+        self, name: str, description: str, labelnames: Sequence[str] = ()
+    ) -> None:
+        super().__init__(name, description, labelnames)
+        self._values: dict[LabelValues, float] = {}
+        self._function: Callable[[], float] | None = None
+
+    def set(self, value: float, **labels: str) -> None:
+        """値を設定"""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        """出力時に値を求める関数を登録（ラベルなしのゲージのみ）"""
+        if self.labelnames:
+            raise ValueError(f"{self.name}: set_function requires no labels")
+        self._function = function
+
+    def value(self, **labels: str) -> float:
+        """現在の値"""
+        if self._function is not None:
+            return self._function()
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> Iterator[tuple[str, LabelValues, float]]:
+        if self._function is not None:
+            yield self.name, (), self._function()
+            return
+        with self._lock:
+            items = sorted(self._values.items())
+        for values, value in items:
+            yield self.name, values, value
+
+
+class Histogram(_Metric):
+    """値の分布（累積バケット・合計・件数）"""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_SECONDS_BUCKETS,
+    ) -> None:
+        super().__init__(name, description, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # ラベルの値 → (バケットごとの件数（累積ではない、末尾は+Inf）, 合計)
+        self._values: dict[LabelValues, tuple[list[int], float]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        """値を記録"""
+        key = self._key(labels)
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[index] += 1
+            self._values[key] = (counts, total + value)
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        """withブロックの処理時間（秒）を記録"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels: str) -> int:
+        """記録した件数"""
+        entry = self._values.get(self._key(labels))
+        return sum(entry[0]) if entry is not None else 0
+
+    def samples(self) -> Iterator[tuple[str, LabelValues, float]]:
+        with self._lock:
+            items = sorted((k, (list(c), t)) for k, (c, t) in self._values.items())
+        for values, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip((*self.buckets, math.inf), counts):
+                cumulative += count
+                yield f"{self.name}_bucket", (*values, _format_value(bound)), cumulative
+            yield f"{self.name}_sum", values, total
+            yield f"{self.name}_count", values, cumulative
+
+
+M = TypeVar("M", bound=_Metric)
+
+
+class MetricsRegistry:
+    """メトリクスのレジストリ"""
+
+    def __init__(self) -> None:
+        self._metrics: dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: M) -> M:
+        """メトリクスを登録（同じ名前は登録できない）"""
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"metric already registered: {metric.name}")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(
+        self, name: str, description: str, labelnames: Sequence[str] = ()
+    ) -> Counter:
+        """カウンターを登録"""
+        return self._register(Counter(name, description, labelnames))
+
+    def gauge(
+        self, name: str, description: str, labelnames: Sequence[str] = ()
+    ) -> Gauge:
+        """ゲージを登録"""
+        return self._register(Gauge(name, description, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        description: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_SECONDS_BUCKETS,
+    ) -> Histogram:
+        """ヒストグラムを登録"""
+        return self._register(Histogram(name, description, labelnames, buckets))
+
+    def render(self) -> str:
+        """全メトリクスをテキスト形式で出力"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+# アプリケーション全体のレジストリ
+REGISTRY = MetricsRegistry()
+
+# アップロード
+UPLOAD_BYTES = REGISTRY.histogram(
+    "gpx_upload_bytes",
+    "Size of uploaded GPX files in bytes.",
+    buckets=tuple(2**n for n in range(10, 27, 2)),
+)
+UPLOAD_POINTS = REGISTRY.histogram(
+    "gpx_upload_points",
+    "Number of track points in uploaded GPX files.",
+    buckets=(100, 1_000, 10_000, 100_000, 1_000_000, 5_000_000),
+)
+# 段階ごとの処理時間（src.services.timing.stage()で記録）
+STAGE_SECONDS = REGISTRY.histogram(
+    "gpx_stage_duration_seconds",
+    "Time spent in each stage of handling a track.",
+    labelnames=("stage",),
+)
+
+# パースのプロセスプール
+PARSE_WAIT_SECONDS = REGISTRY.histogram(
+    "gpx_parse_queue_wait_seconds",
+    "Time an upload waited for a parse worker before parsing started.",
+)
+PARSE_IN_FLIGHT = REGISTRY.gauge(
+    "gpx_parse_in_flight", "Number of uploads being parsed in the process pool."
+)
+PARSE_QUEUE_DEPTH = REGISTRY.gauge(
+    "gpx_parse_queue_depth", "Number of uploads waiting for a parse worker."
+)
+PARSE_REJECTED = REGISTRY.counter(
+    "gpx_parse_rejected_total",
+    "Number of uploads rejected because too many were waiting for a parse worker.",
+)
+
+# 逆ジオコーディング
+GEOCODING_QUEUE_DEPTH = REGISTRY.gauge(
+    "geocoding_queue_depth", "Number of keys waiting for an upstream lookup."
+)
+GEOCODING_WAIT_SECONDS = REGISTRY.histogram(
+    "geocoding_queue_wait_seconds",
+    "Time a lookup waited in the queue before it was sent upstream.",
+    labelnames=("priority",),
+)
+GEOCODING_UPSTREAM_SECONDS = REGISTRY.histogram(
+    "geocoding_upstream_duration_seconds", "Latency of upstream geocoding lookups."
+)
+GEOCODING_CACHE_HIT_RATIO = REGISTRY.gauge(
+    "geocoding_cache_hit_ratio", "Hit ratio of the in-memory geocoding cache."
+)
+GEOCODING_WORKER_RESTARTS = REGISTRY.counter(
+    "geocoding_worker_restarts_total",
+    "Number of times the geocoding queue worker was restarted after failing.",
+)
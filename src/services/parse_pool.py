@@ -0,0 +1,412 @@
+"""GPXパースのプロセスプール
+
+パースと集計はCPUを使い続けるため、イベントループ上で実行すると同じワーカーの
+他のリクエスト（逆ジオコーディング等）がすべて止まる。別プロセスで実行し、
+結果は列データのバイト列と集計値だけのタプル（PackedGpx）で受け渡して
+pickleのコストを抑える。アップロード時は、初回の表示で必要になる派生データ
+（距離・標高プロファイルと簡略化ピラミッド）も同じ子プロセスで計算する。
+
+同時に実行するパースの数を制限し、空きを待つリクエストが上限を超えたら
+ParsePoolBusyを送出する。
+"""
+
+import asyncio
+import time
+from array import array
+from collections import deque
+from collections.abc import Callable
+from concurrent.futures import Executor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Any, TypeVar
+
+from pydantic import BaseModel, ConfigDict, Field
+
+from src.config import settings
+from src.models.gpx import (
+    FloatColumn,
+    GpxData,
+    IntColumn,
+    SegmentStats,
+    Track,
+    TrackSegment,
+)
+from src.services.compression import (
+    DecompressionLimits,
+    FailedMember,
+    get_decompression_limits,
+    parse_gpx_members,
+)
+from src.services.geodesy import TrackProfile, compute_profile
+from src.services.gpx_parser import GpxParseError, GpxParser
+from src.services.metrics import (
+    PARSE_IN_FLIGHT,
+    PARSE_QUEUE_DEPTH,
+    PARSE_REJECTED,
+    PARSE_WAIT_SECONDS,
+)
+from src.services.simplify import SimplificationLevel, TrackPyramid, build_pyramid
+
+
+# (緯度, 経度, 高度, 時刻の各列のバイト列, 集計値)
+PackedSegment = tuple[bytes, bytes, bytes, bytes, dict[str, Any]]
+# (トラック名, セグメント)
+PackedTrack = tuple[str | None, tuple[PackedSegment, ...]]
+# (作成者, トラック)
+PackedGpx = tuple[str | None, tuple[PackedTrack, ...]]
+# (累積距離, 区間速度, 平滑化高度, 累積上昇, 累積下降の各列のバイト列)
+PackedProfile = tuple[bytes, bytes, bytes, bytes, bytes]
+# (元のポイント数, (最小ズーム, 最大ズーム, 許容誤差, インデックス列のバイト列))
+PackedPyramid = tuple[int, tuple[tuple[int, int, float, bytes], ...]]
+# zip内の取り込めなかった.gpxの(名前, エラーメッセージ)
+PackedFailures = tuple[tuple[str, str], ...]
+
+_T = TypeVar("_T")
+
+
+class ParsePoolBusy(Exception):
+    """パースの空きを待つリクエストが上限に達している"""
+
+    def __init__(self, retry_after: int) -> None:
+        super().__init__("parse pool is busy")
+        self.retry_after = retry_after
+
+
+class ParsedTrack(BaseModel):
+    """パース結果と派生データ（子プロセスで計算したもの）"""
+
+    model_config = ConfigDict(frozen=True)
+
+    gpx_data: GpxData = Field(description="パース済みGPXデータ")
+    profile: TrackProfile = Field(description="距離・標高プロファイル")
+    pyramid: TrackPyramid = Field(description="ズーム帯ごとの簡略化ピラミッド")
+    failed: tuple[FailedMember, ...] = Field(
+        default=(), description="zip内の取り込めなかった.gpx"
+    )
+
+
+def _float_column(data: bytes) -> FloatColumn:
+    """バイト列から浮動小数点数の列データを復元"""
+    column = array("d")
+    column.frombytes(data)
+    return column
+
+
+def _int_column(data: bytes) -> IntColumn:
+    """バイト列から整数の列データを復元"""
+    column = array("q")
+    column.frombytes(data)
+    return column
+
+
+def pack_gpx(gpx_data: GpxData) -> PackedGpx:
+    """GpxDataをプロセス間で受け渡す形式に変換"""
+    return (
+        gpx_data.creator,
+        tuple(
+            (
+                track.name,
+                tuple(
+                    (
+                        segment.latitudes.tobytes(),
+                        segment.longitudes.tobytes(),
+                        segment.elevations.tobytes(),
+                        segment.times.tobytes(),
+                        segment.stats.model_dump(),
+                    )
+                    for segment in track.segments
+                ),
+            )
+            for track in gpx_data.tracks
+        ),
+    )
+
+
+def unpack_gpx(packed: PackedGpx) -> GpxData:
+    """pack_gpxの結果からGpxDataを復元（検証済みのため再検証しない）"""
+    creator, tracks = packed
+    return GpxData.model_construct(
+        creator=creator,
+        tracks=tuple(
+            Track.model_construct(
+                name=name,
+                segments=tuple(
+                    TrackSegment.model_construct(
+                        latitudes=_float_column(latitudes),
+                        longitudes=_float_column(longitudes),
+                        elevations=_float_column(elevations),
+                        times=_int_column(times),
+                        stats=SegmentStats.model_construct(**stats),
+                    )
+                    for latitudes, longitudes, elevations, times, stats in segments
+                ),
+            )
+            for name, segments in tracks
+        ),
+    )
+
+
+def pack_profile(profile: TrackProfile) -> PackedProfile:
+    """TrackProfileをプロセス間で受け渡す形式に変換"""
+    return (
+        profile.distances.tobytes(),
+        profile.speeds.tobytes(),
+        profile.elevations.tobytes(),
+        profile.gains.tobytes(),
+        profile.losses.tobytes(),
+    )
+
+
+def unpack_profile(packed: PackedProfile) -> TrackProfile:
+    """pack_profileの結果からTrackProfileを復元"""
+    distances, speeds, elevations, gains, losses = packed
+    return TrackProfile.model_construct(
+        distances=_float_column(distances),
+        speeds=_float_column(speeds),
+        elevations=_float_column(elevations),
+        gains=_float_column(gains),
+        losses=_float_column(losses),
+    )
+
+
+def pack_pyramid(pyramid: TrackPyramid) -> PackedPyramid:
+    """TrackPyramidをプロセス間で受け渡す形式に変換"""
+    return (
+        pyramid.point_count,
+        tuple(
+            (level.min_zoom, level.max_zoom, level.tolerance_m, level.indices.tobytes())
+            for level in pyramid.levels
+        ),
+    )
+
+
+def unpack_pyramid(packed: PackedPyramid) -> TrackPyramid:
+    """pack_pyramidの結果からTrackPyramidを復元"""
+    point_count, levels = packed
+    return TrackPyramid.model_construct(
+        point_count=point_count,
+        levels=tuple(
+            SimplificationLevel.model_construct(
+                min_zoom=min_zoom,
+                max_zoom=max_zoom,
+                tolerance_m=tolerance_m,
+                indices=_int_column(indices),
+            )
+            for min_zoom, max_zoom, tolerance_m, indices in levels
+        ),
+    )
+
+
+def _parse_source(
+    source: bytes | Path, limits: DecompressionLimits
+) -> tuple[GpxData, list[FailedMember]]:
+    """
+    ファイル（圧縮されていれば展開しながら）またはバイト列をパース
+
+    zip内の取り込めなかった.gpxの一覧も返す。
+    """
+    if isinstance(source, Path):
+        return parse_gpx_members(source, limits)
+    return GpxParser().parse(source), []
+
+
+def parse_packed(
+    source: bytes | Path, limits: DecompressionLimits, submitted_at: float
+) -> tuple[PackedGpx, float]:
+    """
+    パースしてPackedGpxを返す（子プロセスで実行）
+
+    sourceがパスの場合はファイルからチャンク単位で読み込み、圧縮されていれば
+    展開しながらパースする。
+    submitted_atからパース開始までの待ち時間（秒）も返す。
+    時刻はプロセス間で比較するためtime.time()を使う。
+    """
+    waited = time.time() - submitted_at
+    gpx_data, _ = _parse_source(source, limits)
+    return pack_gpx(gpx_data), waited
+
+
+def parse_track_packed(
+    source: bytes | Path, limits: DecompressionLimits, submitted_at: float
+) -> tuple[tuple[PackedGpx, PackedProfile, PackedPyramid, PackedFailures], float]:
+    """
+    パースして派生データも計算し、受け渡す形式で返す（子プロセスで実行）
+
+    submitted_atからパース開始までの待ち時間（秒）も返す。
+    """
+    waited = time.time() - submitted_at
+    gpx_data, failed = _parse_source(source, limits)
+    packed = (
+        pack_gpx(gpx_data),
+        pack_profile(compute_profile(gpx_data)),
+        pack_pyramid(build_pyramid(gpx_data)),
+        tuple((item.name, item.message) for item in failed),
+    )
+    return packed, waited
+
+
+class ParsePool:
+    """
+    パースを実行するプロセスプール
+
+    workers=0の場合はプロセスを使わず、スレッドプールで実行する
+    （開発時など。イベントループは止めないがGILは共有する）。
+    """
+
+    def __init__(self, workers: int, max_concurrency: int, max_pending: int) -> None:
+        self._workers = workers
+        self._max_concurrency = max(1, max_concurrency)
+        self._max_pending = max_pending
+        self._executor: Executor | None = None
+        # 実行中のパースの数と、空きを待つFuture
+        self._active = 0
+        self._waiters: deque[asyncio.Future[None]] = deque()
+
+    @property
+    def active(self) -> int:
+        """実行中のパースの数"""
+        return self._active
+
+    @property
+    def pending(self) -> int:
+        """空きを待っているリクエストの数"""
+        return sum(1 for waiter in self._waiters if not waiter.done())
+
+    def _get_executor(self) -> Executor | None:
+        """プロセスプール（workers=0ならNone）"""
+        if self._workers > 0 and self._executor is None:
+            # 親プロセスのスレッドやメモリを引き継がないようspawnで起動する
+            self._executor = ProcessPoolExecutor(
+                self._workers, mp_context=get_context("spawn")
+            )
+        return self._executor
+
+    async def _acquire(self) -> None:
+        """実行枠を確保（待ちが上限に達していればParsePoolBusy）"""
+        if self._active < self._max_concurrency and not self.pending:
+            self._active += 1
+            return
+        if self.pending >= self._max_pending:
+            PARSE_REJECTED.inc()
+            raise ParsePoolBusy(retry_after=1 + self.pending // self._max_concurrency)
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            # 解放した側が枠を譲ってから結果を設定する
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self._release()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+
+    def _release(self) -> None:
+        """実行枠を解放（待っているリクエストがあれば譲る）"""
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self._active -= 1
+
+    async def parse(
+        self, content: bytes | Path, limits: DecompressionLimits | None = None
+    ) -> GpxData:
+        """
+        別プロセスでパースしてGpxDataを返す
+
+        contentにファイルのパスを渡すと、子プロセスがファイルから直接読み込む
+        （内容をプロセス間で受け渡さない）。圧縮ファイルはlimits
+        （省略時は設定値）の範囲で展開する。
+
+        Raises:
+            GpxParseError: パースに失敗した場合（子プロセスが異常終了した場合を含む）
+            ParsePoolBusy: 空きを待つリクエストが上限に達している場合
+        """
+        return unpack_gpx(await self._run(parse_packed, content, limits))
+
+    async def parse_track(
+        self, content: bytes | Path, limits: DecompressionLimits | None = None
+    ) -> ParsedTrack:
+        """
+        別プロセスでパースし、派生データ（プロファイル・簡略化ピラミッド）も
+        計算して返す
+
+        zip内の一部の.gpxを取り込めなかった場合はfailedに含める。
+        引数・例外はparseと同じ。
+        """
+        gpx, profile, pyramid, failed = await self._run(
+            parse_track_packed, content, limits
+        )
+        return ParsedTrack.model_construct(
+            gpx_data=unpack_gpx(gpx),
+            profile=unpack_profile(profile),
+            pyramid=unpack_pyramid(pyramid),
+            failed=tuple(
+                FailedMember(name=name, message=message) for name, message in failed
+            ),
+        )
+
+    async def _run(
+        self,
+        func: Callable[[bytes | Path, DecompressionLimits, float], tuple[_T, float]],
+        content: bytes | Path,
+        limits: DecompressionLimits | None,
+    ) -> _T:
+        """実行枠を確保してfunc(content, limits, 投入時刻)を子プロセスで実行"""
+        submitted_at = time.time()
+        limits = limits or get_decompression_limits()
+        await self._acquire()
+        try:
+            executor = self._get_executor()
+            loop = asyncio.get_running_loop()
+            try:
+                packed, waited = await loop.run_in_executor(
+                    executor, func, content, limits, submitted_at
+                )
+            except BrokenProcessPool as e:
+                # メモリ不足等で子プロセスが終了した場合は次回作り直す
+                # （他のリクエストが作り直した後のプールは終了しない）
+                if self._executor is executor:
+                    self.shutdown()
+                raise GpxParseError("パース処理が異常終了しました") from e
+        finally:
+            self._release()
+
+        PARSE_WAIT_SECONDS.observe(waited)
+        return packed
+
+    def shutdown(self) -> None:
+        """プロセスプールを終了（次回のparseで作り直す）"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+# シングルトンインスタンス
+_parse_pool: ParsePool | None = None
+
+
+def get_parse_pool() -> ParsePool:
+    """パースプールのシングルトンを取得"""
+    global _parse_pool
+    if _parse_pool is None:
+        _parse_pool = ParsePool(
+            workers=settings.parse_workers,
+            max_concurrency=settings.parse_max_concurrency,
+            max_pending=settings.parse_max_pending,
+        )
+        pool = _parse_pool
+        PARSE_IN_FLIGHT.set_function(lambda: pool.active)
+        PARSE_QUEUE_DEPTH.set_function(lambda: pool.pending)
+    return _parse_pool
+
+
+def shutdown_parse_pool() -> None:
+    """パースプールを終了"""
+    if _parse_pool is not None:
+        _parse_pool.shutdown()
@@ -0,0 +1,297 @@
+"""トラックポイントのコンパクトなバイナリエンコーディング
+
+JSONのポイントオブジェクトはキー名とISO8601文字列を毎回繰り返すため1点あたり
+約100バイトになる。ここでは列ごとに固定小数点のint32差分列へ変換し、
+ヘッダー付きのリトルエンディアンのバッファとして送る（1点あたり最大16バイト）。
+
+フォーマット（version 1）:
+
+    offset  size  内容
+    0       4     マジック "GPXC"
+    4       2     バージョン (uint16)
+    6       2     フラグ (uint16, FLAG_*)
+    8       4     ポイント数 n (uint32)
+    12      4     時刻差分の単位(ms) (uint32, 1 または 1000)
+    16      8     基準時刻(エポックms) (float64)
+    24      -     列 (int32 × n): [indices] lat lon [ele] [time]
+
+- lat/lon: 1e-6度単位の値の前の点との差分（先頭は絶対値）
+- ele: 0.1m単位の値の前の有効点との差分、欠損はMISSING_INT32
+- time: 基準時刻からの単位時間での前の有効点との差分、欠損はMISSING_INT32
+- indices: 元のポイントインデックスの差分（ズーム帯指定時のみ）
+"""
+
+import math
+import struct
+import sys
+from array import array
+from collections.abc import Sequence
+from typing import Any, Final
+
+from src.models.gpx import MISSING_TIME, FloatColumn, GpxData, IntColumn
+
+
+# バイナリ形式のメディアタイプ
+BINARY_MEDIA_TYPE: Final[str] = "application/vnd.gpx-viewer.points"
+JSON_MEDIA_TYPE: Final[str] = "application/json"
+
+MAGIC: Final[bytes] = b"GPXC"
+FORMAT_VERSION: Final[int] = 1
+
+FLAG_ELEVATION: Final[int] = 1
+FLAG_TIME: Final[int] = 2
+FLAG_INDICES: Final[int] = 4
+
+# 固定小数点の倍率
+COORDINATE_SCALE: Final[float] = 1e6
+ELEVATION_SCALE: Final[float] = 10.0
+
+# int32列の欠損値
+MISSING_INT32: Final[int] = -(2**31)
+_INT32_MAX: Final[int] = 2**31 - 1
+
+_HEADER: Final = struct.Struct("<4sHHIId")
+HEADER_SIZE: Final[int] = _HEADER.size
+
+
+class PointEncodingError(Exception):
+    """バイナリ形式のデコードエラー"""
+
+    pass
+
+
+class PointColumns:
+    """エンコード対象の列データ（全セグメントを連結したもの）"""
+
+    __slots__ = ("latitudes", "longitudes", "elevations", "times")
+
+    def __init__(
+        self,
+        latitudes: FloatColumn,
+        longitudes: FloatColumn,
+        elevations: FloatColumn,
+        times: IntColumn,
+    ) -> None:
+        self.latitudes = latitudes
+        self.longitudes = longitudes
+        self.elevations = elevations
+        self.times = times
+
+    def __len__(self) -> int:
+        return len(self.latitudes)
+
+    @classmethod
+    def from_gpx(cls, gpx_data: GpxData) -> "PointColumns":
+        """GpxDataの全セグメントの列を連結"""
+        columns = cls(array("d"), array("d"), array("d"), array("q"))
+        for segment in gpx_data.iter_segments():
+            columns.latitudes.extend(segment.latitudes)
+            columns.longitudes.extend(segment.longitudes)
+            columns.elevations.extend(segment.elevations)
+            columns.times.extend(segment.times)
+        return columns
+
+    def select(self, indices: Sequence[int]) -> "PointColumns":
+        """指定インデックスの点のみを抽出"""
+        return PointColumns(
+            array("d", [self.latitudes[i] for i in indices]),
+            array("d", [self.longitudes[i] for i in indices]),
+            array("d", [self.elevations[i] for i in indices]),
+            array("q", [self.times[i] for i in indices]),
+        )
+
+
+def prefers_binary(accept: str | None) -> bool:
+    """Acceptヘッダーでバイナリ形式がJSONより優先されているか"""
+    if not accept:
+        return False
+
+    qualities: dict[str, float] = {}
+    for part in accept.split(","):
+        media_type, *params = [p.strip() for p in part.split(";")]
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[media_type.lower()] = quality
+
+    binary = qualities.get(BINARY_MEDIA_TYPE, 0.0)
+    json = max(
+        qualities.get(JSON_MEDIA_TYPE, 0.0),
+        qualities.get("application/*", 0.0),
+        qualities.get("*/*", 0.0),
+    )
+    return binary > 0 and binary >= json
+
+
+def _deltas(values: list[int]) -> list[int]:
+    """整数列を差分列に変換（先頭は絶対値）"""
+    return [b - a for a, b in zip([0, *values], values)]
+
+
+def _sparse_deltas(values: list[int | None]) -> list[int]:
+    """欠損を含む整数列を前の有効値との差分列に変換（欠損はMISSING_INT32）"""
+    result: list[int] = []
+    previous = 0
+    for value in values:
+        if value is None:
+            result.append(MISSING_INT32)
+        else:
+            result.append(value - previous)
+            previous = value
+    return result
+
+
+def _time_column(times: IntColumn) -> tuple[float, int, list[int]] | None:
+    """時刻列を (基準時刻ms, 単位ms, 差分列) に変換（時刻がなければNone）"""
+    valid = [t for t in times if t != MISSING_TIME]
+    if not valid:
+        return None
+
+    for scale in (1, 1000):
+        base = valid[0] // scale
+        scaled = [t // scale - base for t in valid]
+        # 点間の間隔がint32に収まらない場合は秒単位に切り替える
+        if all(MISSING_INT32 < d <= _INT32_MAX for d in _deltas(scaled)):
+            deltas = _sparse_deltas(
+                [None if t == MISSING_TIME else t // scale - base for t in times]
+            )
+            return float(base * scale), scale, deltas
+    raise ValueError("時刻の間隔が大きすぎてエンコードできません")
+
+
+def _int32_bytes(values: list[int]) -> bytes:
+    """int32のリトルエンディアンのバイト列"""
+    column = array("i", values)
+    if sys.byteorder == "big":
+        column.byteswap()
+    return column.tobytes()
+
+
+def encode_points(columns: PointColumns, indices: Sequence[int] | None = None) -> bytes:
+    """
+    列データをバイナリ形式にエンコード
+
+    indicesを指定した場合はその点のみを含め、元のインデックスも列として格納する。
+    """
+    if indices is not None:
+        columns = columns.select(indices)
+
+    isnan = math.isnan
+    flags = 0
+    body: list[bytes] = []
+
+    if indices is not None:
+        flags |= FLAG_INDICES
+        body.append(_int32_bytes(_deltas(list(indices))))
+
+    body.append(
+        _int32_bytes(_deltas([round(v * COORDINATE_SCALE) for v in columns.latitudes]))
+    )
+    body.append(
+        _int32_bytes(_deltas([round(v * COORDINATE_SCALE) for v in columns.longitudes]))
+    )
+
+    elevations = [
+        None if isnan(e) else round(e * ELEVATION_SCALE) for e in columns.elevations
+    ]
+    if any(e is not None for e in elevations):
+        flags |= FLAG_ELEVATION
+        body.append(_int32_bytes(_sparse_deltas(elevations)))
+
+    base_time = 0.0
+    time_scale = 1
+    time_column = _time_column(columns.times)
+    if time_column is not None:
+        flags |= FLAG_TIME
+        base_time, time_scale, time_deltas = time_column
+        body.append(_int32_bytes(time_deltas))
+
+    header = _HEADER.pack(
+        MAGIC, FORMAT_VERSION, flags, len(columns), time_scale, base_time
+    )
+    return header + b"".join(body)
+
+
+def _read_column(data: bytes, offset: int, count: int) -> IntColumn:
+    """int32列を読み込む"""
+    end = offset + count * 4
+    if end > len(data):
+        raise PointEncodingError("データが途中で終わっています")
+    column = array("i")
+    column.frombytes(data[offset:end])
+    if sys.byteorder == "big":
+        column.byteswap()
+    return column
+
+
+def _undelta(deltas: IntColumn) -> list[int]:
+    """差分列を絶対値に戻す"""
+    total = 0
+    values: list[int] = []
+    for d in deltas:
+        total += d
+        values.append(total)
+    return values
+
+
+def _sparse_undelta(deltas: IntColumn) -> list[int | None]:
+    """欠損を含む差分列を絶対値に戻す"""
+    total = 0
+    values: list[int | None] = []
+    for d in deltas:
+        if d == MISSING_INT32:
+            values.append(None)
+        else:
+            total += d
+            values.append(total)
+    return values
+
+
+def decode_points(data: bytes) -> dict[str, list[Any]]:
+    """
+    バイナリ形式をデコード（テスト・検証用）
+
+    latitudes/longitudes/elevations/times（エポックms）と、含まれていれば
+    indicesの列を返す。
+    """
+    if len(data) < HEADER_SIZE:
+        raise PointEncodingError("ヘッダーが不完全です")
+    magic, version, flags, count, time_scale, base_time = _HEADER.unpack_from(data)
+    if magic != MAGIC or version != FORMAT_VERSION:
+        raise PointEncodingError("未対応の形式です")
+
+    offset = HEADER_SIZE
+    result: dict[str, list[Any]] = {}
+
+    if flags & FLAG_INDICES:
+        result["indices"] = _undelta(_read_column(data, offset, count))
+        offset += count * 4
+
+    for key in ("latitudes", "longitudes"):
+        values = _undelta(_read_column(data, offset, count))
+        result[key] = [v / COORDINATE_SCALE for v in values]
+        offset += count * 4
+
+    elevations: list[float | None] = [None] * count
+    if flags & FLAG_ELEVATION:
+        elevations = [
+            None if e is None else e / ELEVATION_SCALE
+            for e in _sparse_undelta(_read_column(data, offset, count))
+        ]
+        offset += count * 4
+    result["elevations"] = elevations
+
+    times: list[float | None] = [None] * count
+    if flags & FLAG_TIME:
+        times = [
+            None if t is None else base_time + t * time_scale
+            for t in _sparse_undelta(_read_column(data, offset, count))
+        ]
+    result["times"] = times
+
+    return result
@@ -0,0 +1,180 @@
+"""リクエスト単位のサンプリングプロファイラー
+
+プロファイル対象のリクエストの間、別スレッドから一定間隔でスタックを
+採取し、遅かったリクエストの呼び出しツリーをファイルに書き出す。
+
+採取するのは、リクエストを受け付けたスレッド（イベントループ）と、
+stage()でそのリクエストの処理を実行中のスレッド（スレッドプールなど）。
+イベントループは他のリクエストと共有しているため、同時に処理していた
+リクエストのスタックが混ざることがある。
+"""
+
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from collections.abc import Iterable
+from datetime import datetime
+from pathlib import Path
+from types import FrameType
+from typing import Final
+
+
+# 呼び出しツリーに出力する最小の割合（これ未満の枝は省略）
+MIN_TREE_FRACTION: Final[float] = 0.005
+# ファイル名に使えない文字
+_UNSAFE_FILENAME_CHARS = re.compile(r"[^A-Za-z0-9_.-]+")
+
+Stack = tuple[str, ...]
+
+
+def _frame_label(frame: FrameType) -> str:
+    """フレームの表示名（関数名 (ファイル:行)）"""
+    code = frame.f_code
+    return f"{code.co_name} ({code.co_filename}:{frame.f_lineno})"
+
+
+def _stack_of(frame: FrameType | None) -> Stack:
+    """フレームから根元→末端の順のスタック"""
+    labels: list[str] = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    return tuple(reversed(labels))
+
+
+class _TreeNode:
+    """呼び出しツリーのノード"""
+
+    __slots__ = ("samples", "children")
+
+    def __init__(self) -> None:
+        self.samples = 0
+        self.children: dict[str, _TreeNode] = {}
+
+
+def format_call_tree(stacks: Counter[Stack], min_fraction: float) -> str:
+    """スタックごとのサンプル数から呼び出しツリーのテキストを作る"""
+    root = _TreeNode()
+    for stack, count in stacks.items():
+        root.samples += count
+        node = root
+        for label in stack:
+            node = node.children.setdefault(label, _TreeNode())
+            node.samples += count
+
+    total = root.samples or 1
+    lines: list[str] = []
+
+    def walk(node: _TreeNode, depth: int) -> None:
+        children = sorted(node.children.items(), key=lambda item: -item[1].samples)
+        for label, child in children:
+            if child.samples / total < min_fraction:
+                continue
+            lines.append(
+                f"{child.samples / total:6.1%} {child.samples:>6}  "
+                f"{'  ' * depth}{label}"
+            )
+            walk(child, depth + 1)
+
+    walk(root, 0)
+    return "\n".join(lines)
+
+
+def format_folded(stacks: Counter[Stack]) -> str:
+    """flamegraph.pl・speedscope等で読める折りたたみ形式（a;b;c 件数）"""
+    return "\n".join(
+        f"{';'.join(stack)} {count}" for stack, count in sorted(stacks.items())
+    )
+
+
+class RequestProfiler:
+    """
+    1リクエスト分のサンプリングプロファイラー
+
+    start()からstop()までの間、interval秒ごとに対象スレッドのスタックを採取する。
+    """
+
+    def __init__(self, interval: float, thread_ids: Iterable[int] = ()) -> None:
+        self._interval = interval
+        # スレッドID → stage()の入れ子の深さ（0になったら対象から外す）
+        self._threads: dict[int, int] = {tid: 1 for tid in thread_ids}
+        self._stacks: Counter[Stack] = Counter()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._sampler: threading.Thread | None = None
+        self._started_at = 0.0
+        self._duration = 0.0
+
+    def enter_thread(self, thread_id: int) -> None:
+        """スレッドを採取対象に加える"""
+        with self._lock:
+            self._threads[thread_id] = self._threads.get(thread_id, 0) + 1
+
+    def exit_thread(self, thread_id: int) -> None:
+        """スレッドを採取対象から外す（入れ子になっていれば最後の1回で外す）"""
+        with self._lock:
+            depth = self._threads.get(thread_id, 0) - 1
+            if depth > 0:
+                self._threads[thread_id] = depth
+            else:
+                self._threads.pop(thread_id, None)
+
+    def start(self) -> None:
+        """採取を開始"""
+        self._started_at = time.perf_counter()
+        self._sampler = threading.Thread(
+            target=self._run, name="request-profiler", daemon=True
+        )
+        self._sampler.start()
+
+    def stop(self) -> None:
+        """採取を終了"""
+        self._duration = time.perf_counter() - self._started_at
+        self._stopped.set()
+        if self._sampler is not None:
+            self._sampler.join()
+
+    @property
+    def sample_count(self) -> int:
+        """採取したサンプル数"""
+        return sum(self._stacks.values())
+
+    def sample(self) -> None:
+        """対象スレッドのスタックを1回採取"""
+        frames = sys._current_frames()
+        with self._lock:
+            thread_ids = list(self._threads)
+        for thread_id in thread_ids:
+            frame = frames.get(thread_id)
+            if frame is not None:
+                self._stacks[_stack_of(frame)] += 1
+
+    def _run(self) -> None:
+        """採取スレッドの本体"""
+        while not self._stopped.wait(self._interval):
+            self.sample()
+
+    def write(self, directory: Path, method: str, path: str, status: int) -> Path:
+        """呼び出しツリー（.txt）と折りたたみ形式（.folded）を書き出し、.txtのパスを返す"""
+        directory.mkdir(parents=True, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        slug = _UNSAFE_FILENAME_CHARS.sub("_", path.strip("/"))[:80] or "root"
+        duration_ms = self._duration * 1000
+        stem = f"{stamp}-{method}-{slug}-{duration_ms:.0f}ms"
+
+        header = (
+            f"{method} {path} -> {status}\n"
+            f"duration: {duration_ms:.1f} ms, samples: {self.sample_count}, "
+            f"interval: {self._interval * 1000:g} ms\n\n"
+        )
+        txt_path = directory / f"{stem}.txt"
+        txt_path.write_text(
+            header + format_call_tree(self._stacks, MIN_TREE_FRACTION) + "\n",
+            encoding="utf-8",
+        )
+        (directory / f"{stem}.folded").write_text(
+            format_folded(self._stacks) + "\n", encoding="utf-8"
+        )
+        return txt_path
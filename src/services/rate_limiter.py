@@ -0,0 +1,119 @@
+"""レート制限
+
+Nominatimの利用規約（1秒に1リクエストまで）をワーカー数やコンテナ数に
+関係なく守るため、次にリクエストしてよい時刻（スロット）をSQLiteに保存し、
+全プロセスで予約し合う。容量1のトークンバケットに相当する。
+"""
+
+import asyncio
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Final
+
+from src.services.geocoding_store import connect
+
+
+# 時計の巻き戻り等で保存済みのスロットが異常に先になった場合の待ち時間の上限（間隔の倍数）
+MAX_WAIT_INTERVALS: Final[int] = 60
+
+_SCHEMA: Final[str] = """
+CREATE TABLE IF NOT EXISTS rate_limits (
+    name TEXT PRIMARY KEY,
+    next_slot REAL NOT NULL
+)
+"""
+
+
+class RateLimiter:
+    """プロセス内のレート制限（リクエスト間隔をinterval秒以上空ける）"""
+
+    def __init__(self, interval: float) -> None:
+        self._interval = interval
+        self._next_slot: float = 0.0
+
+    @property
+    def interval(self) -> float:
+        """最小リクエスト間隔（秒）"""
+        return self._interval
+
+    def _reserve_local(self) -> float:
+        """プロセス内で次のスロットを予約し、待ち時間（秒）を返す"""
+        now = time.monotonic()
+        slot = max(now, self._next_slot)
+        self._next_slot = slot + self._interval
+        return slot - now
+
+    async def acquire(self) -> None:
+        """リクエストしてよい時刻まで待つ"""
+        wait = self._reserve_local()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+class SharedRateLimiter(RateLimiter):
+    """
+    プロセス間で共有するレート制限（SQLite）
+
+    - BEGIN IMMEDIATEで書き込みロックを取ってスロットを予約するため、
+      同じデータベースを使う全プロセスで間隔が守られる
+    - データベースを使えない場合はプロセス内の制限で代替する
+    """
+
+    def __init__(self, path: Path, name: str, interval: float) -> None:
+        super().__init__(interval)
+        self._path = path
+        self._name = name
+        self._conn: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        """接続を取得（初回のみスキーマ作成）"""
+        if self._conn is None:
+            conn = connect(self._path)
+            conn.execute(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def _reserve_shared(self) -> float:
+        """全プロセス共通の次のスロットを予約し、待ち時間（秒）を返す"""
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT next_slot FROM rate_limits WHERE name = ?", (self._name,)
+                ).fetchone()
+                now = time.time()
+                next_slot = row[0] if row is not None else 0.0
+                slot = min(
+                    max(now, next_slot), now + self._interval * MAX_WAIT_INTERVALS
+                )
+                conn.execute(
+                    "INSERT OR REPLACE INTO rate_limits (name, next_slot)"
+                    " VALUES (?, ?)",
+                    (self._name, slot + self._interval),
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            return slot - now
+
+    async def acquire(self) -> None:
+        """リクエストしてよい時刻まで待つ"""
+        try:
+            # ロック待ちでイベントループを止めないよう別スレッドで予約
+            wait = await asyncio.to_thread(self._reserve_shared)
+        except (sqlite3.Error, OSError):
+            wait = self._reserve_local()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def close(self) -> None:
+        """接続をクローズ"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,179 @@
+"""トラック簡略化サービス（ズーム帯ごとのLODピラミッド）
+
+Douglas–Peucker法を1回だけ実行して各ポイントの「重要度」を求め、
+ズーム帯ごとの許容誤差でしきい値処理することで全レベルを生成する。
+各レベルは元のポイントインデックスの列として保持するため、
+タイムスライダー等は元のポイントとの対応を保ったまま利用できる。
+"""
+
+import math
+from array import array
+from typing import Any, Final
+
+from pydantic import BaseModel, ConfigDict, Field
+
+from src.models.gpx import EARTH_RADIUS_M, GpxData, IntColumn, TrackSegment
+
+
+# ズーム帯 (最小ズーム, 最大ズーム)。許容誤差は帯の最大ズームで計算する
+ZOOM_BANDS: Final[tuple[tuple[int, int], ...]] = (
+    (0, 9),
+    (10, 11),
+    (12, 13),
+    (14, 15),
+    (16, 19),
+)
+# 許容誤差（画面上のピクセル数）
+PIXEL_TOLERANCE: Final[float] = 1.0
+# Webメルカトルでのズーム0・赤道における1ピクセルあたりの距離(m)
+_METERS_PER_PIXEL_Z0: Final[float] = 2 * math.pi * EARTH_RADIUS_M / 256
+
+
+def tolerance_for_zoom(zoom: int, latitude: float) -> float:
+    """指定ズーム・緯度で1ピクセル相当の距離(m)に許容ピクセル数を掛けた値"""
+    meters_per_pixel = _METERS_PER_PIXEL_Z0 * math.cos(math.radians(latitude))
+    return meters_per_pixel / (1 << zoom) * PIXEL_TOLERANCE
+
+
+class SimplificationLevel(BaseModel):
+    """簡略化レベル（1つのズーム帯に対応）"""
+
+    model_config = ConfigDict(frozen=True, arbitrary_types_allowed=True)
+
+    min_zoom: int = Field(description="最小ズーム")
+    max_zoom: int = Field(description="最大ズーム")
+    tolerance_m: float = Field(description="許容誤差(m)")
+    indices: IntColumn = Field(description="採用したポイントの元インデックス")
+
+
+class TrackPyramid(BaseModel):
+    """ズーム帯ごとの簡略化レベルの集合"""
+
+    model_config = ConfigDict(frozen=True)
+
+    point_count: int = Field(description="元のポイント数")
+    levels: tuple[SimplificationLevel, ...] = Field(description="簡略化レベル")
+
+    def level_for_zoom(self, zoom: int) -> SimplificationLevel:
+        """ズームに対応するレベルを取得（範囲外は最も近いレベル）"""
+        for level in self.levels:
+            if level.min_zoom <= zoom <= level.max_zoom:
+                return level
+        return self.levels[0] if zoom < self.levels[0].min_zoom else self.levels[-1]
+
+    def point_levels(self) -> list[int]:
+        """
+        ポイントごとに、含まれる最も粗いレベルの番号（どのレベルにも含まれない
+        場合はレベル数）
+
+        細かいレベルは粗いレベルのポイントをすべて含むため、レベルkのポイントは
+        値がk以下のポイントになる（クライアントはポイント列から各レベルを作れる）。
+        """
+        point_levels = [len(self.levels)] * self.point_count
+        for number in reversed(range(len(self.levels))):
+            for i in self.levels[number].indices:
+                point_levels[i] = number
+        return point_levels
+
+    def to_json(self) -> list[dict[str, Any]]:
+        """テンプレート用のJSONシリアライズ可能な形式に変換"""
+        return [
+            {
+                "min_zoom": level.min_zoom,
+                "max_zoom": level.max_zoom,
+                "indices": level.indices.tolist(),
+            }
+            for level in self.levels
+        ]
+
+
+def _project(
+    segment: TrackSegment, ref_latitude: float
+) -> tuple[list[float], list[float]]:
+    """正距円筒図法で平面座標(m)に投影"""
+    scale_x = math.radians(1) * EARTH_RADIUS_M * math.cos(math.radians(ref_latitude))
+    scale_y = math.radians(1) * EARTH_RADIUS_M
+    xs = [lon * scale_x for lon in segment.longitudes]
+    ys = [lat * scale_y for lat in segment.latitudes]
+    return xs, ys
+
+
+def point_significance(
+    xs: list[float], ys: list[float], min_tolerance: float = 0.0
+) -> list[float]:
+    """
+    Douglas–Peucker法で各ポイントの重要度を計算
+
+    重要度は「そのポイントが採用される最大の許容誤差」で、親の分割点の
+    重要度で頭打ちにするため、しきい値処理の結果は同じ許容誤差での
+    Douglas–Peucker法の結果と一致する。min_tolerance以下の部分は探索しない。
+    """
+    count = len(xs)
+    significance = [0.0] * count
+    if count == 0:
+        return significance
+    significance[0] = math.inf
+    significance[-1] = math.inf
+
+    hypot = math.hypot
+    stack: list[tuple[int, int, float]] = [(0, count - 1, math.inf)]
+    while stack:
+        start, end, parent = stack.pop()
+        if end - start < 2:
+            continue
+
+        x0, y0 = xs[start], ys[start]
+        dx, dy = xs[end] - x0, ys[end] - y0
+        norm = hypot(dx, dy)
+        inner_x = xs[start + 1 : end]
+        inner_y = ys[start + 1 : end]
+        if norm == 0:
+            distances = [hypot(px - x0, py - y0) for px, py in zip(inner_x, inner_y)]
+        else:
+            distances = [
+                abs(dy * (px - x0) - dx * (py - y0)) / norm
+                for px, py in zip(inner_x, inner_y)
+            ]
+
+        max_distance = max(distances)
+        value = min(max_distance, parent)
+        if value <= min_tolerance:
+            continue
+
+        split = start + 1 + distances.index(max_distance)
+        significance[split] = value
+        stack.append((start, split, value))
+        stack.append((split, end, value))
+
+    return significance
+
+
+def build_pyramid(
+    gpx_data: GpxData, zoom_bands: tuple[tuple[int, int], ...] = ZOOM_BANDS
+) -> TrackPyramid:
+    """トラック全体の簡略化ピラミッドを作成"""
+    center = gpx_data.stats.center
+    ref_latitude = center[0] if center else 0.0
+    tolerances = [
+        tolerance_for_zoom(max_zoom, ref_latitude) for _, max_zoom in zoom_bands
+    ]
+    min_tolerance = min(tolerances)
+
+    # セグメントごとに重要度を計算し、元のポイント順で連結
+    significance: list[float] = []
+    for segment in gpx_data.iter_segments():
+        xs, ys = _project(segment, ref_latitude)
+        significance.extend(point_significance(xs, ys, min_tolerance))
+
+    levels = tuple(
+        SimplificationLevel(
+            min_zoom=min_zoom,
+            max_zoom=max_zoom,
+            tolerance_m=tolerance,
+            indices=array(
+                "q", [i for i, s in enumerate(significance) if s > tolerance]
+            ),
+        )
+        for (min_zoom, max_zoom), tolerance in zip(zoom_bands, tolerances)
+    )
+    return TrackPyramid(point_count=len(significance), levels=levels)
@@ -0,0 +1,105 @@
+"""リクエスト内の段階ごとの処理時間
+
+stage()で囲んだ処理の時間を、実行中のリクエストの記録（Server-Timing
+ヘッダーの元）とメトリクス（gpx_stage_duration_seconds）の両方に残す。
+リクエストの外（起動時の事前レンダリングなど）ではメトリクスのみに残す。
+"""
+
+import re
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Protocol
+
+from src.services.metrics import STAGE_SECONDS
+
+
+# Server-Timingのメトリクス名に使えない文字
+_INVALID_TOKEN_CHARS = re.compile(r"[^A-Za-z0-9!#$%&'*+.^_`|~-]")
+
+
+class StageObserver(Protocol):
+    """段階の開始・終了を受け取るもの（プロファイラーなど）"""
+
+    def enter_thread(self, thread_id: int) -> None: ...
+
+    def exit_thread(self, thread_id: int) -> None: ...
+
+
+class RequestTimings:
+    """1リクエスト分の段階ごとの処理時間"""
+
+    def __init__(self, observer: StageObserver | None = None) -> None:
+        self.started_at = time.perf_counter()
+        self.observer = observer
+        # (段階名, 秒) を記録順に保持（同じ段階が複数回あれば合算して出力）
+        self._stages: list[tuple[str, float]] = []
+        self._lock = threading.Lock()
+
+    def add(self, name: str, seconds: float) -> None:
+        """段階の処理時間を追加"""
+        with self._lock:
+            self._stages.append((name, seconds))
+
+    def stages(self) -> dict[str, float]:
+        """段階ごとの合計処理時間（秒、最初に現れた順）"""
+        totals: dict[str, float] = {}
+        with self._lock:
+            for name, seconds in self._stages:
+                totals[name] = totals.get(name, 0.0) + seconds
+        return totals
+
+    def elapsed(self) -> float:
+        """リクエスト開始からの経過時間（秒）"""
+        return time.perf_counter() - self.started_at
+
+    def server_timing(self) -> str:
+        """Server-Timingヘッダーの値（各段階とtotal、ミリ秒）"""
+        entries = [
+            f"{_INVALID_TOKEN_CHARS.sub('_', name)};dur={seconds * 1000:.1f}"
+            for name, seconds in self.stages().items()
+        ]
+        entries.append(f"total;dur={self.elapsed() * 1000:.1f}")
+        return ", ".join(entries)
+
+
+_current_timings: ContextVar[RequestTimings | None] = ContextVar(
+    "request_timings", default=None
+)
+
+
+def current_timings() -> RequestTimings | None:
+    """実行中のリクエストの記録（リクエストの外ではNone）"""
+    return _current_timings.get()
+
+
+@contextmanager
+def request_timings(timings: RequestTimings) -> Iterator[RequestTimings]:
+    """withブロックの中をtimingsに記録するリクエストとして扱う"""
+    token = _current_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _current_timings.reset(token)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """withブロックの処理時間を段階nameとして記録"""
+    timings = _current_timings.get()
+    observer = timings.observer if timings is not None else None
+    thread_id = threading.get_ident()
+    if observer is not None:
+        observer.enter_thread(thread_id)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        if observer is not None:
+            observer.exit_thread(thread_id)
+        STAGE_SECONDS.observe(seconds, stage=name)
+        if timings is not None:
+            timings.add(name, seconds)
@@ -0,0 +1,572 @@
+"""トラックストアサービス
+
+パース済みトラックと派生データをアップロード内容のSHA-256（コンテンツハッシュ）を
+IDとしてメモリ上にLRUで保持する（バイト数上限付き）。元のGPXはディスクにも保存し、
+別ワーカーや再起動後のリクエストではディスクから読み直して復元する。
+"""
+
+import asyncio
+import hashlib
+import json
+import math
+import os
+import re
+import shutil
+import time
+from collections.abc import Sequence
+from datetime import datetime, timedelta, timezone
+from functools import cached_property
+from pathlib import Path
+from typing import Any, Final
+
+from pydantic import BaseModel, ConfigDict, Field
+
+from src.config import settings
+from src.models.gpx import MISSING_TIME, GpxData, TrackStats
+from src.services.cache import CacheStats, LRUCache
+from src.services.geodesy import TrackProfile, compute_profile
+from src.services.compression import FailedMember, merge_gpx
+from src.services.gpx_parser import GpxParseError
+from src.services.parse_pool import get_parse_pool
+from src.services.point_encoding import PointColumns, encode_points
+from src.services.simplify import TrackPyramid, build_pyramid
+from src.services.timing import stage
+
+
+# ペイロード形式のバージョン（派生データの形式を変えたら更新してETagを切り替える）
+PAYLOAD_VERSION: Final[str] = "2"
+
+_TRACK_ID_PATTERN: Final = re.compile(r"^[0-9a-f]{64}$")
+
+# 派生データ（連結列・プロファイル・簡略化インデックス）の1点あたりの概算バイト数
+_DERIVED_BYTES_PER_POINT: Final[int] = 32 + 40 + 16
+# モデル等の固定的なオーバーヘッドの概算バイト数
+_ENTRY_OVERHEAD_BYTES: Final[int] = 4 * 1024
+
+# ディスク上の期限切れファイルを掃除する間隔（秒）
+_PRUNE_INTERVAL: Final[float] = 10 * 60
+
+# 日本時間
+JST = timezone(timedelta(hours=9))
+
+
+def compute_track_id(content: bytes) -> str:
+    """アップロード内容からトラックIDを計算"""
+    return hashlib.sha256(content).hexdigest()
+
+
+def is_valid_track_id(track_id: str) -> bool:
+    """トラックIDの形式が正しいか"""
+    return _TRACK_ID_PATTERN.match(track_id) is not None
+
+
+def get_time_range(stats: TrackStats) -> dict[str, str] | None:
+    """集計値から時間範囲を取得"""
+    if stats.start_time_ms is None or stats.end_time_ms is None:
+        return None
+
+    min_time = datetime.fromtimestamp(stats.start_time_ms / 1000, tz=timezone.utc)
+    max_time = datetime.fromtimestamp(stats.end_time_ms / 1000, tz=timezone.utc)
+
+    # 日本時間に変換
+    min_time_jst = min_time.astimezone(JST)
+    max_time_jst = max_time.astimezone(JST)
+
+    return {
+        "start": min_time.isoformat(),
+        "end": max_time.isoformat(),
+        "start_local": min_time_jst.strftime("%Y年%m月%d日 %H:%M:%S"),
+        "end_local": max_time_jst.strftime("%Y年%m月%d日 %H:%M:%S"),
+        "start_date": min_time_jst.strftime("%Y-%m-%d"),
+        "start_time": min_time_jst.strftime("%H:%M:%S"),
+    }
+
+
+def _try_rename(source: Path, destination: Path) -> bool:
+    """ファイルをアトミックに移動（別のファイルシステムなどで失敗したらFalse）"""
+    try:
+        os.replace(source, destination)
+    except OSError:
+        return False
+    return True
+
+
+def compute_batch_id(track_ids: list[str]) -> str:
+    """複数ファイルをまとめたトラックのID（含まれるトラックIDの並びから計算）"""
+    return hashlib.sha256("\n".join(["batch", *track_ids]).encode()).hexdigest()
+
+
+class BatchMember(BaseModel):
+    """まとめたトラックに含まれるファイル"""
+
+    model_config = ConfigDict(frozen=True)
+
+    track_id: str = Field(description="ファイル単体のトラックID")
+    filename: str = Field(description="ファイル名")
+    stats: TrackStats = Field(description="ファイル単体の集計値")
+
+
+class FailedFile(BaseModel):
+    """まとめてアップロードしたうち、取り込めなかったファイル"""
+
+    model_config = ConfigDict(frozen=True)
+
+    filename: str = Field(description="ファイル名")
+    message: str = Field(description="エラーメッセージ")
+
+
+def failed_members(
+    filename: str, members: Sequence[FailedMember]
+) -> tuple[FailedFile, ...]:
+    """zip内の取り込めなかった.gpxをFailedFileに変換（ファイル名は「zip名/.gpx名」）"""
+    return tuple(
+        FailedFile(filename=f"{filename}/{member.name}", message=member.message)
+        for member in members
+    )
+
+
+class StoredTrack(BaseModel):
+    """保存済みトラック（派生データは初回アクセス時に計算してキャッシュ）"""
+
+    model_config = ConfigDict(frozen=True)
+
+    track_id: str = Field(description="トラックID（SHA-256）")
+    filename: str = Field(description="ファイル名")
+    gpx_data: GpxData = Field(description="パース済みGPXデータ")
+    members: tuple[BatchMember, ...] = Field(
+        default=(), description="まとめたトラックに含まれるファイル（単体なら空）"
+    )
+    failed: tuple[FailedFile, ...] = Field(
+        default=(), description="まとめてアップロードしたうち取り込めなかったファイル"
+    )
+
+    @cached_property
+    def profile(self) -> TrackProfile:
+        """距離・標高プロファイル"""
+        return compute_profile(self.gpx_data)
+
+    @cached_property
+    def pyramid(self) -> TrackPyramid:
+        """ズーム帯ごとの簡略化ピラミッド"""
+        return build_pyramid(self.gpx_data)
+
+    @cached_property
+    def columns(self) -> PointColumns:
+        """全セグメントを連結した列データ"""
+        return PointColumns.from_gpx(self.gpx_data)
+
+    def set_derived(self, profile: TrackProfile, pyramid: TrackPyramid) -> None:
+        """計算済みの派生データを設定（パースと同じ子プロセスで計算した場合）"""
+        # cached_propertyと同じくインスタンスの__dict__に保持する
+        self.__dict__["profile"] = profile
+        self.__dict__["pyramid"] = pyramid
+
+    def compute_derived(self) -> None:
+        """派生データを計算しておく（初回のリクエストで計算しないように）"""
+        # cached_propertyにアクセスして計算結果を保持させる
+        _ = self.profile, self.pyramid
+
+    def estimated_size(self) -> int:
+        """キャッシュ上の占有バイト数の概算（派生データを含む）"""
+        column_bytes = sum(
+            column.itemsize * len(column)
+            for segment in self.gpx_data.iter_segments()
+            for column in (
+                segment.latitudes,
+                segment.longitudes,
+                segment.elevations,
+                segment.times,
+            )
+        )
+        derived_bytes = self.gpx_data.point_count * _DERIVED_BYTES_PER_POINT
+        return column_bytes + derived_bytes + _ENTRY_OVERHEAD_BYTES
+
+    def etag(self, variant: str) -> str:
+        """ペイロード種別ごとの強いETag"""
+        return f'"{self.track_id}-{PAYLOAD_VERSION}-{variant}"'
+
+    def metadata(self) -> dict[str, Any]:
+        """メタデータ（ポイント列を含まない軽量な情報）"""
+        stats = self.gpx_data.stats
+        center = stats.center
+        bounds = stats.bounds
+        with stage("time_range"):
+            time_range = get_time_range(stats)
+        with stage("simplify"):
+            levels = self.pyramid.levels
+
+        return {
+            "id": self.track_id,
+            "filename": self.filename,
+            "point_count": stats.point_count,
+            "center": {"lat": center[0], "lng": center[1]} if center else None,
+            "bounds": {
+                "min_lat": bounds[0],
+                "min_lng": bounds[1],
+                "max_lat": bounds[2],
+                "max_lng": bounds[3],
+            }
+            if bounds
+            else None,
+            "time_range": time_range,
+            "stats": {
+                "distance_m": stats.distance_m,
+                "elevation_min": stats.elevation_min,
+                "elevation_max": stats.elevation_max,
+                "elevation_gain": stats.elevation_gain,
+                "elevation_loss": stats.elevation_loss,
+                "segment_count": len(stats.segments),
+            },
+            "levels": [
+                {
+                    "min_zoom": level.min_zoom,
+                    "max_zoom": level.max_zoom,
+                    "point_count": len(level.indices),
+                }
+                for level in levels
+            ],
+            "files": [
+                {
+                    "id": member.track_id,
+                    "filename": member.filename,
+                    "point_count": member.stats.point_count,
+                    "distance_m": member.stats.distance_m,
+                    "elevation_gain": member.stats.elevation_gain,
+                    "time_range": get_time_range(member.stats),
+                }
+                for member in self.members
+            ],
+            "errors": [
+                {"filename": failed.filename, "message": failed.message}
+                for failed in self.failed
+            ],
+        }
+
+    def points_payload(self, zoom: int | None = None) -> dict[str, Any]:
+        """
+        ポイント列（時刻はエポックミリ秒の数値）
+
+        zoomを指定した場合は該当ズーム帯の簡略化レベルのポイントのみを返し、
+        indicesに元のポイントインデックスを含める。
+        """
+        columns = self.columns
+        isnan = math.isnan
+        points = [
+            {
+                "lat": lat,
+                "lng": lng,
+                "ele": None if isnan(ele) else ele,
+                "time": None if epoch_ms == MISSING_TIME else epoch_ms,
+            }
+            for lat, lng, ele, epoch_ms in zip(
+                columns.latitudes,
+                columns.longitudes,
+                columns.elevations,
+                columns.times,
+            )
+        ]
+        if zoom is None:
+            return {"points": points}
+
+        level = self.pyramid.level_for_zoom(zoom)
+        return {
+            "min_zoom": level.min_zoom,
+            "max_zoom": level.max_zoom,
+            "indices": level.indices.tolist(),
+            "points": [points[i] for i in level.indices],
+        }
+
+    def points_binary(self, zoom: int | None = None) -> bytes:
+        """ポイント列のバイナリ形式（zoom指定時は該当レベルのポイントのみ）"""
+        if zoom is None:
+            return encode_points(self.columns)
+        return encode_points(self.columns, self.pyramid.level_for_zoom(zoom).indices)
+
+    def levels_payload(self) -> dict[str, Any]:
+        """簡略化レベルの一覧と、ポイントごとに含まれる最も粗いレベルの番号"""
+        pyramid = self.pyramid
+        return {
+            "levels": [
+                {"min_zoom": level.min_zoom, "max_zoom": level.max_zoom}
+                for level in pyramid.levels
+            ],
+            "point_levels": pyramid.point_levels(),
+        }
+
+    def profile_payload(self) -> dict[str, Any]:
+        """標高グラフ・区間速度の系列"""
+        return self.profile.to_chart_data()
+
+
+class TrackStore:
+    """
+    トラックストア
+
+    - メモリ上にトラックと派生データをLRUで保持（合計バイト数の上限付き）
+    - 元のGPXをディスクに保存し、メモリにない場合はディスクから復元
+      （パースと派生データの計算はパース用のプロセスプールで行う）
+    """
+
+    def __init__(self, storage_dir: Path, max_bytes: int, ttl: int) -> None:
+        self._storage_dir = storage_dir
+        self._ttl = ttl
+        self._cache: LRUCache[str, StoredTrack] = LRUCache(
+            max_bytes, StoredTrack.estimated_size
+        )
+        self._pinned: dict[str, StoredTrack] = {}
+        self._restoring: dict[str, asyncio.Task[StoredTrack | None]] = {}
+        self._last_pruned: float = 0.0
+
+    def put(
+        self, content: bytes, gpx_data: GpxData, filename: str, pinned: bool = False
+    ) -> StoredTrack:
+        """
+        パース済みトラックを保存
+
+        pinned=Trueの場合は追い出し対象外としてメモリに常駐させる
+        （デモ用サンプルなど、各ワーカーが起動時に登録するもの）。
+        """
+        track_id = compute_track_id(content)
+        stored = StoredTrack(track_id=track_id, filename=filename, gpx_data=gpx_data)
+        if pinned:
+            self._pinned[track_id] = stored
+            return stored
+        self._cache.put(track_id, stored)
+
+        # 既存でも保持期間を延ばすためディスク側は毎回更新
+        self._write_to_disk(track_id, content, filename)
+        return stored
+
+    def put_file(
+        self,
+        path: Path,
+        track_id: str,
+        gpx_data: GpxData,
+        filename: str,
+        profile: TrackProfile | None = None,
+        pyramid: TrackPyramid | None = None,
+        failed: Sequence[FailedFile] = (),
+    ) -> StoredTrack:
+        """
+        一時ファイルに書き出したアップロード内容からパース済みトラックを保存
+
+        track_idは内容のSHA-256。ファイルはストアのディレクトリに移動する
+        （既に保存済みの場合はそのまま残す）。
+        profile・pyramidを指定した場合は派生データとしてそのまま使う。
+        failedにはzip内の取り込めなかった.gpxを指定する（復元時は再度パースして
+        求めるため保存しない）。
+        """
+        stored = StoredTrack(
+            track_id=track_id,
+            filename=filename,
+            gpx_data=gpx_data,
+            failed=tuple(failed),
+        )
+        if profile is not None and pyramid is not None:
+            stored.set_derived(profile, pyramid)
+        self._cache.put(track_id, stored)
+        self._write_to_disk(track_id, path, filename)
+        return stored
+
+    def put_batch(
+        self, members: list[StoredTrack], failed: list[FailedFile]
+    ) -> StoredTrack:
+        """
+        保存済みの複数のトラックを1つにまとめて保存
+
+        各ファイルは個別に保存済みのため、ディスクには含まれるトラックIDの一覧
+        のみを保存し、復元時はそれぞれを読み直してまとめる。
+        各ファイルのzip内で取り込めなかった.gpxもエラーとして表示する。
+        """
+        track_id = compute_batch_id([member.track_id for member in members])
+        filename = members[0].filename
+        if len(members) > 1:
+            filename = f"{filename} ほか{len(members) - 1}件"
+        stored = StoredTrack(
+            track_id=track_id,
+            filename=filename,
+            gpx_data=merge_gpx([member.gpx_data for member in members]),
+            members=tuple(
+                BatchMember(
+                    track_id=member.track_id,
+                    filename=member.filename,
+                    stats=member.gpx_data.stats,
+                )
+                for member in members
+            ),
+            failed=(*failed, *(item for member in members for item in member.failed)),
+        )
+        self._cache.put(track_id, stored)
+        self._write_meta(
+            track_id,
+            {
+                "filename": filename,
+                "members": [
+                    {"track_id": member.track_id, "filename": member.filename}
+                    for member in members
+                ],
+                "failed": [item.model_dump() for item in failed],
+            },
+        )
+        return stored
+
+    def cached(self, track_id: str) -> StoredTrack | None:
+        """メモリ上のトラックを取得（ディスクからは復元しない）"""
+        if not is_valid_track_id(track_id):
+            return None
+        return self._pinned.get(track_id) or self._cache.get(track_id)
+
+    async def get(self, track_id: str) -> StoredTrack | None:
+        """
+        トラックを取得（メモリになければディスクから復元）
+
+        復元時のパースと派生データの計算はパース用のプロセスプールで行う。
+        同じトラックの復元を同時に要求された場合は1回だけ復元する。
+
+        Raises:
+            ParsePoolBusy: プロセスプールの空きを待つリクエストが上限に達している場合
+        """
+        stored = self.cached(track_id)
+        if stored is not None or not is_valid_track_id(track_id):
+            return stored
+
+        task = self._restoring.get(track_id)
+        if task is None:
+            task = asyncio.create_task(self._restore(track_id))
+            self._restoring[track_id] = task
+            task.add_done_callback(lambda _: self._restoring.pop(track_id, None))
+        # 待っているリクエストが取り消されても、ほかのリクエストの復元は続ける
+        return await asyncio.shield(task)
+
+    def lookup(
+        self, content: bytes | Path, track_id: str | None = None
+    ) -> StoredTrack | None:
+        """
+        アップロード内容が同じトラックをメモリ上から取得（パースを省略するため）
+
+        contentには一時ファイルのパスも指定できる（その場合はtrack_idが必要）。
+        """
+        if track_id is None:
+            if isinstance(content, Path):
+                raise ValueError("track_id is required for a spooled upload")
+            track_id = compute_track_id(content)
+        stored = self._cache.get(track_id)
+        if stored is not None:
+            self._write_to_disk(stored.track_id, content, stored.filename)
+        return stored
+
+    def cache_stats(self) -> CacheStats:
+        """メモリキャッシュの統計情報"""
+        return self._cache.stats()
+
+    def _paths(self, track_id: str) -> tuple[Path, Path]:
+        """元GPXとメタデータのパス"""
+        return (
+            self._storage_dir / f"{track_id}.gpx",
+            self._storage_dir / f"{track_id}.json",
+        )
+
+    def _write_to_disk(
+        self, track_id: str, content: bytes | Path, filename: str
+    ) -> None:
+        """
+        元GPXとメタデータをディスクに保存（失敗してもメモリ上は利用可能）
+
+        contentがパスの場合はファイルを移動する（別のファイルシステムならコピー）。
+        """
+        gpx_path, meta_path = self._paths(track_id)
+        try:
+            self._storage_dir.mkdir(parents=True, exist_ok=True)
+            self._prune_disk()
+            if gpx_path.exists():
+                gpx_path.touch()
+            elif isinstance(content, Path) and _try_rename(content, gpx_path):
+                pass
+            else:
+                # 別ワーカーが読み込み途中のファイルを見ないよう一時ファイル経由で置換
+                tmp_path = gpx_path.with_suffix(f".{os.getpid()}.tmp")
+                if isinstance(content, Path):
+                    shutil.copyfile(content, tmp_path)
+                else:
+                    tmp_path.write_bytes(content)
+                os.replace(tmp_path, gpx_path)
+        except OSError:
+            return
+        self._write_meta(track_id, {"filename": filename})
+
+    def _write_meta(self, track_id: str, meta: dict[str, Any]) -> None:
+        """メタデータをディスクに保存（失敗してもメモリ上は利用可能）"""
+        _, meta_path = self._paths(track_id)
+        try:
+            self._storage_dir.mkdir(parents=True, exist_ok=True)
+            meta_path.write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+        except OSError:
+            pass
+
+    async def _restore(self, track_id: str) -> StoredTrack | None:
+        """ディスクに保存された元GPXをプロセスプールでパースして復元"""
+        gpx_path, meta_path = self._paths(track_id)
+        try:
+            meta = json.loads(meta_path.read_text(encoding="utf-8"))
+            if "members" in meta:
+                return await self._restore_batch(meta)
+            # 圧縮ファイルのアップロードは圧縮されたまま保存している
+            parsed = await get_parse_pool().parse_track(gpx_path)
+        except (OSError, ValueError, GpxParseError):
+            return None
+
+        filename = str(meta.get("filename", f"{track_id[:8]}.gpx"))
+        stored = StoredTrack(
+            track_id=track_id,
+            filename=filename,
+            gpx_data=parsed.gpx_data,
+            failed=failed_members(filename, parsed.failed),
+        )
+        stored.set_derived(parsed.profile, parsed.pyramid)
+        self._cache.put(track_id, stored)
+        return stored
+
+    async def _restore_batch(self, meta: dict[str, Any]) -> StoredTrack | None:
+        """まとめたトラックを、含まれる各トラックを復元してまとめ直す"""
+        members = await asyncio.gather(
+            *(self.get(str(item["track_id"])) for item in meta["members"])
+        )
+        restored = [member for member in members if member is not None]
+        if not restored or len(restored) != len(members):
+            return None
+        failed = [FailedFile.model_validate(item) for item in meta.get("failed", [])]
+        stored = self.put_batch(restored, failed)
+        # まとめたトラックの派生データはイベントループを止めないよう別スレッドで計算
+        await asyncio.to_thread(stored.compute_derived)
+        return stored
+
+    def _prune_disk(self) -> None:
+        """保持期間を過ぎたファイルを削除（一定間隔ごと）"""
+        now = time.time()
+        if now - self._last_pruned < _PRUNE_INTERVAL:
+            return
+        self._last_pruned = now
+
+        expires = now - self._ttl
+        for path in self._storage_dir.iterdir():
+            try:
+                if path.stat().st_mtime < expires:
+                    path.unlink()
+            except OSError:
+                continue
+
+
+# シングルトンインスタンス
+_track_store: TrackStore | None = None
+
+
+def get_track_store() -> TrackStore:
+    """トラックストアのシングルトンを取得"""
+    global _track_store
+    if _track_store is None:
+        _track_store = TrackStore(
+            storage_dir=settings.track_store_dir,
+            max_bytes=settings.track_cache_max_bytes,
+            ttl=settings.track_store_ttl,
+        )
+    return _track_store
@@ -0,0 +1,235 @@
+"""アップロードの受け付け（ストリーミング・ディスクへのスプール）
+
+multipart/form-dataのリクエストボディをチャンク単位で読みながら、ファイルの
+部分を一時ファイルに書き出す。ボディ全体をメモリ上のbytesにはせず、
+SHA-256（トラックID）も書き出しながら計算する。
+
+ボディがmax_sizeを超えた時点で読み込みを打ち切ってUploadTooLargeを送出する
+（Content-Lengthが上限を超えていれば読み込む前に送出する）。
+Content-Encoding: gzipのボディは展開しながら読み込む。
+"""
+
+import hashlib
+import tempfile
+from collections.abc import AsyncIterable, AsyncIterator, Mapping
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import IO
+
+from pydantic import BaseModel, ConfigDict, Field
+from python_multipart import MultipartParser
+from python_multipart.exceptions import MultipartParseError
+from python_multipart.multipart import parse_options_header
+
+from src.services.compression import (
+    DecompressionLimitExceeded,
+    DecompressionLimits,
+    gunzip_body,
+)
+from src.services.gpx_parser import GpxParseError
+
+
+class UploadError(Exception):
+    """アップロードを受け付けられない（形式の誤りなど）"""
+
+    pass
+
+
+class UploadTooLarge(UploadError):
+    """リクエストボディが上限を超えている"""
+
+    def __init__(self, max_size: int) -> None:
+        super().__init__(f"request body exceeds {max_size} bytes")
+        self.max_size = max_size
+
+
+class SpooledFile(BaseModel):
+    """一時ファイルに書き出したアップロードファイル"""
+
+    model_config = ConfigDict(frozen=True)
+
+    field_name: str = Field(description="フォームのフィールド名")
+    filename: str = Field(description="ファイル名")
+    path: Path = Field(description="一時ファイルのパス")
+    size: int = Field(description="バイト数")
+    sha256: str = Field(description="内容のSHA-256（トラックID）")
+
+
+class _SpoolingPart:
+    """書き出し中のファイル部分"""
+
+    __slots__ = ("field_name", "filename", "file", "size", "digest")
+
+    def __init__(self, field_name: str, filename: str, file: IO[bytes]) -> None:
+        self.field_name = field_name
+        self.filename = filename
+        self.file = file
+        self.size = 0
+        self.digest = hashlib.sha256()
+
+    def write(self, data: bytes) -> None:
+        self.file.write(data)
+        self.size += len(data)
+        self.digest.update(data)
+
+    def finish(self) -> SpooledFile:
+        self.file.close()
+        return SpooledFile(
+            field_name=self.field_name,
+            filename=self.filename,
+            path=Path(self.file.name),
+            size=self.size,
+            sha256=self.digest.hexdigest(),
+        )
+
+
+class _MultipartSpooler:
+    """multipartパーサーのコールバック（ファイル部分のみ一時ファイルに書き出す）"""
+
+    def __init__(self, directory: Path) -> None:
+        self._directory = directory
+        self._header_name = b""
+        self._header_value = b""
+        self._disposition = b""
+        self._part: _SpoolingPart | None = None
+        self.files: list[SpooledFile] = []
+        # 書き出し途中のものを含む全一時ファイル（エラー時の削除用）
+        self.paths: list[Path] = []
+
+    def on_part_begin(self) -> None:
+        self._disposition = b""
+        self._part = None
+
+    def on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_name += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def on_header_end(self) -> None:
+        if self._header_name.lower() == b"content-disposition":
+            self._disposition = self._header_value
+        self._header_name = b""
+        self._header_value = b""
+
+    def on_headers_finished(self) -> None:
+        _, options = parse_options_header(self._disposition)
+        if b"filename" not in options:
+            # ファイル以外のフィールドは使わないため読み捨てる
+            return
+        file = tempfile.NamedTemporaryFile(
+            dir=self._directory, prefix="upload-", suffix=".part", delete=False
+        )
+        self.paths.append(Path(file.name))
+        self._part = _SpoolingPart(
+            field_name=options.get(b"name", b"").decode("utf-8", "replace"),
+            filename=options[b"filename"].decode("utf-8", "replace"),
+            file=file,
+        )
+
+    def on_part_data(self, data: bytes, start: int, end: int) -> None:
+        # チャンクは数十KB程度のため、ページキャッシュへの書き込みはループ上で行う
+        if self._part is not None:
+            self._part.write(data[start:end])
+
+    def on_part_end(self) -> None:
+        if self._part is not None:
+            self.files.append(self._part.finish())
+            self._part = None
+
+    def close(self) -> None:
+        """書き出し途中の一時ファイルを閉じる"""
+        if self._part is not None:
+            self._part.file.close()
+            self._part = None
+
+
+def _remove(paths: list[Path]) -> None:
+    """一時ファイルを削除（移動済み・削除済みは無視）"""
+    for path in paths:
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+async def _limit_body(
+    body: AsyncIterable[bytes], max_size: int
+) -> AsyncIterator[bytes]:
+    """ボディをそのまま返し、max_sizeバイトを超えた時点でUploadTooLargeを送出"""
+    received = 0
+    async for chunk in body:
+        received += len(chunk)
+        if received > max_size:
+            raise UploadTooLarge(max_size)
+        yield chunk
+
+
+@asynccontextmanager
+async def spool_multipart(
+    headers: Mapping[str, str],
+    body: AsyncIterable[bytes],
+    directory: Path,
+    max_size: int,
+    limits: DecompressionLimits,
+) -> AsyncIterator[list[SpooledFile]]:
+    """
+    multipartのボディを読み込み、ファイル部分を一時ファイルに書き出す
+
+    Content-Encoding: gzipのボディは展開しながら読み込む（max_sizeは展開前の
+    バイト数、展開後はlimitsで制限する）。
+    withブロックを抜けると一時ファイルを削除する（ブロック内で別の場所に
+    移動したものはそのまま）。
+
+    Raises:
+        UploadTooLarge: ボディがmax_sizeバイトを超えた場合
+        DecompressionLimitExceeded: 展開後のボディがlimitsを超えた場合
+        UploadError: multipart/form-dataとして読めない場合
+    """
+    content_length = headers.get("content-length")
+    if content_length is not None and content_length.isdigit():
+        if int(content_length) > max_size:
+            raise UploadTooLarge(max_size)
+
+    content_type, options = parse_options_header(headers.get("content-type", ""))
+    boundary = options.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise UploadError("multipart/form-data ではありません")
+
+    chunks = _limit_body(body, max_size)
+    encoding = headers.get("content-encoding", "identity").strip().lower()
+    if encoding == "gzip":
+        chunks = gunzip_body(chunks, limits)
+    elif encoding != "identity":
+        raise UploadError(f"対応していないContent-Encodingです: {encoding}")
+
+    directory.mkdir(parents=True, exist_ok=True)
+    spooler = _MultipartSpooler(directory)
+    parser = MultipartParser(
+        boundary,
+        {
+            "on_part_begin": spooler.on_part_begin,
+            "on_part_data": spooler.on_part_data,
+            "on_part_end": spooler.on_part_end,
+            "on_header_field": spooler.on_header_field,
+            "on_header_value": spooler.on_header_value,
+            "on_header_end": spooler.on_header_end,
+            "on_headers_finished": spooler.on_headers_finished,
+        },
+    )
+    try:
+        try:
+            async for chunk in chunks:
+                parser.write(chunk)
+            parser.finalize()
+        except MultipartParseError as e:
+            raise UploadError(f"multipart/form-data の解析に失敗しました: {e}") from e
+        except DecompressionLimitExceeded:
+            raise
+        except GpxParseError as e:
+            raise UploadError(str(e)) from e
+        finally:
+            spooler.close()
+        yield spooler.files
+    finally:
+        _remove(spooler.paths)
@@ -1,9 +1,26 @@
 """pytest設定"""
 
+from pathlib import Path
+
 import pytest
 from fastapi.testclient import TestClient
 
+from src.config import settings
 from src.main import app
+from src.routers import home
+from src.services import track_store
+
+
+@pytest.fixture(autouse=True)
+def isolated_track_store(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """テストごとに一時ディレクトリを使うトラックストアに差し替え"""
+    store = track_store.TrackStore(
+        storage_dir=tmp_path / "tracks", max_bytes=64 * 1024 * 1024, ttl=60
+    )
+    monkeypatch.setattr(track_store, "_track_store", store)
+    monkeypatch.setattr(settings, "upload_spool_dir", tmp_path / "uploads")
+    # デモページは登録先のトラックストアと合わせて作り直す
+    monkeypatch.setattr(home, "_demo_page", None)
 
 
 @pytest.fixture
@@ -0,0 +1,213 @@
+"""住所タイムラインのテスト"""
+
+import json
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src.models.geocoding import AddressResult
+from src.models.gpx import GpxData, Track, TrackSegmentBuilder
+from src.routers import api
+from src.services import address_timeline
+from src.services.address_timeline import (
+    sample_address_points,
+    stream_address_timeline,
+)
+from src.services.geocoding import GeocodingService
+from src.services.rate_limiter import RateLimiter
+from src.services.track_store import StoredTrack, get_track_store
+
+
+# 緯度方向に約100mずつ進む間隔（度）
+STEP = 0.0009
+
+
+def make_track(*segments: list[tuple[float, float]]) -> StoredTrack:
+    """座標列からStoredTrackを作成"""
+    built = []
+    for points in segments:
+        builder = TrackSegmentBuilder()
+        for lat, lon in points:
+            builder.append(lat, lon)
+        built.append(builder.build())
+    gpx_data = GpxData(tracks=(Track(segments=tuple(built)),))
+    return StoredTrack(track_id="0" * 64, filename="test.gpx", gpx_data=gpx_data)
+
+
+def straight(
+    count: int, lat: float = 35.0, lon: float = 139.0
+) -> list[tuple[float, float]]:
+    """北向きに約100m間隔で並ぶ点列"""
+    return [(lat + i * STEP, lon) for i in range(count)]
+
+
+def make_service(
+    monkeypatch: pytest.MonkeyPatch,
+) -> tuple[GeocodingService, list[tuple[float, float]]]:
+    """問い合わせを記録するスタブに差し替えたサービス"""
+    service = GeocodingService(
+        cache_max_entries=100, cache_ttl=60, rate_limiter=RateLimiter(interval=0.0)
+    )
+    calls: list[tuple[float, float]] = []
+
+    async def fetch(lat: float, lng: float) -> AddressResult | None:
+        calls.append((lat, lng))
+        return AddressResult(prefecture="東京都", city="港区", road=f"{lat:.4f}")
+
+    monkeypatch.setattr(service, "_fetch_address", fetch)
+    return service, calls
+
+
+class TestSampleAddressPoints:
+    """sample_address_pointsのテスト"""
+
+    def test_samples_every_interval(self) -> None:
+        """一定距離ごとと終点を代表点にする"""
+        # Arrange
+        stored = make_track(straight(21))
+
+        # Act
+        indices = sample_address_points(stored, interval_m=500)
+
+        # Assert
+        assert indices == [0, 5, 10, 15, 20]
+
+    def test_samples_heading_change(self) -> None:
+        """進行方向が大きく変わった点を代表点にする"""
+        # Arrange
+        north = straight(4)
+        east = [(north[-1][0], 139.0 + i * STEP * 1.22) for i in range(1, 4)]
+        stored = make_track(north + east)
+
+        # Act
+        indices = sample_address_points(stored, interval_m=1000)
+
+        # Assert
+        assert 0 in indices
+        assert any(4 <= i <= 5 for i in indices)
+        assert indices[-1] == 6
+
+    def test_samples_segment_boundaries(self) -> None:
+        """各セグメントの始点と終点を代表点にする"""
+        # Arrange
+        stored = make_track(straight(3), straight(3, lat=36.0))
+
+        # Act
+        indices = sample_address_points(stored, interval_m=5000)
+
+        # Assert
+        assert indices == [0, 2, 3, 5]
+
+    def test_caps_sample_count(self) -> None:
+        """代表点が上限を超える場合は間隔を広げる"""
+        # Arrange
+        stored = make_track(straight(101))
+
+        # Act
+        indices = sample_address_points(stored, interval_m=100, max_samples=10)
+
+        # Assert
+        assert len(indices) <= 10
+        assert indices[0] == 0
+        assert indices[-1] == 100
+
+    def test_cap_includes_heading_changes(self) -> None:
+        """進行方向が変わった点も含めて上限に収め、始点と終点は残す"""
+        # Arrange
+        points = [(35.0, 139.0)]
+        for leg in range(20):
+            for _ in range(3):
+                lat, lon = points[-1]
+                if leg % 2 == 0:
+                    points.append((lat + STEP, lon))
+                else:
+                    points.append((lat, lon + STEP * 1.22))
+        stored = make_track(points)
+        uncapped = sample_address_points(stored, interval_m=1000, max_samples=0)
+
+        # Act
+        indices = sample_address_points(stored, interval_m=1000, max_samples=10)
+
+        # Assert
+        assert len(uncapped) > 10
+        assert len(indices) == 10
+        assert indices[0] == 0
+        assert indices[-1] == len(points) - 1
+
+
+class TestStreamAddressTimeline:
+    """stream_address_timelineのテスト"""
+
+    async def test_streams_cached_first(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        """キャッシュ済みの点を先に返し、残りは取得して返す"""
+        # Arrange
+        stored = make_track(straight(11))
+        service, calls = make_service(monkeypatch)
+        await service.get_address(*straight(11)[10])
+
+        # Act
+        lines = [
+            json.loads(line)
+            async for line in stream_address_timeline(stored, service, 500)
+        ]
+
+        # Assert
+        assert lines[0]["index"] == 10
+        assert sorted(line["index"] for line in lines) == [0, 5, 10]
+        assert all(line["address"]["city"] == "港区" for line in lines)
+        assert len(calls) == 3
+
+    async def test_samples_off_event_loop(
+        self, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """代表点の選択はイベントループのスレッドで行わない"""
+        # Arrange
+        stored = make_track(straight(11))
+        service, _ = make_service(monkeypatch)
+        threads: list[int] = []
+
+        def recording(stored: StoredTrack, interval_m: float) -> list[int]:
+            threads.append(threading.get_ident())
+            return sample_address_points(stored, interval_m)
+
+        monkeypatch.setattr(address_timeline, "sample_address_points", recording)
+
+        # Act
+        lines = [line async for line in stream_address_timeline(stored, service, 500)]
+
+        # Assert
+        assert len(lines) == 3
+        assert threads and threading.get_ident() not in threads
+
+
+class TestAddressesEndpoint:
+    """/api/tracks/{id}/addresses のテスト"""
+
+    def test_returns_ndjson(
+        self, client: TestClient, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """代表点の住所をNDJSONで返す"""
+        # Arrange
+        service, _ = make_service(monkeypatch)
+        monkeypatch.setattr(api, "get_geocoding_service", lambda: service)
+        stored = make_track(straight(11))
+        content = b"dummy"
+        track_id = get_track_store().put(content, stored.gpx_data, "a.gpx").track_id
+
+        # Act
+        response = client.get(f"/api/tracks/{track_id}/addresses")
+
+        # Assert
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert sorted(line["index"] for line in lines) == [0, 5, 10]
+
+    def test_unknown_track_returns_404(self, client: TestClient) -> None:
+        """存在しないトラックは404を返す"""
+        # Act
+        response = client.get(f"/api/tracks/{'a' * 64}/addresses")
+
+        # Assert
+        assert response.status_code == 404
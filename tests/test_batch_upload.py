@@ -0,0 +1,188 @@
+"""複数ファイルのまとめてアップロードのテスト"""
+
+import asyncio
+import gzip
+import hashlib
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+from httpx import Response
+
+from src.config import settings
+from src.routers import home
+from src.services import track_store
+from src.services.track_store import StoredTrack, compute_batch_id, get_track_store
+from src.services.upload import SpooledFile
+
+
+def gpx(name: str, lat: float) -> bytes:
+    """2点のGPX"""
+    return f"""<?xml version="1.0" encoding="UTF-8"?>
+<gpx version="1.1" creator="{name}" xmlns="http://www.topografix.com/GPX/1/1">
+    <trk><name>{name}</name><trkseg>
+        <trkpt lat="{lat}" lon="139.0"><time>2025-10-0{int(lat) - 33}T00:00:00Z</time></trkpt>
+        <trkpt lat="{lat + 0.01}" lon="139.01"><time>2025-10-0{int(lat) - 33}T01:00:00Z</time></trkpt>
+    </trkseg></trk>
+</gpx>""".encode()
+
+
+def track_id(content: bytes) -> str:
+    """ファイル単体のトラックID"""
+    return hashlib.sha256(content).hexdigest()
+
+
+def upload(client: TestClient, files: list[tuple[str, bytes]]) -> Response:
+    """複数ファイルをアップロード（リダイレクトは追わない）"""
+    response: Response = client.post(
+        "/upload",
+        files=[
+            ("file", (name, content, "application/gpx+xml")) for name, content in files
+        ],
+        follow_redirects=False,
+    )
+    return response
+
+
+class TestBatchUpload:
+    """まとめてアップロードのテスト"""
+
+    def test_files_are_merged_into_one_track(self, client: TestClient) -> None:
+        """複数ファイルを1つのトラックにまとめ、ファイルごとの集計値を持つ"""
+        # Arrange
+        day1, day2 = gpx("day1", 35.0), gzip.compress(gpx("day2", 36.0))
+
+        # Act
+        response = upload(client, [("day1.gpx", day1), ("day2.gpx.gz", day2)])
+
+        # Assert
+        batch_id = compute_batch_id([track_id(day1), track_id(day2)])
+        assert response.status_code == 303
+        assert response.headers["location"] == f"/tracks/{batch_id}"
+        stored = get_track_store().cached(batch_id)
+        assert stored is not None
+        metadata = stored.metadata()
+        assert metadata["point_count"] == 4
+        assert metadata["bounds"]["min_lat"] == 35.0
+        assert metadata["bounds"]["max_lat"] == 36.01
+        assert [f["filename"] for f in metadata["files"]] == ["day1.gpx", "day2.gpx.gz"]
+        assert [f["point_count"] for f in metadata["files"]] == [2, 2]
+        assert metadata["errors"] == []
+
+    def test_failed_files_do_not_fail_the_batch(self, client: TestClient) -> None:
+        """取り込めないファイルがあっても残りをまとめ、エラーを表示する"""
+        # Act
+        response = upload(
+            client,
+            [
+                ("day1.gpx", gpx("day1", 35.0)),
+                ("broken.gpx", b"<gpx><trk>"),
+                ("notes.txt", b"hello"),
+            ],
+        )
+        page = client.get(response.headers["location"])
+
+        # Assert
+        assert response.status_code == 303
+        assert page.status_code == 200
+        assert "day1.gpx" in page.text
+        assert "broken.gpx: GPXファイルの解析に失敗しました" in page.text
+        assert "notes.txt: GPXファイル" in page.text
+
+    def test_unexpected_error_fails_only_that_file(
+        self, client: TestClient, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """1ファイルの想定外のエラーは、そのファイルだけのエラーとして表示する"""
+        # Arrange
+        ingest_file = home.ingest_file
+
+        async def failing_ingest_file(
+            file: SpooledFile, slots: asyncio.Semaphore | None = None
+        ) -> StoredTrack:
+            if file.filename == "boom.gpx":
+                raise RuntimeError("unexpected")
+            return await ingest_file(file, slots)
+
+        monkeypatch.setattr(home, "ingest_file", failing_ingest_file)
+
+        # Act
+        response = upload(
+            client, [("day1.gpx", gpx("day1", 35.0)), ("boom.gpx", gpx("boom", 36.0))]
+        )
+        page = client.get(response.headers["location"])
+
+        # Assert
+        assert response.status_code == 303
+        assert "boom.gpx: GPXファイルの解析に失敗しました" in page.text
+        assert "unexpected" not in page.text
+
+    def test_all_failed_shows_errors_on_form(self, client: TestClient) -> None:
+        """すべて取り込めなければアップロードフォームにエラーを表示する"""
+        # Act
+        response = upload(client, [("a.txt", b"a"), ("b.gpx", b"<html/>")])
+
+        # Assert
+        assert response.status_code == 200
+        assert "取り込めるファイルがありませんでした" in response.text
+        assert "a.txt" in response.text
+        assert "b.gpx" in response.text
+
+    def test_duplicate_files_are_merged_once(self, client: TestClient) -> None:
+        """同じ内容のファイルは1回だけ取り込む"""
+        # Arrange
+        day1 = gpx("day1", 35.0)
+
+        # Act
+        response = upload(
+            client, [("a.gpx", day1), ("b.gpx", day1), ("c.gpx", gpx("c", 36.0))]
+        )
+
+        # Assert
+        batch_id = compute_batch_id([track_id(day1), track_id(gpx("c", 36.0))])
+        assert response.headers["location"] == f"/tracks/{batch_id}"
+
+    def test_too_many_files_are_rejected(
+        self, client: TestClient, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """ファイル数の上限を超えたらエラー"""
+        # Arrange
+        monkeypatch.setattr(settings, "max_batch_files", 2)
+
+        # Act
+        response = upload(
+            client, [(f"{i}.gpx", gpx(str(i), 35.0 + i)) for i in range(3)]
+        )
+
+        # Assert
+        assert response.status_code == 200
+        assert "2ファイルまで" in response.text
+
+    async def test_batch_is_restored_from_disk(
+        self, client: TestClient, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """別ワーカー（メモリ上にない）でも各ファイルを読み直して復元する"""
+        # Arrange
+        response = upload(
+            client,
+            [
+                ("day1.gpx", gpx("day1", 35.0)),
+                ("day2.gpx", gpx("day2", 36.0)),
+                ("broken.gpx", b"<gpx>"),
+            ],
+        )
+        batch_id = response.headers["location"].rsplit("/", 1)[-1]
+        monkeypatch.setattr(
+            track_store,
+            "_track_store",
+            track_store.TrackStore(tmp_path / "tracks", 64 * 1024 * 1024, 60),
+        )
+
+        # Act
+        stored = await get_track_store().get(batch_id)
+
+        # Assert
+        assert stored is not None
+        assert stored.filename == "day1.gpx ほか1件"
+        assert [m.filename for m in stored.members] == ["day1.gpx", "day2.gpx"]
+        assert [f.filename for f in stored.failed] == ["broken.gpx"]
+        assert stored.gpx_data.point_count == 4
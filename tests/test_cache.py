@@ -0,0 +1,73 @@
+"""LRUキャッシュのテスト"""
+
+from src.services.cache import LRUCache
+
+
+def make_cache(max_bytes: int) -> LRUCache[str, bytes]:
+    """値のバイト数をサイズとするキャッシュ"""
+    return LRUCache(max_bytes, len)
+
+
+class TestLRUCache:
+    """LRUCacheのテスト"""
+
+    def test_get_counts_hits_and_misses(self) -> None:
+        """取得時にヒット・ミス数を数える"""
+        # Arrange
+        cache = make_cache(100)
+        cache.put("a", b"x" * 10)
+
+        # Act
+        hit = cache.get("a")
+        miss = cache.get("b")
+
+        # Assert
+        stats = cache.stats()
+        assert hit == b"x" * 10
+        assert miss is None
+        assert (stats.hits, stats.misses) == (1, 1)
+        assert stats.hit_ratio == 0.5
+
+    def test_evicts_least_recently_used_over_budget(self) -> None:
+        """バイト数上限を超えたら最も古く使われたものから破棄する"""
+        # Arrange
+        cache = make_cache(30)
+        cache.put("a", b"x" * 10)
+        cache.put("b", b"x" * 10)
+        cache.put("c", b"x" * 10)
+        cache.get("a")
+
+        # Act
+        cache.put("d", b"x" * 10)
+
+        # Assert
+        assert "a" in cache
+        assert "b" not in cache
+        stats = cache.stats()
+        assert stats.entries == 3
+        assert stats.size_bytes == 30
+        assert stats.evictions == 1
+
+    def test_replaces_existing_entry_size(self) -> None:
+        """同じキーの再保存ではサイズを置き換える"""
+        # Arrange
+        cache = make_cache(100)
+        cache.put("a", b"x" * 10)
+
+        # Act
+        cache.put("a", b"x" * 40)
+
+        # Assert
+        assert cache.stats().size_bytes == 40
+
+    def test_skips_value_larger_than_budget(self) -> None:
+        """上限より大きい値は保持しない"""
+        # Arrange
+        cache = make_cache(10)
+
+        # Act
+        cache.put("a", b"x" * 11)
+
+        # Assert
+        assert len(cache) == 0
+        assert cache.stats().size_bytes == 0
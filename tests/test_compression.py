@@ -0,0 +1,396 @@
+"""圧縮されたGPXの展開のテスト"""
+
+import bz2
+import gzip
+import hashlib
+import io
+import zipfile
+from collections.abc import AsyncIterator, Callable
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src.services import track_store
+from src.services.compression import (
+    DecompressionLimitExceeded,
+    DecompressionLimits,
+    FailedMember,
+    gunzip_body,
+    is_supported_filename,
+    parse_gpx_file,
+    parse_gpx_members,
+)
+from src.services.gpx_parser import GpxParseError, GpxParser
+
+
+LIMITS = DecompressionLimits(max_size=8 * 1024 * 1024, max_ratio=100)
+
+
+def gpx(name: str, lat: float = 35.0, padding: int = 0) -> bytes:
+    """1点だけのGPX（paddingバイトの空白を含む）"""
+    return f"""<?xml version="1.0" encoding="UTF-8"?>
+<gpx version="1.1" creator="{name}" xmlns="http://www.topografix.com/GPX/1/1">
+    <trk><name>{name}</name><trkseg>
+        <trkpt lat="{lat}" lon="139.0"><ele>10.0</ele></trkpt>{" " * padding}
+    </trkseg></trk>
+</gpx>""".encode()
+
+
+def zip_bytes(members: dict[str, bytes]) -> bytes:
+    """メンバーをまとめたzip"""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, content in members.items():
+            archive.writestr(name, content)
+    return buffer.getvalue()
+
+
+def unreadable_zip_bytes(
+    members: dict[str, bytes], unreadable: str, kind: str
+) -> bytes:
+    """unreadableのメンバーを暗号化済み（encrypted）または未対応の圧縮方式
+    （deflate64）と申告したzip"""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        for name, content in members.items():
+            archive.writestr(name, content)
+        # セントラルディレクトリは閉じるときに書き込まれる
+        info = archive.getinfo(unreadable)
+        if kind == "encrypted":
+            info.flag_bits |= 0x1
+        else:
+            info.compress_type = 9
+    return buffer.getvalue()
+
+
+async def chunks(body: bytes, size: int = 1024) -> AsyncIterator[bytes]:
+    """ボディを小さなチャンクに分けて返す"""
+    for i in range(0, len(body), size):
+        yield body[i : i + size]
+
+
+class TestParseGpxFile:
+    """parse_gpx_fileのテスト"""
+
+    @pytest.mark.parametrize("compress", [gzip.compress, bz2.compress, lambda b: b])
+    def test_compressed_file_matches_plain(
+        self, tmp_path: Path, compress: Callable[[bytes], bytes]
+    ) -> None:
+        """gzip・bzip2・非圧縮のどれでも同じ結果になる"""
+        # Arrange
+        path = tmp_path / "track"
+        path.write_bytes(compress(gpx("a")))
+
+        # Act
+        gpx_data = parse_gpx_file(path, LIMITS)
+
+        # Assert
+        assert gpx_data.stats == GpxParser().parse(gpx("a")).stats
+        assert gpx_data.creator == "a"
+
+    def test_zip_with_several_gpx_is_merged(self, tmp_path: Path) -> None:
+        """zip内の.gpxをすべてパースし、トラックをまとめる"""
+        # Arrange
+        path = tmp_path / "tracks.zip"
+        path.write_bytes(
+            zip_bytes(
+                {
+                    "day1.gpx": gpx("day1", lat=35.0),
+                    "nested/day2.GPX": gpx("day2", lat=36.0),
+                    "readme.txt": b"not a track",
+                    "__MACOSX/._day1.gpx": b"\x00\x05\x16\x07",
+                }
+            )
+        )
+
+        # Act
+        gpx_data = parse_gpx_file(path, LIMITS)
+
+        # Assert
+        assert [track.name for track in gpx_data.tracks] == ["day1", "day2"]
+        assert gpx_data.point_count == 2
+
+    def test_broken_zip_member_is_reported_by_name(self, tmp_path: Path) -> None:
+        """zip内の壊れた.gpxは名前付きで返し、残りは取り込む"""
+        # Arrange
+        path = tmp_path / "tracks.zip"
+        path.write_bytes(
+            zip_bytes(
+                {
+                    "day1.gpx": gpx("day1"),
+                    "broken.gpx": b"<gpx><trk>",
+                    "day2.gpx": gpx("day2", lat=36.0),
+                }
+            )
+        )
+
+        # Act
+        gpx_data, failed = parse_gpx_members(path, LIMITS)
+
+        # Assert
+        assert [track.name for track in gpx_data.tracks] == ["day1", "day2"]
+        assert [item.name for item in failed] == ["broken.gpx"]
+        assert parse_gpx_file(path, LIMITS).point_count == 2
+
+    @pytest.mark.parametrize("kind", ["encrypted", "deflate64"])
+    def test_unreadable_zip_member_is_reported_by_name(
+        self, tmp_path: Path, kind: str
+    ) -> None:
+        """暗号化・未対応の圧縮方式のメンバーは名前付きで返し、残りは取り込む"""
+        # Arrange
+        path = tmp_path / "tracks.zip"
+        path.write_bytes(
+            unreadable_zip_bytes(
+                {"day1.gpx": gpx("day1"), "locked.gpx": gpx("locked")},
+                "locked.gpx",
+                kind,
+            )
+        )
+
+        # Act
+        gpx_data, failed = parse_gpx_members(path, LIMITS)
+
+        # Assert
+        assert [track.name for track in gpx_data.tracks] == ["day1"]
+        assert [item.name for item in failed] == ["locked.gpx"]
+
+    def test_zip_with_only_broken_members_names_them(self, tmp_path: Path) -> None:
+        """zip内の.gpxがすべて壊れていればGpxParseErrorで名前を示す"""
+        # Arrange
+        path = tmp_path / "tracks.zip"
+        path.write_bytes(zip_bytes({"a.gpx": b"<gpx>", "b.gpx": b"<html/>"}))
+
+        # Act / Assert
+        with pytest.raises(GpxParseError, match="a.gpx.*b.gpx"):
+            parse_gpx_members(path, LIMITS)
+
+    def test_plain_file_has_no_failed_members(self, tmp_path: Path) -> None:
+        """zip以外は取り込めなかったものの一覧が空"""
+        # Arrange
+        path = tmp_path / "a.gpx"
+        path.write_bytes(gpx("a"))
+
+        # Act
+        _, failed = parse_gpx_members(path, LIMITS)
+
+        # Assert
+        assert failed == []
+
+    def test_zip_without_gpx_is_rejected(self, tmp_path: Path) -> None:
+        """.gpxを含まないzipはGpxParseError"""
+        # Arrange
+        path = tmp_path / "empty.zip"
+        path.write_bytes(zip_bytes({"readme.txt": b"hello"}))
+
+        # Act / Assert
+        with pytest.raises(GpxParseError):
+            parse_gpx_file(path, LIMITS)
+
+    def test_gzip_bomb_is_stopped(self, tmp_path: Path) -> None:
+        """展開後のサイズが上限を超えたら途中で止める"""
+        # Arrange
+        path = tmp_path / "bomb.gpx.gz"
+        path.write_bytes(gzip.compress(gpx("bomb", padding=4 * 1024 * 1024)))
+        limits = DecompressionLimits(max_size=2 * 1024 * 1024, max_ratio=1000)
+
+        # Act / Assert
+        with pytest.raises(DecompressionLimitExceeded):
+            parse_gpx_file(path, limits)
+
+    def test_high_ratio_is_rejected(self, tmp_path: Path) -> None:
+        """圧縮率が上限を超えるものは最大サイズ以内でも拒否する"""
+        # Arrange
+        path = tmp_path / "bomb.gpx.bz2"
+        path.write_bytes(bz2.compress(gpx("bomb", padding=4 * 1024 * 1024)))
+
+        # Act / Assert
+        with pytest.raises(DecompressionLimitExceeded):
+            parse_gpx_file(path, LIMITS)
+
+    def test_zip_bomb_is_rejected_by_declared_size(self, tmp_path: Path) -> None:
+        """zipは展開前に申告されたサイズで判定する"""
+        # Arrange
+        path = tmp_path / "bomb.zip"
+        path.write_bytes(zip_bytes({"bomb.gpx": gpx("bomb", padding=4 * 1024 * 1024)}))
+
+        # Act / Assert
+        with pytest.raises(DecompressionLimitExceeded):
+            parse_gpx_file(path, LIMITS)
+
+    def test_corrupted_gzip_is_parse_error(self, tmp_path: Path) -> None:
+        """壊れたgzipはGpxParseError"""
+        # Arrange
+        path = tmp_path / "broken.gpx.gz"
+        path.write_bytes(gzip.compress(gpx("broken"))[:-20])
+
+        # Act / Assert
+        with pytest.raises(GpxParseError):
+            parse_gpx_file(path, LIMITS)
+
+
+class TestGunzipBody:
+    """gunzip_bodyのテスト"""
+
+    async def test_body_is_decompressed(self) -> None:
+        """gzipのボディを展開して返す"""
+        # Act
+        output = b"".join(
+            [
+                chunk
+                async for chunk in gunzip_body(chunks(gzip.compress(gpx("a"))), LIMITS)
+            ]
+        )
+
+        # Assert
+        assert output == gpx("a")
+
+    async def test_concatenated_members_are_all_decompressed(self) -> None:
+        """複数のgzipメンバーを連結したボディはすべて展開する"""
+        # Arrange
+        content = gpx("a", padding=200 * 1024)
+        body = b"".join(
+            gzip.compress(content[i : i + 50_000])
+            for i in range(0, len(content), 50_000)
+        )
+
+        # Act
+        output = b"".join(
+            [chunk async for chunk in gunzip_body(chunks(body, size=777), LIMITS)]
+        )
+
+        # Assert
+        assert output == content
+
+    async def test_bomb_is_stopped(self) -> None:
+        """展開後のサイズが上限を超えたら途中で止める"""
+        # Arrange
+        body = gzip.compress(b"\x00" * (64 * 1024 * 1024))
+        produced = 0
+
+        # Act / Assert
+        with pytest.raises(DecompressionLimitExceeded):
+            async for chunk in gunzip_body(chunks(body), LIMITS):
+                produced += len(chunk)
+        assert produced <= LIMITS.max_size
+
+    async def test_truncated_body_is_parse_error(self) -> None:
+        """途中で終わったgzipはGpxParseError"""
+        # Act / Assert
+        with pytest.raises(GpxParseError):
+            async for _ in gunzip_body(chunks(gzip.compress(gpx("a"))[:-8]), LIMITS):
+                pass
+
+
+def test_supported_filenames() -> None:
+    """受け付けるファイル名"""
+    # Assert
+    assert is_supported_filename("a.gpx")
+    assert is_supported_filename("A.GPX.GZ")
+    assert is_supported_filename("a.gpx.bz2")
+    assert is_supported_filename("tracks.zip")
+    assert not is_supported_filename("a.gz")
+    assert not is_supported_filename("a.kml")
+
+
+class TestCompressedUpload:
+    """圧縮ファイルのアップロードのテスト"""
+
+    def test_gzipped_file_is_stored_and_restored(
+        self, client: TestClient, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """.gpx.gzをアップロードでき、ディスクから復元できる"""
+        # Arrange
+        content = gzip.compress(gpx("upload"))
+
+        # Act
+        response = client.post(
+            "/upload",
+            files={"file": ("a.gpx.gz", content, "application/gzip")},
+            follow_redirects=False,
+        )
+        # 別ワーカー相当（メモリ上にない）のストアから読み直す
+        monkeypatch.setattr(
+            track_store,
+            "_track_store",
+            track_store.TrackStore(tmp_path / "tracks", 64 * 1024 * 1024, 60),
+        )
+        track_id = hashlib.sha256(content).hexdigest()
+        restored = client.get(f"/tracks/{track_id}")
+
+        # Assert
+        assert response.headers["location"] == f"/tracks/{track_id}"
+        assert restored.status_code == 200
+        assert "a.gpx.gz" in restored.text
+
+    def test_broken_zip_member_is_shown_on_track_page(
+        self, client: TestClient, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """zip内の壊れた.gpxは地図ページにエラーとして表示し、復元後も表示する"""
+        # Arrange
+        content = zip_bytes({"day1.gpx": gpx("day1"), "broken.gpx": b"<gpx>"})
+
+        # Act
+        response = client.post(
+            "/upload",
+            files={"file": ("tracks.zip", content, "application/zip")},
+        )
+        monkeypatch.setattr(
+            track_store,
+            "_track_store",
+            track_store.TrackStore(tmp_path / "tracks", 64 * 1024 * 1024, 60),
+        )
+        restored = client.get(f"/tracks/{hashlib.sha256(content).hexdigest()}")
+
+        # Assert
+        assert response.status_code == 200
+        for page in (response, restored):
+            assert "tracks.zip/broken.gpx: XMLパースエラー" in page.text
+
+    @pytest.mark.parametrize("kind", ["encrypted", "deflate64"])
+    def test_unreadable_zip_is_rejected_with_message(
+        self, client: TestClient, kind: str
+    ) -> None:
+        """読めるメンバーのないzipは500ではなくエラーページを返す"""
+        # Arrange
+        content = unreadable_zip_bytes(
+            {"locked.gpx": gpx("locked")}, "locked.gpx", kind
+        )
+
+        # Act
+        response = client.post(
+            "/upload",
+            files={"file": ("locked.zip", content, "application/zip")},
+            follow_redirects=False,
+        )
+
+        # Assert
+        assert response.status_code == 200
+        assert "GPXファイルの解析に失敗しました" in response.text
+        assert "locked.gpx" in response.text
+
+    def test_gzip_content_encoding_is_accepted(self, client: TestClient) -> None:
+        """Content-Encoding: gzipのボディを展開して受け付ける"""
+        # Arrange
+        body = (
+            b"--b\r\n"
+            b'Content-Disposition: form-data; name="file"; filename="a.gpx"\r\n\r\n'
+            + gpx("encoded")
+            + b"\r\n--b--\r\n"
+        )
+
+        # Act
+        response = client.post(
+            "/upload",
+            content=gzip.compress(body),
+            headers={
+                "Content-Type": "multipart/form-data; boundary=b",
+                "Content-Encoding": "gzip",
+            },
+            follow_redirects=False,
+        )
+
+        # Assert
+        assert response.status_code == 303
+        track_id = hashlib.sha256(gpx("encoded")).hexdigest()
+        assert response.headers["location"] == f"/tracks/{track_id}"
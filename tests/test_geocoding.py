@@ -0,0 +1,543 @@
+"""逆ジオコーディングサービスのテスト"""
+
+import asyncio
+import threading
+from collections.abc import Sequence
+from pathlib import Path
+from typing import Any
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src.models.geocoding import AddressResult
+from src.routers import api
+from src.services import geocoding
+from src.services.geocoding import (
+    GeocodingPriority,
+    GeocodingQueueFull,
+    GeocodingService,
+    quantize_coordinate,
+)
+from src.services.geocoding_backends import GeocodingBackend, LocalGeocodingBackend
+from src.services.geocoding_store import GeocodingDiskCache
+from src.services.local_geocoder import BoundaryIndex, LocalGeocoder
+from src.services.metrics import GEOCODING_WORKER_RESTARTS
+from src.services.rate_limiter import RateLimiter
+
+
+TOKYO_TOWER = AddressResult(prefecture="東京都", city="港区", road="芝公園")
+
+
+class RecordingBackend(GeocodingBackend):
+    """問い合わせを記録し、常に東京タワーの住所を返すリモートのスタブ"""
+
+    def __init__(self) -> None:
+        self.calls: list[tuple[float, float]] = []
+
+    async def reverse(self, lat: float, lng: float) -> AddressResult | None:
+        self.calls.append((lat, lng))
+        return TOKYO_TOWER
+
+
+class GatedBackend(RecordingBackend):
+    """gateが開くまで応答しないリモートのスタブ（問い合わせは呼び出し時に記録）"""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.gate = asyncio.Event()
+
+    async def reverse(self, lat: float, lng: float) -> AddressResult | None:
+        result = await super().reverse(lat, lng)
+        await self.gate.wait()
+        return result
+
+
+def make_service(
+    max_entries: int = 10,
+    ttl: float = 60,
+    disk_cache: GeocodingDiskCache | None = None,
+    local: Sequence[GeocodingBackend] = (),
+    backend: RecordingBackend | None = None,
+    **options: Any,
+) -> tuple[GeocodingService, list[tuple[float, float]]]:
+    """問い合わせを記録するリモートのスタブを使うサービス"""
+    backend = backend or RecordingBackend()
+    service = GeocodingService(
+        cache_max_entries=max_entries,
+        cache_ttl=ttl,
+        disk_cache=disk_cache,
+        rate_limiter=RateLimiter(interval=0.0),
+        backends=[*local, backend],
+        **options,
+    )
+    return service, backend.calls
+
+
+class TestQuantizeCoordinate:
+    """quantize_coordinateのテスト"""
+
+    def test_same_cell_has_same_key(self) -> None:
+        """小数点5桁で同じ座標は同じキーになる"""
+        # Act & Assert
+        assert quantize_coordinate(35.658581, 139.745433) == quantize_coordinate(
+            35.658578, 139.745431
+        )
+
+    def test_different_cells_have_different_keys(self) -> None:
+        """緯度・経度どちらかのセルが違えば別のキーになる"""
+        # Arrange
+        key = quantize_coordinate(35.65858, 139.74543)
+
+        # Act & Assert
+        assert quantize_coordinate(35.65859, 139.74543) != key
+        assert quantize_coordinate(35.65858, 139.74544) != key
+        assert quantize_coordinate(-90.0, -180.0) != quantize_coordinate(90.0, 180.0)
+
+
+class TestGeocodingCache:
+    """住所キャッシュのテスト"""
+
+    async def test_cache_hit_skips_request(self) -> None:
+        """同じセルの座標は問い合わせずにキャッシュから返す"""
+        # Arrange
+        service, calls = make_service()
+        await service.get_address(35.658581, 139.745433)
+
+        # Act
+        result = await service.get_address(35.658579, 139.745432)
+
+        # Assert
+        assert result == TOKYO_TOWER
+        assert len(calls) == 1
+        stats = service.cache_stats()
+        assert (stats.hits, stats.misses) == (1, 1)
+        assert stats.size_bytes > 0
+
+    async def test_cache_is_bounded(self) -> None:
+        """上限を超えると古いエントリから破棄する"""
+        # Arrange
+        service, _ = make_service(max_entries=2)
+
+        # Act
+        for i in range(3):
+            await service.get_address(35.0 + i * 0.001, 139.0)
+
+        # Assert
+        stats = service.cache_stats()
+        assert stats.entries == 2
+        assert stats.evictions == 1
+
+    async def test_expired_entry_is_refetched(self) -> None:
+        """TTLを過ぎたエントリは再取得する"""
+        # Arrange
+        service, calls = make_service(ttl=0)
+        await service.get_address(35.0, 139.0)
+
+        # Act
+        await service.get_address(35.0, 139.0)
+
+        # Assert
+        assert len(calls) == 2
+        assert service.cache_stats().expirations == 1
+
+
+class TestSingleFlight:
+    """同時リクエストのまとめ処理のテスト"""
+
+    async def test_concurrent_requests_share_one_fetch(self) -> None:
+        """同じセルへの同時リクエストは上流への問い合わせを1回にまとめる"""
+        # Arrange
+        service, calls = make_service()
+
+        # Act
+        results = await asyncio.gather(
+            *(service.get_address(35.658581, 139.745433) for _ in range(5))
+        )
+
+        # Assert
+        assert results == [TOKYO_TOWER] * 5
+        assert len(calls) == 1
+        assert service.coalesced_requests == 4
+        assert service.cache_stats().entries == 1
+
+    async def test_cancelled_caller_does_not_cancel_shared_fetch(self) -> None:
+        """先に待っていた呼び出し元がキャンセルされても他の呼び出し元は結果を受け取る"""
+        # Arrange
+        service, calls = make_service()
+        first = asyncio.create_task(service.get_address(35.0, 139.0))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(service.get_address(35.0, 139.0))
+        await asyncio.sleep(0)
+
+        # Act
+        first.cancel()
+        result = await second
+
+        # Assert
+        assert result == TOKYO_TOWER
+        assert len(calls) == 1
+
+
+class TestScheduling:
+    """優先度付きスケジューリングと不要になったリクエストの破棄のテスト"""
+
+    async def test_interactive_runs_before_background(self) -> None:
+        """画面操作の問い合わせは先に届いた一括の問い合わせより先に処理する"""
+        # Arrange
+        backend = GatedBackend()
+        service, calls = make_service(backend=backend)
+        background = GeocodingPriority.BACKGROUND
+
+        # Act
+        tasks = [
+            asyncio.create_task(service.get_address(1.0, 1.0, priority=background)),
+            asyncio.create_task(service.get_address(2.0, 2.0, priority=background)),
+            asyncio.create_task(service.get_address(3.0, 3.0)),
+        ]
+        await asyncio.sleep(0.01)
+        backend.gate.set()
+        await asyncio.gather(*tasks)
+
+        # Assert
+        assert calls == [(3.0, 3.0), (1.0, 1.0), (2.0, 2.0)]
+
+    async def test_coalesced_interactive_request_is_promoted(self) -> None:
+        """一括の問い合わせに画面操作の問い合わせが相乗りすると優先度を引き上げる"""
+        # Arrange
+        backend = GatedBackend()
+        service, calls = make_service(backend=backend)
+        background = GeocodingPriority.BACKGROUND
+
+        # Act
+        tasks = [
+            asyncio.create_task(service.get_address(1.0, 1.0, priority=background)),
+            asyncio.create_task(service.get_address(2.0, 2.0, priority=background)),
+            asyncio.create_task(service.get_address(2.0, 2.0)),
+        ]
+        await asyncio.sleep(0.01)
+        backend.gate.set()
+        await asyncio.gather(*tasks)
+
+        # Assert
+        assert calls == [(2.0, 2.0), (1.0, 1.0)]
+        assert service.skipped_requests == 0
+
+    async def test_promotion_reuses_queued_entry(self) -> None:
+        """優先度の引き上げはキュー上のエントリを更新し、クライアントの順番を消費しない"""
+        # Arrange
+        backend = GatedBackend()
+        service, calls = make_service(backend=backend)
+        background = GeocodingPriority.BACKGROUND
+        busy = asyncio.create_task(service.get_address(1.0, 1.0, client="a"))
+        await asyncio.sleep(0.01)
+        queued = asyncio.create_task(
+            service.get_address(2.0, 2.0, priority=background, client="a")
+        )
+        await asyncio.sleep(0)
+        charged = service._client_finish["a"]
+
+        # Act
+        promoted = asyncio.create_task(service.get_address(2.0, 2.0, client="b"))
+        await asyncio.sleep(0)
+
+        # Assert
+        assert service._queue.qsize() == 1
+        assert service._queue._queue[0].priority == GeocodingPriority.INTERACTIVE
+        assert service._client_finish["a"] == charged
+        assert "b" not in service._client_finish
+        backend.gate.set()
+        await asyncio.gather(busy, queued, promoted)
+        assert calls == [(1.0, 1.0), (2.0, 2.0)]
+        assert service.skipped_requests == 0
+
+    async def test_cancelled_request_is_skipped(self) -> None:
+        """待っている呼び出し元がいなくなったリクエストは問い合わせない"""
+        # Arrange
+        backend = GatedBackend()
+        service, calls = make_service(backend=backend)
+        first = asyncio.create_task(service.get_address(1.0, 1.0))
+        await asyncio.sleep(0.01)
+        second = asyncio.create_task(service.get_address(2.0, 2.0))
+        await asyncio.sleep(0)
+
+        # Act
+        second.cancel()
+        backend.gate.set()
+        await first
+        await asyncio.sleep(0.01)
+
+        # Assert
+        assert calls == [(1.0, 1.0)]
+        assert service.skipped_requests == 1
+        assert await service.get_cached(2.0, 2.0) is None
+
+    async def test_latest_request_in_session_wins(self) -> None:
+        """同じセッションの新しいリクエストが届くと古いリクエストは破棄する"""
+        # Arrange
+        backend = GatedBackend()
+        service, calls = make_service(backend=backend)
+        busy = asyncio.create_task(service.get_address(1.0, 1.0))
+        await asyncio.sleep(0.01)
+        older = asyncio.create_task(service.get_address(2.0, 2.0, session="a"))
+        await asyncio.sleep(0)
+
+        # Act
+        newer = asyncio.create_task(service.get_address(3.0, 3.0, session="a"))
+        await asyncio.sleep(0)
+        backend.gate.set()
+        results = await asyncio.gather(busy, older, newer)
+
+        # Assert
+        assert list(results) == [TOKYO_TOWER, None, TOKYO_TOWER]
+        assert calls == [(1.0, 1.0), (3.0, 3.0)]
+        assert service.skipped_requests == 1
+
+    async def test_idle_worker_exit_is_not_a_restart(
+        self, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """アイドルで終了したワーカーの再起動は再起動回数に数えない"""
+        # Arrange
+        monkeypatch.setattr(geocoding, "WORKER_IDLE_TIMEOUT", 0.01)
+        service, calls = make_service()
+        restarts = GEOCODING_WORKER_RESTARTS.value()
+        await service.get_address(1.0, 1.0)
+        await asyncio.sleep(0.05)
+
+        # Act
+        await service.get_address(2.0, 2.0)
+
+        # Assert
+        assert calls == [(1.0, 1.0), (2.0, 2.0)]
+        assert GEOCODING_WORKER_RESTARTS.value() == restarts
+
+
+class TestFairQueuing:
+    """クライアントごとの公平キューと受付制限のテスト"""
+
+    async def test_clients_take_turns(self) -> None:
+        """先に大量に問い合わせたクライアントがいても他のクライアントの順番が回る"""
+        # Arrange
+        backend = GatedBackend()
+        service, calls = make_service(backend=backend)
+
+        # Act
+        tasks = [
+            asyncio.create_task(service.get_address(float(i), 0.0, client="heavy"))
+            for i in range(1, 4)
+        ]
+        tasks.append(asyncio.create_task(service.get_address(9.0, 0.0, client="light")))
+        await asyncio.sleep(0.01)
+        backend.gate.set()
+        await asyncio.gather(*tasks)
+
+        # Assert
+        assert calls == [(1.0, 0.0), (9.0, 0.0), (2.0, 0.0), (3.0, 0.0)]
+
+    async def test_weighted_client_gets_more_turns(self) -> None:
+        """重みの大きいクライアントは重みに応じて多く順番が回る"""
+        # Arrange
+        backend = GatedBackend()
+        service, calls = make_service(backend=backend, client_weights={"a": 2.0})
+
+        # Act
+        tasks = [
+            asyncio.create_task(service.get_address(float(i), 0.0, client="a"))
+            for i in range(1, 5)
+        ]
+        tasks += [
+            asyncio.create_task(service.get_address(float(i), 1.0, client="b"))
+            for i in range(1, 3)
+        ]
+        await asyncio.sleep(0.01)
+        backend.gate.set()
+        await asyncio.gather(*tasks)
+
+        # Assert
+        assert [lng for _, lng in calls] == [0.0, 1.0, 0.0, 0.0, 1.0, 0.0]
+
+    async def test_client_over_limit_is_rejected(self) -> None:
+        """クライアントごとのキューの深さが上限に達したら受け付けない"""
+        # Arrange
+        backend = GatedBackend()
+        service, _ = make_service(backend=backend, max_client_queue_depth=2)
+        tasks = [
+            asyncio.create_task(service.get_address(float(i), 0.0, client="a"))
+            for i in range(1, 3)
+        ]
+        await asyncio.sleep(0)
+
+        # Act
+        with pytest.raises(GeocodingQueueFull) as excinfo:
+            await service.get_address(3.0, 0.0, client="a")
+        other = asyncio.create_task(service.get_address(4.0, 0.0, client="b"))
+        await asyncio.sleep(0)
+
+        # Assert
+        assert excinfo.value.retry_after >= 1
+        assert service.client_queue_depths() == {"a": 2, "b": 1}
+        backend.gate.set()
+        await asyncio.gather(*tasks, other)
+        await asyncio.sleep(0)
+        assert service.queue_depth == 0
+
+    def test_endpoint_returns_429(
+        self, client: TestClient, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """キューが上限に達していれば429とRetry-Afterを返す"""
+        # Arrange
+        service, calls = make_service(max_queue_depth=0)
+        monkeypatch.setattr(api, "get_geocoding_service", lambda: service)
+
+        # Act
+        response = client.get(
+            "/api/reverse-geocode",
+            params={"lat": 35.0, "lng": 139.0},
+            headers={"X-Real-IP": "192.0.2.1"},
+        )
+
+        # Assert
+        assert response.status_code == 429
+        assert response.headers["retry-after"] == "1"
+        assert calls == []
+
+
+class TestGeocodingDiskCache:
+    """永続キャッシュのテスト"""
+
+    def test_put_and_get(self, tmp_path: Path) -> None:
+        """保存した住所を別の接続から取得できる（別ワーカー・再起動相当）"""
+        # Arrange
+        path = tmp_path / "geocoding.sqlite3"
+        writer = GeocodingDiskCache(path, ttl=60)
+        writer.put(123, TOKYO_TOWER)
+        writer.close()
+
+        # Act
+        result = GeocodingDiskCache(path, ttl=60).get(123)
+
+        # Assert
+        assert result == TOKYO_TOWER
+
+    def test_expired_row_is_miss(self, tmp_path: Path) -> None:
+        """有効期間を過ぎた行は返さない"""
+        # Arrange
+        path = tmp_path / "geocoding.sqlite3"
+        GeocodingDiskCache(path, ttl=60).put(123, TOKYO_TOWER)
+
+        # Act
+        result = GeocodingDiskCache(path, ttl=-1).get(123)
+
+        # Assert
+        assert result is None
+
+    def test_unwritable_path_is_miss(self, tmp_path: Path) -> None:
+        """データベースを開けない場合はキャッシュミスとして扱う"""
+        # Arrange
+        blocker = tmp_path / "file"
+        blocker.write_text("")
+        cache = GeocodingDiskCache(blocker / "geocoding.sqlite3", ttl=60)
+
+        # Act
+        cache.put(123, TOKYO_TOWER)
+
+        # Assert
+        assert cache.get(123) is None
+
+    async def test_service_shares_results_across_instances(
+        self, tmp_path: Path
+    ) -> None:
+        """あるワーカーが取得した住所は別のワーカーでは問い合わせずに使われる"""
+        # Arrange
+        path = tmp_path / "geocoding.sqlite3"
+        first, first_calls = make_service(disk_cache=GeocodingDiskCache(path, ttl=60))
+        second, second_calls = make_service(disk_cache=GeocodingDiskCache(path, ttl=60))
+        await first.get_address(35.0, 139.0)
+        await first.flush_disk_cache()
+
+        # Act
+        result = await second.get_address(35.0, 139.0)
+
+        # Assert
+        assert result == TOKYO_TOWER
+        assert len(first_calls) == 1
+        assert second_calls == []
+
+    async def test_service_accesses_disk_off_event_loop(self, tmp_path: Path) -> None:
+        """永続キャッシュの読み書きはイベントループのスレッドで行わない"""
+
+        # Arrange
+        class ThreadRecordingCache(GeocodingDiskCache):
+            def __init__(self, path: Path) -> None:
+                super().__init__(path, ttl=60)
+                self.threads: list[int] = []
+
+            def get(self, cell: int) -> AddressResult | None:
+                self.threads.append(threading.get_ident())
+                return super().get(cell)
+
+            def put(self, cell: int, result: AddressResult) -> None:
+                self.threads.append(threading.get_ident())
+                super().put(cell, result)
+
+        disk_cache = ThreadRecordingCache(tmp_path / "geocoding.sqlite3")
+        service, _ = make_service(disk_cache=disk_cache)
+
+        # Act
+        await service.get_address(35.0, 139.0)
+        await service.flush_disk_cache()
+
+        # Assert
+        assert len(disk_cache.threads) == 2
+        assert threading.get_ident() not in disk_cache.threads
+
+
+class TestLocalBackend:
+    """ローカルのバックエンドとフォールバックのテスト"""
+
+    def make_local(self) -> LocalGeocodingBackend:
+        """北緯35〜36度・東経139〜140度を東京都港区とするローカルのバックエンド"""
+        boundaries = BoundaryIndex()
+        boundaries.add(
+            "東京都",
+            "港区",
+            [[(139.0, 35.0), (140.0, 35.0), (140.0, 36.0), (139.0, 36.0)]],
+        )
+        return LocalGeocodingBackend(LocalGeocoder(boundaries))
+
+    async def test_local_hit_skips_remote(self) -> None:
+        """境界内の点はリモートに問い合わせずに返す"""
+        # Arrange
+        service, calls = make_service(local=[self.make_local()])
+
+        # Act
+        result = await service.get_address(35.5, 139.5)
+
+        # Assert
+        assert result == AddressResult(prefecture="東京都", city="港区", road="")
+        assert await service.get_cached(35.5, 139.5) == result
+        assert calls == []
+
+    async def test_local_miss_falls_back_to_remote(self) -> None:
+        """境界外の点はリモートに問い合わせる"""
+        # Arrange
+        service, calls = make_service(local=[self.make_local()])
+
+        # Act
+        result = await service.get_address(43.0, 141.3)
+
+        # Assert
+        assert result == TOKYO_TOWER
+        assert calls == [(43.0, 141.3)]
+
+    async def test_local_only_returns_none_on_miss(self) -> None:
+        """リモートのバックエンドがなければ境界外の点はNone"""
+        # Arrange
+        service = GeocodingService(
+            cache_max_entries=10, cache_ttl=60, backends=[self.make_local()]
+        )
+
+        # Act
+        result = await service.get_address(43.0, 141.3)
+
+        # Assert
+        assert result is None
@@ -0,0 +1,95 @@
+"""距離・標高プロファイル計算のテスト"""
+
+import math
+from array import array
+
+import pytest
+
+from src.models.gpx import GpxData, Track, TrackPoint, TrackSegment
+from src.services.geodesy import (
+    compute_profile,
+    cumulative_gain_loss,
+    pairwise_distances,
+    smooth_elevations,
+)
+
+
+class TestGeodesy:
+    """geodesyモジュールのテスト"""
+
+    def test_pairwise_distances_matches_known_distance(self) -> None:
+        """緯度0.01度の移動は約1.11kmになる"""
+        # Arrange
+        latitudes = array("d", [35.0, 35.01, 35.02])
+        longitudes = array("d", [139.0, 139.0, 139.0])
+
+        # Act
+        steps = pairwise_distances(latitudes, longitudes)
+
+        # Assert
+        assert len(steps) == 2
+        assert steps[0] == pytest.approx(1111.95, abs=0.01)
+        assert steps[1] == pytest.approx(1111.95, abs=0.01)
+
+    def test_smooth_elevations_skips_missing_values(self) -> None:
+        """欠損値を除外して移動平均を取る"""
+        # Arrange
+        elevations = array("d", [1.0, 2.0, math.nan, 4.0, 5.0])
+
+        # Act
+        smoothed = smooth_elevations(elevations, window=3)
+
+        # Assert
+        assert smoothed[0] == pytest.approx(1.5)
+        assert smoothed[1] == pytest.approx(1.5)
+        assert math.isnan(smoothed[2])
+        assert smoothed[3] == pytest.approx(4.5)
+
+    def test_cumulative_gain_loss_carries_over_missing_points(self) -> None:
+        """欠損点では直前の累積値を引き継ぐ"""
+        # Arrange
+        elevations = array("d", [math.nan, 10.0, 12.0, math.nan, 8.0, 9.0])
+
+        # Act
+        gains, losses = cumulative_gain_loss(elevations)
+
+        # Assert
+        assert list(gains) == [0.0, 0.0, 2.0, 2.0, 2.0, 3.0]
+        assert list(losses) == [0.0, 0.0, 0.0, 0.0, 4.0, 4.0]
+
+    def test_compute_profile_aligns_with_points_across_segments(self) -> None:
+        """セグメントをまたいでも系列がポイントと1対1で対応する"""
+        # Arrange
+        first = TrackSegment(
+            points=(
+                TrackPoint(
+                    latitude=35.0,
+                    longitude=139.0,
+                    elevation=10.0,
+                    time="2025-10-09T20:00:00Z",
+                ),
+                TrackPoint(
+                    latitude=35.01,
+                    longitude=139.0,
+                    elevation=20.0,
+                    time="2025-10-09T20:10:00Z",
+                ),
+            )
+        )
+        second = TrackSegment(
+            points=(TrackPoint(latitude=36.0, longitude=140.0, elevation=15.0),)
+        )
+        gpx_data = GpxData(tracks=(Track(segments=(first, second)),))
+
+        # Act
+        profile = compute_profile(gpx_data, smoothing_window=1)
+        chart = profile.to_chart_data()
+
+        # Assert
+        assert len(profile.distances) == 3
+        assert profile.total_distance_m == pytest.approx(1111.95, abs=0.01)
+        assert profile.speeds[1] == pytest.approx(1111.95 / 600, abs=0.01)
+        assert math.isnan(profile.speeds[2])
+        assert profile.total_gain_m == pytest.approx(10.0)
+        assert chart["index"] == [0, 1, 2]
+        assert chart["speed_kmh"][0] is None
@@ -1,9 +1,41 @@
 """GPXパーサーのテスト"""
 
+import io
+from array import array
+from collections.abc import AsyncIterator
+
 import pytest
 
-from src.models.gpx import GpxData, Track, TrackPoint, TrackSegment
-from src.services.gpx_parser import GpxParser, GpxParseError
+from src.models.gpx import (
+    GpxData,
+    Track,
+    TrackPoint,
+    TrackSegment,
+    TrackSegmentBuilder,
+    format_epoch_ms,
+    parse_time_to_epoch_ms,
+)
+from src.services.gpx_parser import (
+    GpxParser,
+    GpxParseError,
+    GpxStreamParser,
+    ROOT_DETECTION_LIMIT,
+)
+
+
+MULTI_SEGMENT_GPX = b"""<?xml version="1.0" encoding="UTF-8"?>
+<gpx version="1.1" creator="Stream" xmlns="http://www.topografix.com/GPX/1/1">
+    <trk>
+        <name>Day 1</name>
+        <trkseg>
+            <trkpt lat="35.0" lon="139.0"><ele>10.0</ele></trkpt>
+            <trkpt lat="35.1" lon="139.1"><ele>20.0</ele></trkpt>
+        </trkseg>
+        <trkseg>
+            <trkpt lat="35.2" lon="139.2"><time>2025-10-09T20:22:20Z</time></trkpt>
+        </trkseg>
+    </trk>
+</gpx>"""
 
 
 class TestGpxParser:
@@ -64,6 +96,27 @@ class TestGpxParser:
         assert points[0].time == "2025-10-09T20:22:20Z"
         assert points[1].time is None
 
+    @pytest.mark.parametrize("ele", ["inf", "-Infinity", "nan"])
+    def test_parse_drops_non_finite_elevation(self, ele: str) -> None:
+        """inf・nanの高度は欠損として扱う"""
+        # Arrange
+        xml_content = f"""<?xml version="1.0" encoding="UTF-8"?>
+        <gpx version="1.1" xmlns="http://www.topografix.com/GPX/1/1">
+            <trk><trkseg>
+                <trkpt lat="35.0" lon="139.0"><ele>{ele}</ele></trkpt>
+                <trkpt lat="35.1" lon="139.1"><ele>10.0</ele></trkpt>
+            </trkseg></trk>
+        </gpx>""".encode()
+
+        # Act
+        result = GpxParser().parse(xml_content)
+
+        # Assert
+        points = result.get_all_points()
+        assert points[0].elevation is None
+        assert points[1].elevation == 10.0
+        assert result.stats.elevation_max == 10.0
+
     def test_parse_invalid_xml_raises_error(self) -> None:
         """不正なXMLはGpxParseErrorを発生させる"""
         # Arrange
@@ -89,6 +142,159 @@ class TestGpxParser:
         assert len(result.tracks) == 0
         assert len(result.get_all_points()) == 0
 
+    def test_parse_non_gpx_root_raises_error(self) -> None:
+        """ルート要素がgpxでない場合はGpxParseErrorを発生させる"""
+        # Arrange
+        xml_content = b"<html><body>not gpx</body></html>"
+        parser = GpxParser()
+
+        # Act & Assert
+        with pytest.raises(GpxParseError):
+            parser.parse(xml_content)
+
+
+class TestGpxStreamParser:
+    """GpxStreamParser / ストリーミングパースのテスト"""
+
+    def test_feed_emits_segments_as_they_complete(self) -> None:
+        """チャンク投入ごとに完了したセグメントが返る"""
+        # Arrange
+        stream_parser = GpxStreamParser()
+        chunks = [
+            MULTI_SEGMENT_GPX[i : i + 32] for i in range(0, len(MULTI_SEGMENT_GPX), 32)
+        ]
+
+        # Act
+        emitted = [seg for chunk in chunks for seg in stream_parser.feed(chunk)]
+        result = stream_parser.close()
+
+        # Assert
+        assert [len(seg.points) for seg in emitted] == [2, 1]
+        assert result.creator == "Stream"
+        assert result.tracks[0].name == "Day 1"
+        assert len(result.get_all_points()) == 3
+        assert result.get_all_points()[2].time == "2025-10-09T20:22:20Z"
+
+    def test_feed_rejects_non_gpx_root_before_reading_whole_file(self) -> None:
+        """ルート要素がgpxでなければ最初のチャンクで拒否される"""
+        # Arrange
+        stream_parser = GpxStreamParser()
+
+        # Act & Assert
+        with pytest.raises(GpxParseError):
+            stream_parser.feed(b"<?xml version='1.0'?><kml><Document>")
+
+    def test_feed_rejects_input_without_root_within_limit(self) -> None:
+        """一定バイト数を超えてもルート要素が現れなければ拒否される"""
+        # Arrange
+        stream_parser = GpxStreamParser()
+        padding = b"<!--" + b"x" * ROOT_DETECTION_LIMIT + b"-->"
+
+        # Act & Assert
+        with pytest.raises(GpxParseError):
+            stream_parser.feed(padding)
+
+    def test_parse_stream_matches_parse(self) -> None:
+        """ファイルライクオブジェクトからのパース結果がparseと一致する"""
+        # Arrange
+        parser = GpxParser()
+
+        # Act
+        streamed = parser.parse_stream(io.BytesIO(MULTI_SEGMENT_GPX), chunk_size=16)
+        parsed = parser.parse(MULTI_SEGMENT_GPX)
+
+        # Assert
+        assert streamed.get_all_points() == parsed.get_all_points()
+
+    async def test_parse_async_reads_chunk_iterator(self) -> None:
+        """非同期チャンクイテレータからパースできる"""
+
+        # Arrange
+        async def chunks() -> AsyncIterator[bytes]:
+            for i in range(0, len(MULTI_SEGMENT_GPX), 64):
+                yield MULTI_SEGMENT_GPX[i : i + 64]
+
+        parser = GpxParser()
+
+        # Act
+        result = await parser.parse_async(chunks())
+
+        # Assert
+        assert len(result.tracks[0].segments) == 2
+        assert len(result.get_all_points()) == 3
+
+
+class TestTrackSegment:
+    """TrackSegment（列データ）のテスト"""
+
+    def test_points_are_stored_as_columns(self) -> None:
+        """ポイントが列データとして保持され、ビューから復元できる"""
+        # Arrange
+        points = (
+            TrackPoint(latitude=35.0, longitude=139.0, elevation=10.5),
+            TrackPoint(latitude=35.1, longitude=139.1, time="2025-10-09T20:22:20Z"),
+        )
+
+        # Act
+        segment = TrackSegment(points=points)
+
+        # Assert
+        assert isinstance(segment.latitudes, array)
+        assert list(segment.longitudes) == [139.0, 139.1]
+        assert len(segment.points) == 2
+        assert tuple(segment.points) == points
+        assert segment.points[-1].time == "2025-10-09T20:22:20Z"
+
+    def test_builder_builds_segment_without_point_objects(self) -> None:
+        """ビルダーで列を直接組み立てられる"""
+        # Arrange
+        builder = TrackSegmentBuilder()
+        builder.append(35.0, 139.0)
+        builder.append(35.5, 139.5, elevation=100.0, epoch_ms=1_760_041_340_500)
+
+        # Act
+        segment = builder.build()
+
+        # Assert
+        assert len(segment.points) == 2
+        assert segment.points[0].elevation is None
+        assert segment.points[0].time is None
+        assert segment.points[1].elevation == pytest.approx(100.0)
+        assert segment.points[1].time == "2025-10-09T20:22:20.500Z"
+
+
+class TestEpochTime:
+    """時刻のエポックミリ秒変換のテスト"""
+
+    @pytest.mark.parametrize(
+        ("time_str", "expected"),
+        [
+            ("2024-01-15T09:00:00Z", 1_705_309_200_000),
+            ("2024-01-15T09:00:00.123Z", 1_705_309_200_123),
+            ("2024-01-15T18:00:00+09:00", 1_705_309_200_000),
+            ("2024-01-15T09:00:00", 1_705_309_200_000),
+            ("2024-02-30T00:00:00Z", None),
+            ("2024-01-15T09:00:00+09:00Z", None),
+            ("invalid", None),
+        ],
+    )
+    def test_parse(self, time_str: str, expected: int | None) -> None:
+        """固定形式・オフセット付き・不正な形式を変換できる"""
+        # Act & Assert
+        assert parse_time_to_epoch_ms(time_str) == expected
+
+    def test_round_trip(self) -> None:
+        """ISO8601文字列は必要になった時点で同じ形式に戻せる"""
+        # Arrange
+        time_str = "2025-10-09T20:22:20.500Z"
+
+        # Act
+        epoch_ms = parse_time_to_epoch_ms(time_str)
+
+        # Assert
+        assert epoch_ms is not None
+        assert format_epoch_ms(epoch_ms) == time_str
+
 
 class TestGpxData:
     """GpxDataのテスト"""
@@ -145,3 +351,45 @@ class TestGpxData:
         assert center is not None
         assert center[0] == pytest.approx(35.5)
         assert center[1] == pytest.approx(139.5)
+
+    def test_stats_aggregates_segments(self) -> None:
+        """statsがセグメント別の集計値を合算する"""
+        # Arrange
+        first = TrackSegment(
+            points=(
+                TrackPoint(latitude=35.0, longitude=139.0, elevation=10.0),
+                TrackPoint(
+                    latitude=35.01,
+                    longitude=139.0,
+                    elevation=25.0,
+                    time="2025-10-09T20:22:20Z",
+                ),
+            )
+        )
+        second = TrackSegment(
+            points=(
+                TrackPoint(
+                    latitude=36.0,
+                    longitude=140.0,
+                    elevation=5.0,
+                    time="2025-10-09T21:00:00Z",
+                ),
+            )
+        )
+        gpx_data = GpxData(tracks=(Track(segments=(first, second)),))
+
+        # Act
+        stats = gpx_data.stats
+
+        # Assert
+        assert stats.point_count == 3
+        assert stats.bounds == (35.0, 139.0, 36.0, 140.0)
+        assert stats.center == pytest.approx((35.5, 139.5))
+        assert stats.start_time_ms == 1_760_041_340_000
+        assert stats.end_time_ms == 1_760_043_600_000
+        assert stats.distance_m == pytest.approx(1111.95, abs=0.01)
+        assert stats.elevation_min == pytest.approx(5.0)
+        assert stats.elevation_max == pytest.approx(25.0)
+        assert stats.elevation_gain == pytest.approx(15.0)
+        assert stats.elevation_loss == pytest.approx(0.0)
+        assert [s.point_count for s in stats.segments] == [2, 1]
@@ -2,6 +2,11 @@
 
 from fastapi.testclient import TestClient
 
+from src.main import app
+from src.routers import home
+from src.routers.home import SAMPLE_GPX_PATH
+from src.services.track_store import compute_track_id
+
 
 def test_home_returns_html(client: TestClient) -> None:
     """ホームページがHTMLを返す"""
@@ -83,3 +88,53 @@ def test_demo_returns_map_with_sample_gpx(client: TestClient) -> None:
     assert "text/html" in response.headers["content-type"]
     assert "leaflet" in response.text.lower()
     assert "サンプル.gpx" in response.text
+
+
+def test_demo_returns_cache_headers(client: TestClient) -> None:
+    """デモページはETagとLast-Modified付きで返される"""
+    # Act
+    response = client.get("/demo")
+
+    # Assert
+    assert response.headers["etag"].startswith('"')
+    assert response.headers["last-modified"].endswith("GMT")
+
+
+def test_demo_returns_304_for_matching_etag(client: TestClient) -> None:
+    """ETagが一致する条件付きリクエストには304を返す"""
+    # Arrange
+    etag = client.get("/demo").headers["etag"]
+
+    # Act
+    response = client.get("/demo", headers={"If-None-Match": etag})
+
+    # Assert
+    assert response.status_code == 304
+    assert response.content == b""
+
+
+def test_demo_returns_304_when_not_modified_since(client: TestClient) -> None:
+    """If-Modified-Since以降に更新がなければ304を返す"""
+    # Arrange
+    last_modified = client.get("/demo").headers["last-modified"]
+
+    # Act
+    response = client.get("/demo", headers={"If-Modified-Since": last_modified})
+
+    # Assert
+    assert response.status_code == 304
+
+
+def test_demo_is_prepared_at_startup() -> None:
+    """起動時にデモページを生成し、デモのトラックデータも取得できる"""
+    # Arrange
+    with TestClient(app) as client:
+        # Act
+        prepared = home._demo_page
+        response = client.get("/demo")
+
+        # Assert
+        assert prepared is not None
+        assert response.content == prepared.body
+        track_id = compute_track_id(SAMPLE_GPX_PATH.read_bytes())
+        assert client.get(f"/api/tracks/{track_id}/points").status_code == 200
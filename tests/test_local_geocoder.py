@@ -0,0 +1,186 @@
+"""オフライン逆ジオコーディング（境界・道路インデックス）のテスト"""
+
+import json
+from pathlib import Path
+from typing import Any
+
+from src.models.geocoding import AddressResult
+from src.services.local_geocoder import BoundaryIndex, LocalGeocoder, RoadIndex
+
+
+def square(
+    min_lng: float, min_lat: float, max_lng: float, max_lat: float
+) -> list[tuple[float, float]]:
+    """矩形のリング（経度, 緯度）"""
+    return [
+        (min_lng, min_lat),
+        (max_lng, min_lat),
+        (max_lng, max_lat),
+        (min_lng, max_lat),
+        (min_lng, min_lat),
+    ]
+
+
+def feature(geometry_type: str, coordinates: Any, **properties: str) -> dict[str, Any]:
+    """GeoJSONのFeature"""
+    return {
+        "type": "Feature",
+        "properties": properties,
+        "geometry": {"type": geometry_type, "coordinates": coordinates},
+    }
+
+
+def write_geojson(path: Path, *features: dict[str, Any]) -> Path:
+    """FeatureCollectionをファイルに書き出す"""
+    path.write_text(
+        json.dumps({"type": "FeatureCollection", "features": list(features)}),
+        encoding="utf-8",
+    )
+    return path
+
+
+class TestBoundaryIndex:
+    """BoundaryIndexのテスト"""
+
+    def test_point_in_polygon(self) -> None:
+        """ポリゴン内の点は見つかり、外の点はNone"""
+        # Arrange
+        index = BoundaryIndex()
+        index.add("東京都", "港区", [square(139.70, 35.60, 139.80, 35.70)])
+
+        # Act & Assert
+        assert index.lookup(35.65, 139.75) == ("東京都", "港区")
+        assert index.lookup(35.75, 139.75) is None
+        assert index.lookup(35.65, 139.85) is None
+
+    def test_hole_is_outside(self) -> None:
+        """穴の中の点はポリゴンの外として扱う"""
+        # Arrange
+        index = BoundaryIndex()
+        index.add(
+            "東京都",
+            "港区",
+            [square(139.0, 35.0, 140.0, 36.0), square(139.4, 35.4, 139.6, 35.6)],
+        )
+
+        # Act & Assert
+        assert index.lookup(35.5, 139.5) is None
+        assert index.lookup(35.2, 139.2) == ("東京都", "港区")
+
+    def test_concave_polygon_with_many_edges(self) -> None:
+        """辺の多い凹ポリゴンでも帯ごとの判定が正しい"""
+        # Arrange: 櫛形（歯の間は外）
+        ring: list[tuple[float, float]] = [(0.0, 0.0)]
+        for i in range(50):
+            x = i * 0.02
+            ring += [(x, 1.0), (x + 0.01, 1.0), (x + 0.01, 0.5), (x + 0.02, 0.5)]
+        ring += [(1.0, 0.0)]
+        index = BoundaryIndex()
+        index.add("A", "B", [ring])
+
+        # Act & Assert
+        assert index.lookup(0.75, 0.005) == ("A", "B")
+        assert index.lookup(0.75, 0.015) is None
+        assert index.lookup(0.25, 0.015) == ("A", "B")
+
+    def test_smaller_boundary_wins(self) -> None:
+        """重なる境界は小さい方（市区町村）を返す"""
+        # Arrange
+        index = BoundaryIndex()
+        index.add("東京都", "", [square(138.9, 35.4, 140.0, 35.9)])
+        index.add("東京都", "港区", [square(139.70, 35.60, 139.80, 35.70)])
+
+        # Act & Assert
+        assert index.lookup(35.65, 139.75) == ("東京都", "港区")
+        assert index.lookup(35.5, 139.0) == ("東京都", "")
+
+
+class TestRoadIndex:
+    """RoadIndexのテスト"""
+
+    def test_nearest_within_distance(self) -> None:
+        """最大距離以内で最も近い道路を返す"""
+        # Arrange
+        index = RoadIndex()
+        index.add("外堀通り", [(139.700, 35.650), (139.800, 35.650)])
+        index.add("桜田通り", [(139.700, 35.6504), (139.800, 35.6504)])
+
+        # Act & Assert: 約11m南・約33m北
+        assert index.nearest(35.6501, 139.75, 50) == "外堀通り"
+        assert index.nearest(35.6503, 139.75, 50) == "桜田通り"
+        assert index.nearest(35.6600, 139.75, 50) is None
+
+    def test_segment_endpoint_distance(self) -> None:
+        """線分の延長上ではなく端点からの距離で判定する"""
+        # Arrange
+        index = RoadIndex()
+        index.add("外堀通り", [(139.700, 35.650), (139.710, 35.650)])
+
+        # Act & Assert: 東端から約90m東
+        assert index.nearest(35.650, 139.711, 50) is None
+        assert index.nearest(35.650, 139.711, 100) == "外堀通り"
+
+
+class TestLocalGeocoder:
+    """LocalGeocoderのテスト"""
+
+    def test_from_files(self, tmp_path: Path) -> None:
+        """GeoJSONファイルから境界と道路を読み込んで住所を返す"""
+        # Arrange
+        boundaries = write_geojson(
+            tmp_path / "boundaries.geojson",
+            feature(
+                "MultiPolygon",
+                [[square(139.70, 35.60, 139.80, 35.70)]],
+                prefecture="東京都",
+                city="港区",
+            ),
+        )
+        roads = write_geojson(
+            tmp_path / "roads.geojson",
+            feature(
+                "LineString",
+                [(139.70, 35.65), (139.80, 35.65)],
+                name="外堀通り",
+            ),
+        )
+        geocoder = LocalGeocoder.from_files(boundaries, roads)
+
+        # Act & Assert
+        assert geocoder.reverse(35.6501, 139.75) == AddressResult(
+            prefecture="東京都", city="港区", road="外堀通り"
+        )
+        assert geocoder.reverse(35.69, 139.75) == AddressResult(
+            prefecture="東京都", city="港区", road=""
+        )
+        assert geocoder.reverse(34.0, 135.0) is None
+
+    def test_reads_national_land_numerical_information(self, tmp_path: Path) -> None:
+        """国土数値情報（行政区域）のプロパティを読み、政令市は区名を付ける"""
+        # Arrange
+        boundaries = write_geojson(
+            tmp_path / "n03.geojson",
+            feature(
+                "Polygon",
+                [square(139.60, 35.45, 139.65, 35.50)],
+                N03_001="神奈川県",
+                N03_003="横浜市",
+                N03_004="西区",
+            ),
+            feature(
+                "Polygon",
+                [square(139.00, 35.30, 139.10, 35.40)],
+                N03_001="神奈川県",
+                N03_003="足柄上郡",
+                N03_004="開成町",
+            ),
+        )
+        geocoder = LocalGeocoder.from_files(boundaries)
+
+        # Act & Assert
+        assert geocoder.reverse(35.47, 139.62) == AddressResult(
+            prefecture="神奈川県", city="横浜市西区", road=""
+        )
+        assert geocoder.reverse(35.35, 139.05) == AddressResult(
+            prefecture="神奈川県", city="開成町", road=""
+        )
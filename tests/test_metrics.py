@@ -0,0 +1,93 @@
+"""メトリクスのテスト"""
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src.services.metrics import STAGE_SECONDS, UPLOAD_POINTS, MetricsRegistry
+
+
+class TestMetricsRegistry:
+    """レジストリとテキスト形式の出力のテスト"""
+
+    def test_counter_and_gauge(self) -> None:
+        """カウンター・ゲージをラベル付きで出力する"""
+        # Arrange
+        registry = MetricsRegistry()
+        counter = registry.counter("jobs_total", "Jobs.", labelnames=("kind",))
+        gauge = registry.gauge("depth", "Depth.")
+
+        # Act
+        counter.inc(kind="a")
+        counter.inc(2, kind='b"c')
+        gauge.set_function(lambda: 3)
+        text = registry.render()
+
+        # Assert
+        assert "# HELP jobs_total Jobs.\n# TYPE jobs_total counter\n" in text
+        assert 'jobs_total{kind="a"} 1\n' in text
+        assert 'jobs_total{kind="b\\"c"} 2\n' in text
+        assert "# TYPE depth gauge\ndepth 3\n" in text
+
+    def test_histogram_buckets_are_cumulative(self) -> None:
+        """ヒストグラムは累積バケット・合計・件数を出力する"""
+        # Arrange
+        registry = MetricsRegistry()
+        histogram = registry.histogram("size", "Size.", buckets=(1, 10))
+
+        # Act
+        for value in (0.5, 5, 5, 50):
+            histogram.observe(value)
+        text = registry.render()
+
+        # Assert
+        assert 'size_bucket{le="1"} 1\n' in text
+        assert 'size_bucket{le="10"} 3\n' in text
+        assert 'size_bucket{le="+Inf"} 4\n' in text
+        assert "size_sum 60.5\n" in text
+        assert "size_count 4\n" in text
+
+    def test_wrong_labels_are_rejected(self) -> None:
+        """登録したラベル名と異なるラベルはエラーにする"""
+        # Arrange
+        registry = MetricsRegistry()
+        counter = registry.counter("jobs_total", "Jobs.", labelnames=("kind",))
+
+        # Act / Assert
+        with pytest.raises(ValueError):
+            counter.inc(other="a")
+        with pytest.raises(ValueError):
+            registry.gauge("jobs_total", "Duplicate.")
+
+
+class TestMetricsEndpoint:
+    """/metrics のテスト"""
+
+    def test_upload_is_recorded(self, client: TestClient) -> None:
+        """アップロードの段階ごとの処理時間とポイント数を記録して出力する"""
+        # Arrange
+        gpx_content = b"""<?xml version="1.0" encoding="UTF-8"?>
+        <gpx version="1.1" xmlns="http://www.topografix.com/GPX/1/1">
+            <trk><trkseg>
+                <trkpt lat="35.6861" lon="139.6844"></trkpt>
+                <trkpt lat="35.6862" lon="139.6845"></trkpt>
+            </trkseg></trk>
+        </gpx>"""
+        parsed = STAGE_SECONDS.count(stage="parse")
+        rendered = STAGE_SECONDS.count(stage="render")
+        uploads = UPLOAD_POINTS.count()
+
+        # Act
+        client.post(
+            "/upload",
+            files={"file": ("metrics.gpx", gpx_content, "application/gpx+xml")},
+        )
+        response = client.get("/metrics")
+
+        # Assert
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+        assert STAGE_SECONDS.count(stage="parse") == parsed + 1
+        assert STAGE_SECONDS.count(stage="render") == rendered + 1
+        assert UPLOAD_POINTS.count() == uploads + 1
+        assert 'gpx_stage_duration_seconds_count{stage="read"}' in response.text
+        assert "# TYPE geocoding_queue_depth gauge" in response.text
@@ -0,0 +1,343 @@
+"""パースのプロセスプールのテスト"""
+
+import asyncio
+import math
+import pickle
+from collections.abc import Callable
+from concurrent.futures import Executor, Future
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Any
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src.routers import home
+from src.services import parse_pool, track_store
+from src.services.geodesy import compute_profile
+from src.services.gpx_parser import GpxParseError, GpxParser
+from src.services.parse_pool import (
+    ParsePool,
+    ParsePoolBusy,
+    pack_gpx,
+    pack_pyramid,
+    unpack_gpx,
+    unpack_pyramid,
+)
+from src.services.simplify import build_pyramid
+
+
+GPX_CONTENT = b"""<?xml version="1.0" encoding="UTF-8"?>
+<gpx version="1.1" creator="Pool" xmlns="http://www.topografix.com/GPX/1/1">
+    <trk>
+        <name>Day 1</name>
+        <trkseg>
+            <trkpt lat="35.0" lon="139.0"><ele>10.0</ele></trkpt>
+            <trkpt lat="35.1" lon="139.1"><time>2025-10-09T20:22:20Z</time></trkpt>
+        </trkseg>
+        <trkseg>
+            <trkpt lat="35.2" lon="139.2"><ele>30.0</ele></trkpt>
+        </trkseg>
+    </trk>
+</gpx>"""
+
+
+def test_pack_and_unpack_roundtrip() -> None:
+    """受け渡し形式に変換して戻しても列データと集計値が一致する"""
+    # Arrange
+    gpx_data = GpxParser().parse(GPX_CONTENT)
+
+    # Act
+    restored = unpack_gpx(pickle.loads(pickle.dumps(pack_gpx(gpx_data))))
+
+    # Assert
+    assert restored.creator == "Pool"
+    assert restored.tracks[0].name == "Day 1"
+    for original, segment in zip(gpx_data.iter_segments(), restored.iter_segments()):
+        assert segment.latitudes == original.latitudes
+        assert segment.longitudes == original.longitudes
+        assert segment.times == original.times
+        assert [math.isnan(e) for e in segment.elevations] == [
+            math.isnan(e) for e in original.elevations
+        ]
+        assert segment.stats == original.stats
+    assert restored.stats == gpx_data.stats
+
+
+async def test_parse_in_process() -> None:
+    """別プロセスでパースした結果を返す"""
+    # Arrange
+    pool = ParsePool(workers=1, max_concurrency=1, max_pending=1)
+
+    # Act
+    try:
+        gpx_data = await pool.parse(GPX_CONTENT)
+    finally:
+        pool.shutdown()
+
+    # Assert
+    assert gpx_data.point_count == 3
+    assert gpx_data.stats == GpxParser().parse(GPX_CONTENT).stats
+    assert pool.active == 0
+
+
+async def test_parse_track_computes_derived_data_in_process() -> None:
+    """派生データ（プロファイル・簡略化ピラミッド）も別プロセスで計算して返す"""
+    # Arrange
+    pool = ParsePool(workers=1, max_concurrency=1, max_pending=1)
+    gpx_data = GpxParser().parse(GPX_CONTENT)
+
+    # Act
+    try:
+        parsed = await pool.parse_track(GPX_CONTENT)
+    finally:
+        pool.shutdown()
+
+    # Assert
+    assert parsed.gpx_data.point_count == 3
+    assert parsed.profile.distances == compute_profile(gpx_data).distances
+    assert parsed.pyramid.to_json() == build_pyramid(gpx_data).to_json()
+
+
+def test_pyramid_pack_and_unpack_roundtrip() -> None:
+    """簡略化ピラミッドを受け渡し形式に変換して戻しても一致する"""
+    # Arrange
+    pyramid = build_pyramid(GpxParser().parse(GPX_CONTENT))
+
+    # Act
+    restored = unpack_pyramid(pickle.loads(pickle.dumps(pack_pyramid(pyramid))))
+
+    # Assert
+    assert restored == pyramid
+
+
+def test_upload_does_not_compute_derived_data_in_web_process(
+    client: TestClient, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """アップロードしたトラックの派生データはパース時に計算済み"""
+
+    # Arrange
+    def fail(*args: Any) -> None:
+        raise AssertionError("derived data computed in the web process")
+
+    monkeypatch.setattr(track_store, "compute_profile", fail)
+    monkeypatch.setattr(track_store, "build_pyramid", fail)
+    response = client.post(
+        "/upload",
+        files={"file": ("derived.gpx", GPX_CONTENT, "application/gpx+xml")},
+        follow_redirects=False,
+    )
+
+    # Act
+    track_id = response.headers["location"].removeprefix("/tracks/")
+    profile = client.get(f"/api/tracks/{track_id}/profile")
+    points = client.get(f"/api/tracks/{track_id}/points", params={"zoom": 10})
+
+    # Assert
+    assert profile.status_code == 200
+    assert points.status_code == 200
+
+
+def test_restored_track_gets_derived_data_from_pool(
+    client: TestClient, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """ディスクから復元したトラックの派生データもプロセスプールで計算する"""
+
+    # Arrange
+    def fail(*args: Any) -> None:
+        raise AssertionError("derived data computed in the web process")
+
+    response = client.post(
+        "/upload",
+        files={"file": ("restored.gpx", GPX_CONTENT, "application/gpx+xml")},
+        follow_redirects=False,
+    )
+    track_id = response.headers["location"].removeprefix("/tracks/")
+    # 別ワーカー相当（メモリ上にない）のストアから読み直す
+    monkeypatch.setattr(
+        track_store,
+        "_track_store",
+        track_store.TrackStore(tmp_path / "tracks", 64 * 1024 * 1024, 60),
+    )
+    monkeypatch.setattr(track_store, "compute_profile", fail)
+    monkeypatch.setattr(track_store, "build_pyramid", fail)
+
+    # Act
+    page = client.get(f"/tracks/{track_id}")
+    profile = client.get(f"/api/tracks/{track_id}/profile")
+    points = client.get(f"/api/tracks/{track_id}/points", params={"zoom": 10})
+
+    # Assert
+    assert page.status_code == 200
+    assert "restored.gpx" in page.text
+    assert profile.status_code == 200
+    assert points.status_code == 200
+
+
+def test_restore_reports_busy_pool(
+    client: TestClient, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """復元時にプロセスプールが混み合っていれば503（Retry-After付き）"""
+    # Arrange
+    response = client.post(
+        "/upload",
+        files={"file": ("busy.gpx", GPX_CONTENT, "application/gpx+xml")},
+        follow_redirects=False,
+    )
+    track_id = response.headers["location"].removeprefix("/tracks/")
+    monkeypatch.setattr(
+        track_store,
+        "_track_store",
+        track_store.TrackStore(tmp_path / "tracks", 64 * 1024 * 1024, 60),
+    )
+
+    class BusyPool:
+        async def parse_track(self, content: Path) -> None:
+            raise ParsePoolBusy(retry_after=2)
+
+    monkeypatch.setattr(track_store, "get_parse_pool", lambda: BusyPool())
+
+    # Act
+    page = client.get(f"/tracks/{track_id}")
+    api = client.get(f"/api/tracks/{track_id}")
+
+    # Assert
+    assert page.status_code == 503
+    assert api.status_code == 503
+    assert api.headers["retry-after"] == "2"
+
+
+async def test_parse_error_is_propagated() -> None:
+    """子プロセスでのパースエラーはGpxParseErrorとして送出される"""
+    # Arrange
+    pool = ParsePool(workers=1, max_concurrency=1, max_pending=1)
+
+    # Act / Assert
+    try:
+        with pytest.raises(GpxParseError):
+            await pool.parse(b"<html></html>")
+    finally:
+        pool.shutdown()
+    assert pool.active == 0
+
+
+async def test_waiting_parses_run_in_turn() -> None:
+    """同時実行数を超えたパースは空きを待って順に実行される"""
+    # Arrange
+    pool = ParsePool(workers=0, max_concurrency=1, max_pending=2)
+
+    # Act
+    results = await asyncio.gather(*(pool.parse(GPX_CONTENT) for _ in range(3)))
+
+    # Assert
+    assert [r.point_count for r in results] == [3, 3, 3]
+    assert pool.active == 0
+    assert pool.pending == 0
+
+
+async def test_rejects_when_too_many_are_waiting() -> None:
+    """空きを待つパースが上限に達していればParsePoolBusyを送出する"""
+    # Arrange
+    pool = ParsePool(workers=0, max_concurrency=1, max_pending=1)
+    running = asyncio.create_task(pool.parse(GPX_CONTENT))
+    waiting = asyncio.create_task(pool.parse(GPX_CONTENT))
+    await asyncio.sleep(0)
+
+    # Act / Assert
+    with pytest.raises(ParsePoolBusy) as excinfo:
+        await pool.parse(GPX_CONTENT)
+    assert excinfo.value.retry_after >= 1
+    await asyncio.gather(running, waiting)
+    assert pool.active == 0
+
+
+async def test_cancelled_waiter_gives_up_its_turn() -> None:
+    """待っている間に取り消されたパースは枠を消費しない"""
+    # Arrange
+    pool = ParsePool(workers=0, max_concurrency=1, max_pending=2)
+    running = asyncio.create_task(pool.parse(GPX_CONTENT))
+    cancelled = asyncio.create_task(pool.parse(GPX_CONTENT))
+    await asyncio.sleep(0)
+
+    # Act
+    cancelled.cancel()
+    await running
+    gpx_data = await pool.parse(GPX_CONTENT)
+
+    # Assert
+    assert cancelled.cancelled()
+    assert gpx_data.point_count == 3
+    assert pool.active == 0
+
+
+async def test_broken_pool_does_not_shut_down_replacement(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """異常終了したプールの後続の失敗で、作り直したプールを終了しない"""
+
+    # Arrange
+    class ManualExecutor(Executor):
+        """結果をテストから設定するプール"""
+
+        def __init__(self, *args: Any, **kwargs: Any) -> None:
+            self.futures: list[Future[Any]] = []
+            self.is_shut_down = False
+            executors.append(self)
+
+        def submit(
+            self, fn: Callable[..., Any], /, *args: Any, **kwargs: Any
+        ) -> Future[Any]:
+            future: Future[Any] = Future()
+            self.futures.append(future)
+            return future
+
+        def shutdown(self, wait: bool = True, *, cancel_futures: bool = False) -> None:
+            self.is_shut_down = True
+
+    executors: list[ManualExecutor] = []
+    monkeypatch.setattr(parse_pool, "ProcessPoolExecutor", ManualExecutor)
+    pool = ParsePool(workers=1, max_concurrency=2, max_pending=1)
+    first = asyncio.create_task(pool.parse(GPX_CONTENT))
+    second = asyncio.create_task(pool.parse(GPX_CONTENT))
+    await asyncio.sleep(0)
+    broken = executors[0]
+    broken.futures[0].set_exception(BrokenProcessPool())
+    with pytest.raises(GpxParseError):
+        await first
+    third = asyncio.create_task(pool.parse(GPX_CONTENT))
+    await asyncio.sleep(0)
+    replacement = executors[1]
+
+    # Act
+    broken.futures[1].set_exception(BrokenProcessPool())
+    with pytest.raises(GpxParseError):
+        await second
+
+    # Assert
+    assert broken.is_shut_down
+    assert not replacement.is_shut_down
+    replacement.futures[0].set_result((pack_gpx(GpxParser().parse(GPX_CONTENT)), 0.0))
+    assert (await third).point_count == 3
+
+
+def test_upload_returns_503_when_pool_is_busy(
+    client: TestClient, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """パースの空きがなければ503とRetry-Afterを返す"""
+
+    # Arrange
+    class BusyPool:
+        async def parse_track(self, content: bytes) -> None:
+            raise ParsePoolBusy(retry_after=3)
+
+    monkeypatch.setattr(home, "get_parse_pool", lambda: BusyPool())
+
+    # Act
+    response = client.post(
+        "/upload", files={"file": ("busy.gpx", GPX_CONTENT, "application/gpx+xml")}
+    )
+
+    # Assert
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "3"
+    assert "混み合っています" in response.text
@@ -0,0 +1,155 @@
+"""ポイント列バイナリエンコーディングのテスト"""
+
+import json
+import math
+from array import array
+
+import pytest
+
+from src.models.gpx import MISSING_TIME
+from src.services.point_encoding import (
+    HEADER_SIZE,
+    PointColumns,
+    PointEncodingError,
+    decode_points,
+    encode_points,
+    prefers_binary,
+)
+
+
+def make_columns(count: int) -> PointColumns:
+    """テスト用の列データ（1秒間隔の点列）"""
+    return PointColumns(
+        array("d", [35.658581 + i * 1e-5 for i in range(count)]),
+        array("d", [139.745433 + i * 2e-5 for i in range(count)]),
+        array("d", [25.0 + math.sin(i / 10) * 5 for i in range(count)]),
+        array("q", [1705309200000 + i * 1000 for i in range(count)]),
+    )
+
+
+class TestEncodePoints:
+    """encode_points / decode_points のテスト"""
+
+    def test_round_trip(self) -> None:
+        """エンコードしてデコードすると精度内で元に戻る"""
+        # Arrange
+        columns = make_columns(100)
+
+        # Act
+        decoded = decode_points(encode_points(columns))
+
+        # Assert
+        for original, value in zip(columns.latitudes, decoded["latitudes"]):
+            assert value == pytest.approx(original, abs=1e-6)
+        for original, value in zip(columns.elevations, decoded["elevations"]):
+            assert value == pytest.approx(original, abs=0.05)
+        assert decoded["times"] == [float(t) for t in columns.times]
+
+    def test_missing_values(self) -> None:
+        """欠損した高度・時刻はNoneに戻る"""
+        # Arrange
+        columns = PointColumns(
+            array("d", [35.0, 35.1, 35.2]),
+            array("d", [139.0, 139.1, 139.2]),
+            array("d", [10.0, math.nan, 12.5]),
+            array("q", [MISSING_TIME, 1000, 4500]),
+        )
+
+        # Act
+        decoded = decode_points(encode_points(columns))
+
+        # Assert
+        assert decoded["elevations"] == [10.0, None, 12.5]
+        assert decoded["times"] == [None, 1000.0, 4500.0]
+
+    def test_omits_absent_columns(self) -> None:
+        """高度・時刻がない場合は列を含めない"""
+        # Arrange
+        columns = PointColumns(
+            array("d", [35.0, 35.1]),
+            array("d", [139.0, 139.1]),
+            array("d", [math.nan, math.nan]),
+            array("q", [MISSING_TIME, MISSING_TIME]),
+        )
+
+        # Act
+        data = encode_points(columns)
+
+        # Assert
+        assert len(data) == HEADER_SIZE + 2 * 2 * 4
+        assert decode_points(data)["times"] == [None, None]
+
+    def test_large_time_gap_uses_seconds(self) -> None:
+        """int32のミリ秒に収まらない間隔は秒単位でエンコードする"""
+        # Arrange
+        times = array("q", [0, 60 * 24 * 3600 * 1000])
+        columns = PointColumns(
+            array("d", [35.0, 35.1]),
+            array("d", [139.0, 139.1]),
+            array("d", [0.0, 0.0]),
+            times,
+        )
+
+        # Act
+        decoded = decode_points(encode_points(columns))
+
+        # Assert
+        assert decoded["times"] == [float(t) for t in times]
+
+    def test_indices(self) -> None:
+        """indices指定時はその点のみと元インデックスを含む"""
+        # Arrange
+        columns = make_columns(10)
+
+        # Act
+        decoded = decode_points(encode_points(columns, [0, 4, 9]))
+
+        # Assert
+        assert decoded["indices"] == [0, 4, 9]
+        assert decoded["latitudes"][1] == pytest.approx(columns.latitudes[4])
+
+    def test_smaller_than_json(self) -> None:
+        """JSONのポイントオブジェクトより5倍以上小さい"""
+        # Arrange
+        columns = make_columns(1000)
+        json_payload = json.dumps(
+            [
+                {"lat": lat, "lng": lng, "ele": ele, "time": "2024-01-15T09:00:00Z"}
+                for lat, lng, ele in zip(
+                    columns.latitudes, columns.longitudes, columns.elevations
+                )
+            ]
+        ).encode()
+
+        # Act
+        binary = encode_points(columns)
+
+        # Assert
+        assert len(json_payload) / len(binary) >= 5
+
+    def test_rejects_unknown_format(self) -> None:
+        """不正なデータはPointEncodingErrorを送出"""
+        # Act & Assert
+        with pytest.raises(PointEncodingError):
+            decode_points(b"NOTGPXC" + bytes(32))
+
+
+class TestPrefersBinary:
+    """Acceptヘッダーによるネゴシエーションのテスト"""
+
+    @pytest.mark.parametrize(
+        ("accept", "expected"),
+        [
+            (None, False),
+            ("application/json", False),
+            ("*/*", False),
+            ("application/vnd.gpx-viewer.points", True),
+            ("application/vnd.gpx-viewer.points, application/json;q=0.5", True),
+            ("application/json, application/vnd.gpx-viewer.points;q=0.5", False),
+            ("application/vnd.gpx-viewer.points;q=0", False),
+        ],
+    )
+    def test_negotiation(self, accept: str | None, expected: bool) -> None:
+        """バイナリ形式が明示的に優先された場合のみTrue"""
+        # Act & Assert
+        assert prefers_binary(accept) is expected
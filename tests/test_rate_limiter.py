@@ -0,0 +1,89 @@
+"""レート制限のテスト"""
+
+from pathlib import Path
+
+import pytest
+
+from src.services.rate_limiter import (
+    MAX_WAIT_INTERVALS,
+    RateLimiter,
+    SharedRateLimiter,
+)
+
+
+class TestRateLimiter:
+    """プロセス内のレート制限のテスト"""
+
+    def test_reservations_are_spaced_by_interval(self) -> None:
+        """連続した予約は間隔ずつ後ろにずれる"""
+        # Arrange
+        limiter = RateLimiter(interval=10.0)
+
+        # Act
+        waits = [limiter._reserve_local() for _ in range(3)]
+
+        # Assert
+        assert waits[0] == 0
+        assert waits[1] == pytest.approx(10.0, abs=0.1)
+        assert waits[2] == pytest.approx(20.0, abs=0.1)
+
+
+class TestSharedRateLimiter:
+    """プロセス間で共有するレート制限のテスト"""
+
+    def test_instances_share_slots(self, tmp_path: Path) -> None:
+        """同じデータベースを使うインスタンス（別ワーカー相当）でスロットを共有する"""
+        # Arrange
+        path = tmp_path / "shared.sqlite3"
+        first = SharedRateLimiter(path, name="nominatim", interval=10.0)
+        second = SharedRateLimiter(path, name="nominatim", interval=10.0)
+
+        # Act
+        waits = [
+            first._reserve_shared(),
+            second._reserve_shared(),
+            first._reserve_shared(),
+        ]
+
+        # Assert
+        assert waits[0] == 0
+        assert waits[1] == pytest.approx(10.0, abs=0.1)
+        assert waits[2] == pytest.approx(20.0, abs=0.1)
+
+    def test_names_are_independent(self, tmp_path: Path) -> None:
+        """名前が異なる制限は互いに影響しない"""
+        # Arrange
+        path = tmp_path / "shared.sqlite3"
+        SharedRateLimiter(path, name="a", interval=10.0)._reserve_shared()
+
+        # Act
+        wait = SharedRateLimiter(path, name="b", interval=10.0)._reserve_shared()
+
+        # Assert
+        assert wait == 0
+
+    def test_wait_is_capped(self, tmp_path: Path) -> None:
+        """保存済みのスロットが異常に先でも待ち時間には上限がある"""
+        # Arrange
+        limiter = SharedRateLimiter(tmp_path / "shared.sqlite3", "n", interval=1.0)
+        for _ in range(MAX_WAIT_INTERVALS + 10):
+            limiter._reserve_shared()
+
+        # Act
+        wait = limiter._reserve_shared()
+
+        # Assert
+        assert wait <= MAX_WAIT_INTERVALS * 1.0
+
+    async def test_falls_back_to_local_limit(self, tmp_path: Path) -> None:
+        """データベースを開けない場合はプロセス内の制限で動作する"""
+        # Arrange
+        blocker = tmp_path / "file"
+        blocker.write_text("")
+        limiter = SharedRateLimiter(blocker / "shared.sqlite3", "n", interval=10.0)
+
+        # Act
+        await limiter.acquire()
+
+        # Assert
+        assert limiter._reserve_local() == pytest.approx(10.0, abs=0.1)
@@ -0,0 +1,85 @@
+"""トラック簡略化サービスのテスト"""
+
+from src.models.gpx import GpxData, Track, TrackSegmentBuilder
+from src.services.simplify import build_pyramid, point_significance
+
+
+def _zigzag_track(point_count: int) -> GpxData:
+    """東へ進みながら南北に振れる合成トラック"""
+    builder = TrackSegmentBuilder()
+    for i in range(point_count):
+        offset = 0.0005 if i % 2 else 0.0
+        builder.append(35.0 + offset, 139.0 + i * 0.001)
+    return GpxData(tracks=(Track(segments=(builder.build(),)),))
+
+
+class TestSimplify:
+    """simplifyモジュールのテスト"""
+
+    def test_point_significance_drops_collinear_points(self) -> None:
+        """直線上の中間点は重要度0になり、端点は常に採用される"""
+        # Arrange
+        xs = [0.0, 1.0, 2.0, 3.0]
+        ys = [0.0, 0.0, 0.0, 0.0]
+
+        # Act
+        significance = point_significance(xs, ys)
+
+        # Assert
+        assert significance[0] == float("inf")
+        assert significance[-1] == float("inf")
+        assert significance[1] == 0.0
+        assert significance[2] == 0.0
+
+    def test_point_significance_keeps_peak(self) -> None:
+        """突出した点の重要度はその偏差になる"""
+        # Arrange
+        xs = [0.0, 1.0, 2.0]
+        ys = [0.0, 5.0, 0.0]
+
+        # Act
+        significance = point_significance(xs, ys)
+
+        # Assert
+        assert significance[1] == 5.0
+
+    def test_build_pyramid_levels_are_nested_and_map_to_original(self) -> None:
+        """低ズームほど点が少なく、インデックスは元のポイントを指す"""
+        # Arrange
+        gpx_data = _zigzag_track(500)
+
+        # Act
+        pyramid = build_pyramid(gpx_data)
+
+        # Assert
+        sizes = [len(level.indices) for level in pyramid.levels]
+        assert sizes == sorted(sizes)
+        assert sizes[0] < 500
+        assert sizes[-1] == 500
+        coarse = set(pyramid.levels[0].indices)
+        assert coarse <= set(pyramid.levels[-1].indices)
+        assert {0, 499} <= coarse
+
+    def test_point_levels_rebuild_each_level(self) -> None:
+        """ポイントごとのレベル番号から各レベルのインデックスを復元できる"""
+        # Arrange
+        pyramid = build_pyramid(_zigzag_track(500))
+
+        # Act
+        point_levels = pyramid.point_levels()
+
+        # Assert
+        assert len(point_levels) == 500
+        for number, level in enumerate(pyramid.levels):
+            rebuilt = [i for i, value in enumerate(point_levels) if value <= number]
+            assert rebuilt == level.indices.tolist()
+
+    def test_level_for_zoom_clamps_out_of_range(self) -> None:
+        """範囲外のズームは最も近いレベルになる"""
+        # Arrange
+        pyramid = build_pyramid(_zigzag_track(10))
+
+        # Act & Assert
+        assert pyramid.level_for_zoom(-1) is pyramid.levels[0]
+        assert pyramid.level_for_zoom(12).min_zoom == 12
+        assert pyramid.level_for_zoom(25) is pyramid.levels[-1]
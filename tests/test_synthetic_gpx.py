@@ -0,0 +1,57 @@
+"""ベンチマーク用の合成GPXジェネレーターのテスト"""
+
+from benchmarks.synthetic_gpx import GpxLayout, generate_gpx
+from src.models.gpx import MISSING_TIME
+from src.services.gpx_parser import GpxParser
+
+
+class TestSyntheticGpx:
+    """合成GPXのテスト"""
+
+    def test_layout_is_parsed_back(self) -> None:
+        """指定したトラック数・セグメント数・ポイント数のGPXになる"""
+        # Arrange
+        layout = GpxLayout(points=101, tracks=2, segments=3, extensions=True)
+
+        # Act
+        gpx_data = GpxParser().parse(generate_gpx(layout))
+
+        # Assert
+        assert len(gpx_data.tracks) == 2
+        assert [len(s.latitudes) for s in gpx_data.iter_segments()] == [
+            17,
+            17,
+            17,
+            17,
+            17,
+            16,
+        ]
+        assert gpx_data.point_count == 101
+        assert gpx_data.stats.start_time_ms is not None
+
+    def test_optional_fields_are_omitted(self) -> None:
+        """ele・timeを含めない構成では欠損値になる"""
+        # Arrange
+        layout = GpxLayout(points=10, elevation=False, time=False)
+
+        # Act
+        gpx_data = GpxParser().parse(generate_gpx(layout))
+
+        # Assert
+        segment = next(gpx_data.iter_segments())
+        assert all(t == MISSING_TIME for t in segment.times)
+        assert gpx_data.stats.elevation_min is None
+
+    def test_same_seed_is_deterministic(self) -> None:
+        """同じ構成・シードからは同じ内容を生成する"""
+        # Arrange
+        layout = GpxLayout(points=500, seed=7)
+
+        # Act
+        first = generate_gpx(layout)
+        second = generate_gpx(layout)
+
+        # Assert
+        assert first == second
+        assert first != generate_gpx(GpxLayout(points=500, seed=8))
+        assert layout.label == "500-1x1-ele-time"
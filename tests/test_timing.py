@@ -0,0 +1,101 @@
+"""段階ごとの処理時間（Server-Timing）とリクエストプロファイラーのテスト"""
+
+import time
+from pathlib import Path
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.middleware import ServerTimingMiddleware
+from src.services.timing import RequestTimings, request_timings, stage
+
+
+def busy_endpoint() -> dict[str, str]:
+    """30ms程度かかる処理"""
+    with stage("work"):
+        time.sleep(0.03)
+    return {"status": "ok"}
+
+
+def make_app(tmp_path: Path, slow_ms: float = 0) -> TestClient:
+    """プロファイラーをトークンで有効にできるアプリ"""
+    app = FastAPI()
+    app.add_api_route("/busy", busy_endpoint)
+    app.add_middleware(
+        ServerTimingMiddleware,
+        profiler_sample_rate=0,
+        profiler_token="secret",
+        profiler_dir=tmp_path,
+        profiler_slow_ms=slow_ms,
+        profiler_interval_ms=1,
+    )
+    return TestClient(app)
+
+
+class TestStage:
+    """stage()のテスト"""
+
+    def test_stages_are_summed_in_order(self) -> None:
+        """同じ段階は合算し、最初に現れた順に出力する"""
+        # Arrange
+        timings = RequestTimings()
+
+        # Act
+        with request_timings(timings):
+            with stage("parse"):
+                pass
+            with stage("render"):
+                pass
+            with stage("parse"):
+                pass
+
+        # Assert
+        assert list(timings.stages()) == ["parse", "render"]
+        header = timings.server_timing()
+        assert header.startswith("parse;dur=")
+        assert ", render;dur=" in header
+        assert ", total;dur=" in header
+
+    def test_stage_outside_request_is_ignored(self) -> None:
+        """リクエストの外でもエラーにならない"""
+        # Act / Assert
+        with stage("startup"):
+            pass
+
+
+class TestServerTimingMiddleware:
+    """ミドルウェアのテスト"""
+
+    def test_track_page_reports_stages(self, client: TestClient) -> None:
+        """地図ページの段階ごとの処理時間をServer-Timingで返す"""
+        # Act
+        response = client.get("/demo")
+
+        # Assert
+        assert "total;dur=" in response.headers["server-timing"]
+
+    def test_profile_is_written_with_token(self, tmp_path: Path) -> None:
+        """トークン付きのリクエストは呼び出しツリーを書き出す"""
+        # Arrange
+        client = make_app(tmp_path)
+
+        # Act
+        response = client.get("/busy", headers={"X-Profile": "secret"})
+
+        # Assert
+        assert "work;dur=" in response.headers["server-timing"]
+        (tree,) = tmp_path.glob("*-GET-busy-*.txt")
+        assert "busy_endpoint" in tree.read_text(encoding="utf-8")
+        assert list(tmp_path.glob("*.folded"))
+
+    def test_profile_requires_token_and_slow_request(self, tmp_path: Path) -> None:
+        """トークンがない・閾値より速いリクエストは書き出さない"""
+        # Arrange
+        client = make_app(tmp_path, slow_ms=60_000)
+
+        # Act
+        make_app(tmp_path).get("/busy", headers={"X-Profile": "wrong"})
+        client.get("/busy", headers={"X-Profile": "secret"})
+
+        # Assert
+        assert list(tmp_path.iterdir()) == []
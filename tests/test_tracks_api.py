@@ -0,0 +1,345 @@
+"""トラックデータAPIのテスト"""
+
+import asyncio
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src.services.compression import DecompressionLimits
+from src.services.gpx_parser import GpxParser
+from src.services.parse_pool import ParsedTrack, get_parse_pool
+from src.services.point_encoding import BINARY_MEDIA_TYPE, decode_points
+from src.services.track_store import TrackStore, compute_track_id
+
+
+SAMPLE_GPX = b"""<?xml version="1.0" encoding="UTF-8"?>
+<gpx version="1.1" xmlns="http://www.topografix.com/GPX/1/1">
+    <trk>
+        <name>Test</name>
+        <trkseg>
+            <trkpt lat="35.6586" lon="139.7454">
+                <ele>25.0</ele>
+                <time>2024-01-15T09:00:00Z</time>
+            </trkpt>
+            <trkpt lat="35.6590" lon="139.7460">
+                <ele>27.5</ele>
+                <time>2024-01-15T09:01:00Z</time>
+            </trkpt>
+            <trkpt lat="35.6600" lon="139.7470">
+                <ele>30.0</ele>
+                <time>2024-01-15T09:02:00Z</time>
+            </trkpt>
+        </trkseg>
+    </trk>
+</gpx>"""
+
+
+def upload(client: TestClient, content: bytes = SAMPLE_GPX) -> str:
+    """GPXをアップロードしてトラックIDを返す"""
+    response = client.post(
+        "/upload",
+        files={"file": ("test.gpx", content, "application/gpx+xml")},
+        follow_redirects=False,
+    )
+    assert response.status_code == 303
+    location: str = response.headers["location"]
+    assert location.startswith("/tracks/")
+    return location.removeprefix("/tracks/")
+
+
+class TestUploadRedirect:
+    """アップロード後のリダイレクトのテスト"""
+
+    def test_upload_redirects_to_content_addressed_page(
+        self, client: TestClient
+    ) -> None:
+        """アップロードするとコンテンツハッシュのページにリダイレクトされる"""
+        # Act
+        track_id = upload(client)
+
+        # Assert
+        assert track_id == compute_track_id(SAMPLE_GPX)
+
+    def test_track_page_embeds_metadata_only(self, client: TestClient) -> None:
+        """トラックページにはポイント列を埋め込まない"""
+        # Arrange
+        track_id = upload(client)
+
+        # Act
+        response = client.get(f"/tracks/{track_id}")
+
+        # Assert
+        assert response.status_code == 200
+        assert track_id in response.text
+        assert "09:01:00" not in response.text
+
+    def test_unknown_track_page_shows_error(self, client: TestClient) -> None:
+        """存在しないトラックのページはエラーを表示する"""
+        # Act
+        response = client.get(f"/tracks/{'0' * 64}")
+
+        # Assert
+        assert response.status_code == 200
+        assert "トラックが見つかりません" in response.text
+
+
+class TestTrackApi:
+    """トラックデータAPIのテスト"""
+
+    def test_metadata(self, client: TestClient) -> None:
+        """メタデータを取得できる"""
+        # Arrange
+        track_id = upload(client)
+
+        # Act
+        response = client.get(f"/api/tracks/{track_id}")
+
+        # Assert
+        assert response.status_code == 200
+        data = response.json()
+        assert data["id"] == track_id
+        assert data["point_count"] == 3
+        assert "points" not in data
+        assert data["levels"]
+
+    def test_points_with_etag(self, client: TestClient) -> None:
+        """ポイント列は強いETag付きで返される"""
+        # Arrange
+        track_id = upload(client)
+
+        # Act
+        response = client.get(f"/api/tracks/{track_id}/points")
+
+        # Assert
+        assert response.status_code == 200
+        points = response.json()["points"]
+        assert len(points) == 3
+        assert points[0]["time"] == 1_705_309_200_000
+        etag = response.headers["etag"]
+        assert etag.startswith('"') and not etag.startswith("W/")
+        assert "max-age" in response.headers["cache-control"]
+
+    def test_if_none_match_returns_304(self, client: TestClient) -> None:
+        """If-None-Matchが一致すれば304を返す"""
+        # Arrange
+        track_id = upload(client)
+        etag = client.get(f"/api/tracks/{track_id}/points").headers["etag"]
+
+        # Act
+        response = client.get(
+            f"/api/tracks/{track_id}/points", headers={"If-None-Match": etag}
+        )
+
+        # Assert
+        assert response.status_code == 304
+        assert response.content == b""
+
+    def test_points_binary_by_accept(self, client: TestClient) -> None:
+        """Acceptでバイナリ形式を指定するとバイナリで返す"""
+        # Arrange
+        track_id = upload(client)
+        json_response = client.get(f"/api/tracks/{track_id}/points")
+
+        # Act
+        response = client.get(
+            f"/api/tracks/{track_id}/points",
+            headers={"Accept": BINARY_MEDIA_TYPE},
+        )
+
+        # Assert
+        assert response.headers["content-type"] == BINARY_MEDIA_TYPE
+        assert response.headers["vary"] == "Accept"
+        assert response.headers["etag"] != json_response.headers["etag"]
+        decoded = decode_points(response.content)
+        assert decoded["latitudes"] == [35.6586, 35.659, 35.66]
+        assert decoded["elevations"] == [25.0, 27.5, 30.0]
+
+    @pytest.mark.parametrize(
+        "old, new",
+        [
+            (b"<ele>27.5</ele>", b"<ele>1e12</ele>"),
+            (b"2024-01-15T09:00:00Z", b"1901-01-15T09:00:00Z"),
+        ],
+    )
+    def test_points_binary_falls_back_to_json(
+        self, client: TestClient, old: bytes, new: bytes
+    ) -> None:
+        """int32に収まらない値を含む場合はJSONで返す"""
+        # Arrange
+        track_id = upload(client, SAMPLE_GPX.replace(old, new))
+
+        # Act
+        response = client.get(
+            f"/api/tracks/{track_id}/points",
+            headers={"Accept": BINARY_MEDIA_TYPE},
+        )
+
+        # Assert
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/json"
+        assert response.headers["vary"] == "Accept"
+        assert len(response.json()["points"]) == 3
+
+    def test_points_for_zoom_level(self, client: TestClient) -> None:
+        """zoom指定で簡略化レベルのポイントと元インデックスを返す"""
+        # Arrange
+        track_id = upload(client)
+
+        # Act
+        response = client.get(f"/api/tracks/{track_id}/points", params={"zoom": 3})
+
+        # Assert
+        data = response.json()
+        assert data["min_zoom"] <= 3 <= data["max_zoom"]
+        assert data["indices"][0] == 0
+        assert len(data["points"]) == len(data["indices"])
+
+    def test_levels_match_zoom_points(self, client: TestClient) -> None:
+        """ポイントごとのレベル番号はzoom指定のポイント列と同じ点を選ぶ"""
+        # Arrange
+        track_id = upload(client)
+
+        # Act
+        response = client.get(f"/api/tracks/{track_id}/levels")
+
+        # Assert
+        data = response.json()
+        assert response.headers["etag"]
+        for number, level in enumerate(data["levels"]):
+            zoom_points = client.get(
+                f"/api/tracks/{track_id}/points", params={"zoom": level["min_zoom"]}
+            ).json()
+            selected = [
+                i for i, value in enumerate(data["point_levels"]) if value <= number
+            ]
+            assert selected == zoom_points["indices"]
+
+    def test_profile(self, client: TestClient) -> None:
+        """標高プロファイルを取得できる"""
+        # Arrange
+        track_id = upload(client)
+
+        # Act
+        response = client.get(f"/api/tracks/{track_id}/profile")
+
+        # Assert
+        assert response.status_code == 200
+        assert response.json()["index"] == [0, 1, 2]
+
+    @pytest.mark.parametrize(
+        "path, accept",
+        [
+            ("", "application/json"),
+            ("/points", "application/json"),
+            ("/points", BINARY_MEDIA_TYPE),
+            ("/profile", "application/json"),
+        ],
+    )
+    def test_non_finite_elevation_is_served(
+        self, client: TestClient, path: str, accept: str
+    ) -> None:
+        """高度がinfのファイルでもAPIが応答できる"""
+        # Arrange
+        track_id = upload(
+            client, SAMPLE_GPX.replace(b"<ele>27.5</ele>", b"<ele>inf</ele>")
+        )
+
+        # Act
+        response = client.get(
+            f"/api/tracks/{track_id}{path}", headers={"Accept": accept}
+        )
+
+        # Assert
+        assert response.status_code == 200
+
+    @pytest.mark.parametrize("path", ["", "/points", "/levels", "/profile"])
+    def test_unknown_track_returns_404(self, client: TestClient, path: str) -> None:
+        """存在しないトラックは404を返す"""
+        # Act
+        response = client.get(f"/api/tracks/{'f' * 64}{path}")
+
+        # Assert
+        assert response.status_code == 404
+
+
+class TestTrackStore:
+    """トラックストアのテスト"""
+
+    async def test_restores_from_disk(self, tmp_path: Path) -> None:
+        """メモリにない場合はディスクから復元する（別ワーカー相当）"""
+        # Arrange
+        gpx_data = GpxParser().parse(SAMPLE_GPX)
+        TrackStore(tmp_path, max_bytes=1024 * 1024, ttl=60).put(
+            SAMPLE_GPX, gpx_data, "test.gpx"
+        )
+        other = TrackStore(tmp_path, max_bytes=1024 * 1024, ttl=60)
+
+        # Act
+        stored = await other.get(compute_track_id(SAMPLE_GPX))
+
+        # Assert
+        assert stored is not None
+        assert stored.filename == "test.gpx"
+        assert stored.gpx_data.point_count == 3
+
+    async def test_concurrent_restores_parse_once(
+        self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """同じトラックの同時の復元は1回だけパースする"""
+        # Arrange
+        gpx_data = GpxParser().parse(SAMPLE_GPX)
+        TrackStore(tmp_path, max_bytes=1024 * 1024, ttl=60).put(
+            SAMPLE_GPX, gpx_data, "test.gpx"
+        )
+        other = TrackStore(tmp_path, max_bytes=1024 * 1024, ttl=60)
+        pool = get_parse_pool()
+        parse_track = pool.parse_track
+        parsed_paths: list[bytes | Path] = []
+
+        async def counting_parse_track(
+            content: bytes | Path, limits: DecompressionLimits | None = None
+        ) -> ParsedTrack:
+            parsed_paths.append(content)
+            return await parse_track(content, limits)
+
+        monkeypatch.setattr(pool, "parse_track", counting_parse_track)
+        track_id = compute_track_id(SAMPLE_GPX)
+
+        # Act
+        first, second = await asyncio.gather(other.get(track_id), other.get(track_id))
+
+        # Assert
+        assert first is not None
+        assert second is first
+        assert len(parsed_paths) == 1
+
+    def test_reupload_skips_parse(
+        self, client: TestClient, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """同じ内容の再アップロードはパースせずにキャッシュを使う"""
+        # Arrange
+        first_id = upload(client)
+
+        def fail_parse(self: GpxParser, xml_content: bytes) -> None:
+            raise AssertionError("再パースされました")
+
+        monkeypatch.setattr(GpxParser, "parse", fail_parse)
+
+        # Act
+        second_id = upload(client)
+
+        # Assert
+        assert second_id == first_id
+        stats = client.get("/api/cache-stats").json()["tracks"]
+        assert stats["hits"] >= 1
+        assert stats["entries"] == 1
+
+    async def test_rejects_invalid_track_id(self, tmp_path: Path) -> None:
+        """不正な形式のIDは参照しない"""
+        # Arrange
+        store = TrackStore(tmp_path, max_bytes=1024 * 1024, ttl=60)
+
+        # Act & Assert
+        assert await store.get("../etc/passwd") is None
+        assert store.cached("../etc/passwd") is None
@@ -0,0 +1,170 @@
+"""アップロードの受け付け（ストリーミング・スプール）のテスト"""
+
+import hashlib
+from collections.abc import AsyncIterator
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src.config import settings
+from src.services.compression import DecompressionLimits
+from src.services.track_store import get_track_store
+from src.services.upload import UploadError, UploadTooLarge, spool_multipart
+
+
+BOUNDARY = "gpxboundary"
+LIMITS = DecompressionLimits(max_size=1024 * 1024, max_ratio=100)
+GPX_CONTENT = b"""<?xml version="1.0" encoding="UTF-8"?>
+<gpx version="1.1" xmlns="http://www.topografix.com/GPX/1/1">
+    <trk><trkseg><trkpt lat="35.0" lon="139.0"/></trkseg></trk>
+</gpx>"""
+
+
+def multipart_body(*parts: tuple[str, str | None, bytes]) -> bytes:
+    """(フィールド名, ファイル名, 内容) からmultipart/form-dataのボディを作る"""
+    body = b""
+    for name, filename, content in parts:
+        disposition = f'form-data; name="{name}"'
+        if filename is not None:
+            disposition += f'; filename="{filename}"'
+        body += (
+            f"--{BOUNDARY}\r\nContent-Disposition: {disposition}\r\n\r\n".encode()
+            + content
+            + b"\r\n"
+        )
+    return body + f"--{BOUNDARY}--\r\n".encode()
+
+
+def headers_for(body: bytes | None) -> dict[str, str]:
+    """multipart/form-dataのヘッダー（bodyを渡すとContent-Length付き）"""
+    headers = {"content-type": f"multipart/form-data; boundary={BOUNDARY}"}
+    if body is not None:
+        headers["content-length"] = str(len(body))
+    return headers
+
+
+async def chunks(body: bytes, size: int = 7) -> AsyncIterator[bytes]:
+    """ボディを小さなチャンクに分けて返す"""
+    for i in range(0, len(body), size):
+        yield body[i : i + size]
+
+
+class TestSpoolMultipart:
+    """spool_multipartのテスト"""
+
+    async def test_file_parts_are_spooled_with_digest(self, tmp_path: Path) -> None:
+        """ファイル部分を一時ファイルに書き出し、SHA-256を計算する"""
+        # Arrange
+        body = multipart_body(("note", None, b"hello"), ("file", "a.gpx", GPX_CONTENT))
+
+        # Act
+        async with spool_multipart(
+            headers_for(body), chunks(body), tmp_path, max_size=len(body), limits=LIMITS
+        ) as files:
+            (spooled,) = files
+            content = spooled.path.read_bytes()
+
+        # Assert
+        assert spooled.field_name == "file"
+        assert spooled.filename == "a.gpx"
+        assert content == GPX_CONTENT
+        assert spooled.size == len(GPX_CONTENT)
+        assert spooled.sha256 == hashlib.sha256(GPX_CONTENT).hexdigest()
+        assert list(tmp_path.iterdir()) == []
+
+    async def test_rejects_large_content_length_before_reading(
+        self, tmp_path: Path
+    ) -> None:
+        """Content-Lengthが上限を超えていればボディを読まずに拒否する"""
+        # Arrange
+        body = multipart_body(("file", "a.gpx", GPX_CONTENT))
+        read = False
+
+        async def stream() -> AsyncIterator[bytes]:
+            nonlocal read
+            read = True
+            yield body
+
+        # Act / Assert
+        with pytest.raises(UploadTooLarge):
+            async with spool_multipart(
+                headers_for(body),
+                stream(),
+                tmp_path,
+                max_size=len(body) - 1,
+                limits=LIMITS,
+            ):
+                pass
+        assert not read
+
+    async def test_aborts_streamed_body_over_limit(self, tmp_path: Path) -> None:
+        """Content-Lengthがなくても上限を超えた時点で打ち切り、一時ファイルを消す"""
+        # Arrange
+        body = multipart_body(("file", "a.gpx", GPX_CONTENT * 10))
+        consumed = 0
+
+        async def stream() -> AsyncIterator[bytes]:
+            nonlocal consumed
+            async for chunk in chunks(body, size=64):
+                consumed += len(chunk)
+                yield chunk
+
+        # Act / Assert
+        with pytest.raises(UploadTooLarge):
+            async with spool_multipart(
+                headers_for(None), stream(), tmp_path, max_size=256, limits=LIMITS
+            ):
+                pass
+        assert consumed <= 256 + 64
+        assert list(tmp_path.iterdir()) == []
+
+    async def test_rejects_non_multipart(self, tmp_path: Path) -> None:
+        """multipart/form-data以外は拒否する"""
+        # Act / Assert
+        with pytest.raises(UploadError):
+            async with spool_multipart(
+                {"content-type": "application/json"},
+                chunks(b"{}"),
+                tmp_path,
+                1024,
+                LIMITS,
+            ):
+                pass
+
+
+class TestUploadEndpoint:
+    """アップロードのエンドポイントのテスト"""
+
+    def test_upload_over_limit_returns_413(
+        self, client: TestClient, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """max_upload_sizeを超えるアップロードは413を返す"""
+        # Arrange
+        monkeypatch.setattr(settings, "max_upload_size", 100)
+
+        # Act
+        response = client.post(
+            "/upload", files={"file": ("big.gpx", GPX_CONTENT, "application/gpx+xml")}
+        )
+
+        # Assert
+        assert response.status_code == 413
+        assert "大きすぎます" in response.text
+
+    def test_spooled_upload_is_moved_into_store(self, client: TestClient) -> None:
+        """一時ファイルはトラックストアに移動し、スプールには残らない"""
+        # Act
+        response = client.post(
+            "/upload",
+            files={"file": ("a.gpx", GPX_CONTENT, "application/gpx+xml")},
+            follow_redirects=False,
+        )
+
+        # Assert
+        track_id = hashlib.sha256(GPX_CONTENT).hexdigest()
+        assert response.headers["location"] == f"/tracks/{track_id}"
+        assert list(settings.upload_spool_dir.iterdir()) == []
+        stored = get_track_store().cached(track_id)
+        assert stored is not None
+        assert stored.filename == "a.gpx"